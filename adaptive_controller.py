@@ -0,0 +1,158 @@
+"""
+Adaptive quality controller for the recognition loop.
+
+The controller watches the end-to-end latency of matched frames and the
+number of frames waiting in the pipeline, and steps along a ladder of
+settings to hold a latency budget:
+
+    full quality -> smaller detection scales -> skip frames -> detect only
+    in a region of interest around the recent faces
+
+It steps back up when there is headroom, and jumps straight to full quality
+when the scene is idle (no faces for a while) or when a face matched close
+to the tolerance, where a sharper encoding may decide the identity.
+"""
+import threading
+from collections import namedtuple
+
+# scale: detection downscale factor; skip: frames skipped after each processed
+# frame; roi: (top, right, bottom, left) region to detect in, or None for the whole frame
+ControllerSettings = namedtuple('ControllerSettings', ['scale', 'skip', 'roi'])
+
+class AdaptiveController:
+    """Choose detection scale, frame skipping and ROI cropping to hold a latency budget."""
+
+    def __init__(self, target_latency=0.15, scales=(0.5, 0.35, 0.25, 0.18), max_skip=3, use_roi=True,
+                 roi_margin=0.5, roi_refresh=10, near_threshold=0.05, idle_frames=30, hold_frames=15,
+                 cooldown_frames=5, max_queue=2, smoothing=0.2):
+        """
+        Args:
+            target_latency: End-to-end latency budget per frame in seconds
+            scales: Detection scales from best to cheapest
+            max_skip: Most frames skipped after each processed frame
+            use_roi: Whether the last step crops detection to the recent faces
+            roi_margin: Margin added around the faces, as a fraction of their size
+            roi_refresh: Detect on the whole frame every this many ROI frames, to find new arrivals
+            near_threshold: A match within this distance of the tolerance restores full quality
+            idle_frames: Processed frames without faces before full quality is restored
+            hold_frames: Frames full quality is held after a near-threshold match
+            cooldown_frames: Frames between two steps along the ladder
+            max_queue: Frames waiting in the pipeline above which the controller steps down
+            smoothing: Weight of the newest latency in the moving average
+        """
+        self.target_latency = target_latency
+        self.roi_margin = roi_margin
+        self.roi_refresh = roi_refresh
+        self.near_threshold = near_threshold
+        self.idle_frames = idle_frames
+        self.hold_frames = hold_frames
+        self.cooldown_frames = cooldown_frames
+        self.max_queue = max_queue
+        self.smoothing = smoothing
+
+        # Ladder of (scale, skip, roi) from full quality to cheapest
+        self.levels = [(scale, 0, False) for scale in scales]
+        self.levels += [(scales[-1], skip, False) for skip in range(1, max_skip + 1)]
+        if use_roi:
+            self.levels.append((scales[-1], max_skip, True))
+
+        self.level = 0
+        self.latency = None
+        self.changes = 0
+        self.skipped = 0
+        self._region = None
+        self._idle = 0
+        self._hold = 0
+        self._since_change = 0
+        self._frames_seen = 0
+        self._roi_frames = 0
+        self._lock = threading.Lock()
+
+    def should_process(self):
+        """Whether the next captured frame is processed or skipped (called by the capture thread)."""
+        skip = self.levels[self.level][1]
+        process = self._frames_seen % (skip + 1) == 0
+        self._frames_seen += 1
+        if not process:
+            self.skipped += 1
+        return process
+
+    def settings(self):
+        """Settings for detecting on the next frame (called by the detection workers)."""
+        with self._lock:
+            scale, skip, use_roi = self.levels[self.level]
+            roi = None
+            if use_roi and self._region is not None:
+                self._roi_frames += 1
+                if self._roi_frames % self.roi_refresh:
+                    roi = self._region
+            return ControllerSettings(scale, skip, roi)
+
+    def update(self, latency, queue_depth, face_locations, distances, tolerance):
+        """
+        Feed back one matched frame and adjust the settings.
+
+        Args:
+            latency: End-to-end latency of the frame in seconds
+            queue_depth: Frames waiting for detection or matching
+            face_locations: Face boxes of the frame in full-frame coordinates
+            distances: Match distance of each face
+            tolerance: Match tolerance in use
+
+        Returns:
+            True if the settings changed
+        """
+        with self._lock:
+            self.latency = latency if self.latency is None else (
+                self.smoothing * latency + (1 - self.smoothing) * self.latency)
+            self._since_change += 1
+
+            if len(face_locations):
+                self._idle = 0
+                self._region = self._expand(face_locations)
+            else:
+                self._idle += 1
+
+            near = any(abs(float(distance) - tolerance) <= self.near_threshold for distance in distances)
+            if near:
+                self._hold = self.hold_frames
+                return self._set_level(0)
+            if self._idle >= self.idle_frames:
+                self._region = None
+                return self._set_level(0)
+            if self._hold > 0:
+                self._hold -= 1
+                return False
+            if self._since_change < self.cooldown_frames:
+                return False
+
+            if self.latency > self.target_latency or queue_depth > self.max_queue:
+                return self._set_level(min(self.level + 1, len(self.levels) - 1))
+            if self.latency < 0.5 * self.target_latency and queue_depth == 0:
+                return self._set_level(max(self.level - 1, 0))
+            return False
+
+    def _set_level(self, level):
+        if level == self.level:
+            return False
+        self.level = level
+        self.changes += 1
+        self._since_change = 0
+        return True
+
+    def _expand(self, face_locations):
+        """Bounding box of the faces grown by roi_margin of their size."""
+        top = min(box[0] for box in face_locations)
+        right = max(box[1] for box in face_locations)
+        bottom = max(box[2] for box in face_locations)
+        left = min(box[3] for box in face_locations)
+        margin_y = int((bottom - top) * self.roi_margin)
+        margin_x = int((right - left) * self.roi_margin)
+        return (max(top - margin_y, 0), right + margin_x, bottom + margin_y, max(left - margin_x, 0))
+
+    def format_settings(self):
+        """Current settings as a short line for the on-screen overlay."""
+        scale, skip, use_roi = self.levels[self.level]
+        latency = f"{self.latency * 1000:.0f}" if self.latency is not None else "-"
+        return (f"Scale {scale:.2f} | Skip {skip} | {'ROI' if use_roi else 'Full frame'} | "
+                f"{latency}/{self.target_latency * 1000:.0f} ms")
@@ -1,61 +1,306 @@
-from flask import Flask, render_template, request, redirect, url_for
+"""
+Flask attendance service with a warm gallery.
+
+The gallery, student data and matchers are loaded once when the app is
+created and kept in memory. They are reloaded only when the gallery files
+or students.pkl change on disk (checked at most every few seconds).
+
+Endpoints:
+    GET  /subjects             Subjects with enrolled students
+    GET  /health               Gallery size and last reload time
+    POST /recognize            JPEG frame(s) -> identities of the faces
+    POST /mark                 Record attendance for a roll number
+
+/recognize accepts either a single JPEG as the request body
+(Content-Type: image/jpeg) or a multipart form with one or more "frames"
+files. With ?subject=... only that subject's students are matched, and
+with &mark=1 recognized students are marked present.
+
+Usage:
+    flask --app app run
+    curl --data-binary @frame.jpg -H "Content-Type: image/jpeg" \
+        "http://localhost:5000/recognize?subject=Maths&mark=1"
+"""
 import os
+import time
+import threading
 from datetime import datetime
+import cv2
+import numpy as np
+from flask import Flask, render_template, request, redirect, url_for, jsonify
 from face_detection_utils import (
+    STUDENTS_FILE,
+    ENCODING_DIM,
     initialize_directories,
-    load_face_encodings,
     load_students_data,
-    update_attendance_excel
+    batch_face_encodings
 )
+from attendance_pipeline import detect_only, resolve_detector, scale_locations
+from gallery_store import GALLERY_DIR, SubjectView, open_gallery_store
+from attendance_store import open_attendance_store
+
+class RecognitionService:
+    """Warm gallery, per-subject matchers and the attendance store shared by all requests."""
+
+    def __init__(self, gallery_path=GALLERY_DIR, attendance_store=None, tolerance=0.6, scale=0.5, detector=None, reload_interval=2.0):
+        """
+        Args:
+            gallery_path: Directory of the gallery store
+            attendance_store: AttendanceStore to mark attendance in (default: open_attendance_store())
+            tolerance: Match tolerance
+            scale: Downscale factor applied to frames before detection
+            detector: Face detector backend, see resolve_detector() (default: HOG)
+            reload_interval: Seconds between checks for changed gallery files
+        """
+        self.gallery_path = gallery_path
+        self.attendance_store = attendance_store or open_attendance_store()
+        self.tolerance = tolerance
+        self.scale = scale
+        self.detector = resolve_detector(detector)
+        self.reload_interval = reload_interval
+
+        self._lock = threading.Lock()
+        # Serializes the change check so concurrent requests reload at most once
+        self._refresh_lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self.loaded_at = None
+        self.reload()
+
+    def _files_signature(self):
+        """Modification times of the gallery files and students.pkl."""
+        entries = []
+        if os.path.isdir(self.gallery_path):
+            with os.scandir(self.gallery_path) as it:
+                entries = sorted((entry.name, entry.stat().st_mtime_ns) for entry in it)
+        students_mtime = os.stat(STUDENTS_FILE).st_mtime_ns if os.path.exists(STUDENTS_FILE) else None
+        return tuple(entries), students_mtime
+
+    def reload(self):
+        """Load the gallery and student data from disk and drop cached matchers."""
+        with self._lock:
+            signature = self._files_signature()
+            self.gallery = open_gallery_store(self.gallery_path)
+            self.students_data = load_students_data()
+            self.subjects = sorted({subject for data in self.students_data.values()
+                                    for subject in data.get("subjects", [])})
+            self._views = {}
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            self.loaded_at = datetime.now()
+
+    def refresh(self):
+        """Reload if the gallery or students.pkl changed since the last load."""
+        with self._refresh_lock:
+            if time.monotonic() - self._checked_at < self.reload_interval:
+                return False
+            self._checked_at = time.monotonic()
+            if self._files_signature() == self._signature:
+                return False
+            self.reload()
+            return True
+
+    def view(self, subject=None):
+        """
+        Gallery view and matcher for a subject's students (all students if subject is None).
+
+        Returns:
+            (SubjectView, GalleryMatcher), built once per gallery version
+        """
+        with self._lock:
+            if subject not in self._views:
+                if subject is None:
+                    encodings, roll_nos = self.gallery.snapshot()
+                    rows = [row for row, roll_no in enumerate(roll_nos) if roll_no in self.students_data]
+                    cohort = [roll_nos[row] for row in rows]
+                    view = SubjectView(None, np.asarray(encodings[rows], dtype=np.float32).reshape(-1, ENCODING_DIM),
+                                       cohort, {roll_no: self.students_data[roll_no] for roll_no in cohort})
+                else:
+                    view = self.gallery.subject_view(subject, self.students_data)
+                self._views[subject] = (view, view.matcher(self.tolerance))
+            return self._views[subject]
+
+    def recognize(self, frames, subject=None, tolerance=None):
+        """
+        Detect, encode and identify the faces in a batch of BGR frames.
+
+        Returns:
+            List with one list of face dicts (box, roll_no, name, distance) per frame
+        """
+        view, matcher = self.view(subject)
+        detections = [detect_only(frame, self.scale, self.detector) for frame in frames]
+        encodings = batch_face_encodings(detections)
+
+        flat = [encoding for frame_encodings in encodings for encoding in frame_encodings]
+        indices, distances, _ = matcher.match(flat, tolerance)
+
+        results, position = [], 0
+        for (_, small_locations), frame_encodings in zip(detections, encodings):
+            faces = []
+            for box in scale_locations(small_locations, self.scale):
+                index = int(indices[position])
+                roll_no, data = view.student(index) if index >= 0 else (None, None)
+                faces.append({
+                    "box": list(box),
+                    "roll_no": roll_no,
+                    "name": data["name"] if data else "Unknown",
+                    "distance": float(distances[position]) if np.isfinite(distances[position]) else None,
+                })
+                position += 1
+            results.append(faces)
+        return results
+
+    def mark(self, roll_no, subject, status="Present", date=None):
+        """
+        Record attendance for an enrolled student.
+
+        Returns:
+            True if recorded, False if already marked
+
+        Raises:
+            KeyError: Unknown roll number
+            ValueError: Student not enrolled in subject
+        """
+        data = self.students_data.get(roll_no)
+        if data is None:
+            raise KeyError(f"No student with roll number {roll_no}")
+        if subject not in data.get("subjects", []):
+            raise ValueError(f"{data['name']} is not enrolled in {subject}")
+        marked = bool(self.attendance_store.mark_many([(data["name"], roll_no, subject, status, date)]))
+        self.attendance_store.flush()
+        return marked
+
+    def mark_absentees(self, subject, date):
+        """Mark every enrolled student without a Present record for subject on date as absent."""
+        present = self.attendance_store.roll_nos_with_status(subject, date, "Present")
+        records = [(data["name"], roll_no, subject, "Absent", date) for roll_no, data in self.students_data.items()
+                   if subject in data.get("subjects", []) and roll_no not in present]
+        return self.attendance_store.mark_many(records)
+
+def decode_frames(req):
+    """Decode the JPEG frames of a /recognize request into BGR arrays."""
+    if req.files:
+        payloads = [f.read() for f in req.files.getlist("frames") or req.files.values()]
+    else:
+        payloads = [req.get_data()]
+
+    frames = []
+    for payload in payloads:
+        frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR) if payload else None
+        if frame is None:
+            raise ValueError("Could not decode image")
+        frames.append(frame)
+    return frames
+
+def valid_date(value):
+    """True if value is a date in the YYYY-MM-DD format."""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return False
+    return True
+
+def create_app(service=None):
+    """
+    Create the Flask app.
+
+    Args:
+        service: RecognitionService to use (default: one over the default gallery)
+    """
+    initialize_directories()
+    app = Flask(__name__)
+    app.config["SERVICE"] = service = service or RecognitionService()
+
+    @app.before_request
+    def refresh_gallery():
+        service.refresh()
+
+    @app.route('/')
+    def index():
+        """Render the home page."""
+        return render_template('index.html')
+
+    @app.route('/subjects')
+    def subjects():
+        """List the subjects with enrolled students."""
+        return jsonify(subjects=service.subjects)
+
+    @app.route('/health')
+    def health():
+        """Report the size of the warm gallery."""
+        return jsonify(students=len(service.students_data), encodings=len(service.gallery),
+                       loaded_at=service.loaded_at.isoformat(timespec="seconds"))
+
+    @app.route('/recognize', methods=['POST'])
+    def recognize():
+        """Identify the faces in one or more JPEG frames, optionally marking them present."""
+        subject = request.args.get("subject") or None
+        if subject is not None and subject not in service.subjects:
+            return jsonify(error=f"Unknown subject {subject}"), 404
+        try:
+            frames = decode_frames(request)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
+        tolerance = request.args.get("tolerance", type=float)
+        results = service.recognize(frames, subject, tolerance)
+
+        marked = []
+        if subject is not None and request.args.get("mark") in ("1", "true", "yes"):
+            for roll_no in sorted({face["roll_no"] for faces in results for face in faces if face["roll_no"]}):
+                if service.mark(roll_no, subject):
+                    marked.append(roll_no)
+        return jsonify(frames=[{"faces": faces} for faces in results], marked=marked)
+
+    @app.route('/mark', methods=['POST'])
+    def mark():
+        """Record attendance for one student: JSON or form with roll_no, subject[, status, date]."""
+        payload = request.get_json(silent=True) or request.form
+        roll_no, subject = payload.get("roll_no"), payload.get("subject")
+        if not roll_no or not subject:
+            return jsonify(error="roll_no and subject are required"), 400
+        status = payload.get("status", "Present")
+        if status not in ("Present", "Absent"):
+            return jsonify(error="status must be Present or Absent"), 400
+        date = payload.get("date") or None
+        if date is not None and not valid_date(date):
+            return jsonify(error="date must be in the YYYY-MM-DD format"), 400
+        try:
+            marked = service.mark(str(roll_no), subject, status, date)
+        except KeyError as e:
+            return jsonify(error=e.args[0]), 404
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        return jsonify(roll_no=str(roll_no), subject=subject, status=status, marked=marked)
+
+    @app.route('/take_attendance', methods=['GET', 'POST'])
+    def take_attendance():
+        """Handle the attendance taking process."""
+        if request.method == 'POST':
+            subject = request.form['subject']
+            return render_template('attendance.html', subject=subject)
+
+        # Show available subjects
+        return render_template('attendance.html', subjects=service.subjects)
+
+    @app.route('/mark_absentees', methods=['GET', 'POST'])
+    def mark_absentees():
+        """Mark students as absent."""
+        if request.method == 'POST':
+            subject = request.form.get('subject')
+            if not subject:
+                return jsonify(error="subject is required"), 400
+            if subject not in service.subjects:
+                return jsonify(error=f"Unknown subject {subject}"), 404
+            date = request.form.get('date') or datetime.now().strftime("%Y-%m-%d")
+            if not valid_date(date):
+                return jsonify(error="date must be in the YYYY-MM-DD format"), 400
+            service.mark_absentees(subject, date)
+            return redirect(url_for('index'))
+
+        return render_template('absentees.html', subjects=service.subjects)
 
-app = Flask(__name__)
-
-@app.route('/')
-def index():
-    """Render the home page."""
-    return render_template('index.html')
-
-@app.route('/take_attendance', methods=['GET', 'POST'])
-def take_attendance():
-    """Handle the attendance taking process."""
-    if request.method == 'POST':
-        # Handle the taking attendance process here
-        subject = request.form['subject']
-        
-        # Call the existing function to take attendance here
-        # For example: take_attendance_function(subject)
-
-        # You can use the webcam or integrate it as a service
-        return render_template('attendance.html', subject=subject)
-    
-    # Show available subjects
-    students_data = load_students_data()
-    all_subjects = set()
-    for data in students_data.values():
-        all_subjects.update(data.get("subjects", []))
-    
-    subjects_list = sorted(list(all_subjects))
-    return render_template('attendance.html', subjects=subjects_list)
-
-@app.route('/mark_absentees', methods=['GET', 'POST'])
-def mark_absentees():
-    """Mark students as absent."""
-    if request.method == 'POST':
-        subject = request.form['subject']
-        date = request.form['date']
-        
-        # Call the function to mark absentees
-        # For example: mark_absentees_function(subject, date)
-        
-        return redirect(url_for('index'))
-
-    students_data = load_students_data()
-    all_subjects = set()
-    for data in students_data.values():
-        all_subjects.update(data.get("subjects", []))
-    
-    subjects_list = sorted(list(all_subjects))
-    return render_template('absentees.html', subjects=subjects_list)
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True, threaded=True, use_reloader=False)
@@ -0,0 +1,332 @@
+"""
+Hot-path instrumentation for the attendance loop.
+
+SessionMetrics keeps fixed-bucket histograms of per-stage latency, faces per
+frame and match distances, plus dropped-frame counters. Recording a value is a
+bisect and two integer updates, so it is cheap enough to run on every frame.
+
+The same values are mirrored into Prometheus metrics (when prometheus_client
+is installed) and can be served on a local endpoint in the Prometheus text
+format. The endpoint is started once per process; each new session swaps its
+collectors into the served registry. At the end of a session the metrics are
+summarized into a dict that is printed and saved as JSON.
+
+Usage:
+    serve_metrics(9100)                  # http://127.0.0.1:9100/metrics
+    metrics = SessionMetrics(subject="Maths")
+    with metrics.time("draw"):
+        ...
+    metrics.save_summary()
+"""
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+SESSIONS_DIR = "attendance_sessions"
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+FACES_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+DISTANCE_BUCKETS = (0.1, 0.2, 0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6, 0.7, 0.8, 1.0)
+
+STAGES = ("capture", "gate", "detect", "encode", "match", "draw", "write", "end_to_end")
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Approximate q-quantile, interpolated within its bucket and clipped to the observed range."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else self.min
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                value = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(max(value, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def summary(self, scale=1.0):
+        """Count, mean, approximate p50/p95 and max, multiplied by scale."""
+        if not self.count:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count * scale,
+            "p50": self.quantile(0.5) * scale,
+            "p95": self.quantile(0.95) * scale,
+            "max": self.max * scale,
+        }
+
+# Registry served by the process-wide endpoint, the collectors of the current
+# session registered in it, and the address of the running endpoint
+_served_registry = None
+_served_collectors = []
+_server_address = None
+_serve_lock = threading.Lock()
+
+def _process_registry():
+    """The registry served by serve_metrics(), created on first use."""
+    global _served_registry
+    if _served_registry is None:
+        from prometheus_client import CollectorRegistry
+        _served_registry = CollectorRegistry()
+    return _served_registry
+
+def _swap_in(collectors):
+    """Replace the collectors of the previous session in the served registry with collectors."""
+    global _served_collectors
+    with _serve_lock:
+        registry = _process_registry()
+        for collector in _served_collectors:
+            registry.unregister(collector)
+        for collector in collectors:
+            registry.register(collector)
+        _served_collectors = list(collectors)
+
+def serve_metrics(port, addr="127.0.0.1"):
+    """
+    Serve the current session's metrics in the Prometheus text format on http://addr:port/metrics.
+
+    The endpoint is started once per process; later calls are no-ops, so it can
+    be called before every session.
+
+    Returns:
+        True if the endpoint is running, False without prometheus_client
+    """
+    global _server_address
+    try:
+        from prometheus_client import start_http_server
+    except ImportError:
+        print("Metrics endpoint needs prometheus_client: pip install prometheus_client")
+        return False
+    with _serve_lock:
+        if _server_address is None:
+            start_http_server(port, addr=addr, registry=_process_registry())
+            _server_address = (addr, port)
+            print(f"Serving metrics on http://{addr}:{port}/metrics")
+        elif _server_address != (addr, port):
+            print(f"Metrics are already served on http://{_server_address[0]}:{_server_address[1]}/metrics")
+    return True
+
+def _prometheus_metrics():
+    """
+    Create the Prometheus metrics in their own registry and swap them into the
+    served registry, or return None without prometheus_client.
+    """
+    try:
+        from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram as PromHistogram
+    except ImportError:
+        return None
+
+    registry = CollectorRegistry()
+    metrics = {
+        "registry": registry,
+        "stage_seconds": PromHistogram("attendance_stage_seconds", "Latency of each attendance loop stage",
+                                       ["stage"], buckets=LATENCY_BUCKETS, registry=registry),
+        "faces_per_frame": PromHistogram("attendance_faces_per_frame", "Faces detected per processed frame",
+                                         buckets=FACES_BUCKETS, registry=registry),
+        "match_distance": PromHistogram("attendance_match_distance", "Distance to the closest gallery face",
+                                        buckets=DISTANCE_BUCKETS, registry=registry),
+        "dropped": Counter("attendance_dropped_frames", "Frames dropped by each stage", ["stage"],
+                           registry=registry),
+        "marked": Counter("attendance_marked_students", "Students marked present", registry=registry),
+        "skipped": Counter("attendance_skipped_frames", "Frames that skipped detection, by reason", ["reason"],
+                           registry=registry),
+        "info": Gauge("attendance_session_start_seconds", "Start time of the session", ["subject"],
+                      registry=registry),
+        "scale": Gauge("attendance_detection_scale", "Detection scale chosen by the controller", registry=registry),
+        "skip": Gauge("attendance_frame_skip", "Frames skipped after each processed frame", registry=registry),
+        "roi": Gauge("attendance_roi_enabled", "1 while detection is cropped to a region of interest",
+                     registry=registry),
+    }
+    _swap_in([collector for name, collector in metrics.items() if name != "registry"])
+    return metrics
+
+class SessionMetrics:
+    """Per-stage timers, histograms and counters for one attendance session."""
+
+    def __init__(self, subject=None):
+        """
+        Args:
+            subject: Subject of the session, included in the summary
+        """
+        self.subject = subject
+        self.started_at = datetime.now()
+        self.stages = {stage: Histogram(LATENCY_BUCKETS) for stage in STAGES}
+        self.dropped = {stage: 0 for stage in STAGES}
+        self.faces = Histogram(FACES_BUCKETS)
+        self.distances = Histogram(DISTANCE_BUCKETS)
+        self.unknown_faces = 0
+        self.marked = 0
+        self.skipped = {}
+        self.controller = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._prometheus = _prometheus_metrics()
+        if self._prometheus:
+            self._prometheus["info"].labels(subject=subject or "").set(self.started_at.timestamp())
+
+    def observe(self, stage, seconds):
+        """Record the latency of one run of a stage."""
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram(LATENCY_BUCKETS)
+                self.dropped[stage] = 0
+            self.stages[stage].observe(seconds)
+        if self._prometheus:
+            self._prometheus["stage_seconds"].labels(stage=stage).observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        """Context manager timing the enclosed block as one run of stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def drop(self, stage):
+        """Count a frame dropped by a stage."""
+        with self._lock:
+            self.dropped[stage] = self.dropped.get(stage, 0) + 1
+        if self._prometheus:
+            self._prometheus["dropped"].labels(stage=stage).inc()
+
+    def skip(self, reason):
+        """Count a frame that skipped detection on purpose (e.g. "motion" or "controller")."""
+        with self._lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+        if self._prometheus:
+            self._prometheus["skipped"].labels(reason=reason).inc()
+
+    def observe_frame(self, match_indices, distances):
+        """Record the number of faces in a matched frame and their match distances."""
+        with self._lock:
+            self.faces.observe(len(match_indices))
+            for index, distance in zip(match_indices, distances):
+                if index < 0:
+                    self.unknown_faces += 1
+                if distance != float("inf"):
+                    self.distances.observe(float(distance))
+        if self._prometheus:
+            self._prometheus["faces_per_frame"].observe(len(match_indices))
+            for distance in distances:
+                if distance != float("inf"):
+                    self._prometheus["match_distance"].observe(float(distance))
+
+    def observe_settings(self, controller):
+        """Record the settings chosen by an AdaptiveController."""
+        scale, skip, use_roi = controller.levels[controller.level]
+        with self._lock:
+            self.controller = {"scale": scale, "skip": skip, "roi": use_roi, "changes": controller.changes,
+                               "skipped_frames": controller.skipped}
+        if self._prometheus:
+            self._prometheus["scale"].set(scale)
+            self._prometheus["skip"].set(skip)
+            self._prometheus["roi"].set(int(use_roi))
+
+    def mark(self):
+        """Count a student marked present."""
+        with self._lock:
+            self.marked += 1
+        if self._prometheus:
+            self._prometheus["marked"].inc()
+
+    def serve(self, port, addr="127.0.0.1"):
+        """Serve the metrics on http://addr:port/metrics, see serve_metrics()."""
+        return serve_metrics(port, addr)
+
+    def prometheus_text(self):
+        """Current metrics in the Prometheus text format (empty without prometheus_client)."""
+        if not self._prometheus:
+            return ""
+        from prometheus_client import generate_latest
+        return generate_latest(self._prometheus["registry"]).decode()
+
+    def summary(self):
+        """
+        Structured summary of the session.
+
+        Returns:
+            Dict with the session info, per-stage latency in ms, dropped frames,
+            faces per frame and match distances
+        """
+        with self._lock:
+            elapsed = time.perf_counter() - self._start
+            frames = self.stages["end_to_end"].count
+            return {
+                "subject": self.subject,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "duration_s": elapsed,
+                "frames": frames,
+                "skipped_frames": dict(self.skipped),
+                "fps": frames / elapsed if elapsed > 0 else 0.0,
+                "marked": self.marked,
+                "unknown_faces": self.unknown_faces,
+                "stages_ms": {stage: dict(histogram.summary(1000), dropped=self.dropped[stage])
+                              for stage, histogram in self.stages.items() if histogram.count or self.dropped[stage]},
+                "faces_per_frame": self.faces.summary(),
+                "match_distance": self.distances.summary(),
+                "controller": self.controller,
+            }
+
+    def format_summary(self):
+        """The session summary as a printable table."""
+        s = self.summary()
+        lines = [f"Session: {s['frames']} frames in {s['duration_s']:.1f}s ({s['fps']:.2f} FPS), "
+                 f"{s['marked']} marked, {s['unknown_faces']} unknown faces",
+                 f"{'Stage':<12} {'Count':>7} {'Dropped':>8} {'Mean ms':>9} {'P50 ms':>9} {'P95 ms':>9} {'Max ms':>9}",
+                 "=" * 68]
+        for stage, t in s["stages_ms"].items():
+            lines.append(f"{stage:<12} {t['count']:>7} {t['dropped']:>8} {t['mean']:>9.2f} "
+                         f"{t['p50']:>9.2f} {t['p95']:>9.2f} {t['max']:>9.2f}")
+        faces, distances = s["faces_per_frame"], s["match_distance"]
+        lines.append(f"Faces per frame: mean {faces['mean']:.2f}, max {faces['max']:.0f}")
+        if s["skipped_frames"]:
+            lines.append("Skipped detection: " + ", ".join(f"{count} frames ({reason})"
+                                                        for reason, count in s["skipped_frames"].items()))
+        if distances["count"]:
+            lines.append(f"Match distance: mean {distances['mean']:.3f}, p50 {distances['p50']:.2f}, "
+                         f"p95 {distances['p95']:.2f}")
+        return "\n".join(lines)
+
+    def save_summary(self, directory=SESSIONS_DIR):
+        """
+        Save the session summary as JSON.
+
+        Returns:
+            Path of the written file
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = self.started_at.strftime("%Y%m%d_%H%M%S")
+        if self.subject:
+            name += "_" + "".join(c if c.isalnum() else "_" for c in self.subject)
+        file_path = os.path.join(directory, f"{name}.json")
+        with open(file_path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        return file_path
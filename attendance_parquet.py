@@ -0,0 +1,184 @@
+"""
+Columnar attendance archive: Parquet files partitioned by date and subject.
+
+The archive is a hive-partitioned dataset
+(attendance_parquet/Date=2024-01-15/Subject=Maths/part-*.parquet) with the
+same columns as attendance.xlsx. Readers only open the partitions matching
+a subject or date range and only decode the columns they need, and records
+are read batch by batch so memory stays flat as the history grows.
+
+Requires pyarrow (pip install pyarrow).
+
+Usage:
+    python attendance_parquet.py convert attendance.xlsx
+    python attendance_parquet.py export
+"""
+import os
+import uuid
+import shutil
+import argparse
+import pandas as pd
+from attendance_store import ATTENDANCE_COLUMNS, ATTENDANCE_EXCEL, normalize_attendance_frame, open_attendance_store
+
+PARQUET_DIR = "attendance_parquet"
+PARTITION_COLUMNS = ["Date", "Subject"]
+
+# Rows read from the source per written chunk
+CHUNK_ROWS = 100000
+
+def _arrow():
+    """Import pyarrow lazily, it is only needed for the Parquet archive."""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        return pyarrow
+    except ImportError:
+        raise ImportError("The Parquet attendance archive needs pyarrow: pip install pyarrow")
+
+def _schema(pa):
+    return pa.schema([(column, pa.string()) for column in ATTENDANCE_COLUMNS])
+
+def _partitioning(pa):
+    return pa.dataset.partitioning(pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]),
+                                   flavor="hive")
+
+class ParquetArchiveWriter:
+    """Append attendance records to a partitioned Parquet archive chunk by chunk."""
+
+    def __init__(self, root=PARQUET_DIR, overwrite=False):
+        """
+        Args:
+            root: Directory of the archive
+            overwrite: Remove an existing archive first (otherwise it must be empty)
+        """
+        if os.path.isdir(root) and os.listdir(root):
+            if not overwrite:
+                raise FileExistsError(f"Parquet archive {root} already exists; use overwrite to replace it")
+            shutil.rmtree(root)
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.rows = 0
+        self._pa = _arrow()
+
+    def write(self, df):
+        """Write a DataFrame with the ATTENDANCE_COLUMNS to the archive."""
+        if df.empty:
+            return
+        pa = self._pa
+        df = normalize_attendance_frame(df)
+        table = pa.Table.from_pandas(df, schema=_schema(pa), preserve_index=False)
+        pa.dataset.write_dataset(table, self.root, format="parquet", partitioning=_partitioning(pa),
+                                 basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                                 existing_data_behavior="overwrite_or_ignore")
+        self.rows += len(df)
+
+def convert_excel_to_parquet(excel_path=ATTENDANCE_EXCEL, root=PARQUET_DIR, overwrite=False, chunk_rows=CHUNK_ROWS):
+    """
+    Convert an attendance.xlsx into a partitioned Parquet archive.
+
+    The workbook is streamed row by row in read-only mode, so it is never
+    loaded into memory as a whole.
+
+    Returns:
+        Number of records converted
+    """
+    from openpyxl import load_workbook
+
+    writer = ParquetArchiveWriter(root, overwrite)
+    workbook = load_workbook(excel_path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value) for value in next(rows, ())]
+        missing = [column for column in ATTENDANCE_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"{excel_path} is missing the columns: {', '.join(missing)}")
+
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                writer.write(pd.DataFrame(chunk, columns=header))
+                chunk = []
+        writer.write(pd.DataFrame(chunk, columns=header))
+    finally:
+        workbook.close()
+
+    print(f"Converted {writer.rows} attendance records from {excel_path} to {root}")
+    return writer.rows
+
+def export_store_to_parquet(attendance_store, root=PARQUET_DIR, overwrite=False, chunk_rows=CHUNK_ROWS):
+    """
+    Export the SQLite attendance log into a partitioned Parquet archive.
+
+    Returns:
+        Number of records exported
+    """
+    writer = ParquetArchiveWriter(root, overwrite)
+    for chunk in attendance_store.iter_dataframes(chunk_rows):
+        writer.write(chunk)
+
+    print(f"Exported {writer.rows} attendance records to {root}")
+    return writer.rows
+
+def iter_attendance_batches(root=PARQUET_DIR, columns=None, subject=None, start_date=None, end_date=None,
+                            roll_nos=None, batch_rows=CHUNK_ROWS):
+    """
+    Stream attendance records from the archive.
+
+    Only partitions matching subject and the date range are opened, and only
+    the requested columns are decoded.
+
+    Args:
+        root: Directory of the archive
+        columns: Columns to read (defaults to all ATTENDANCE_COLUMNS)
+        subject: Only read records for this subject
+        start_date: Only read records on or after this date (YYYY-MM-DD)
+        end_date: Only read records on or before this date (YYYY-MM-DD)
+        roll_nos: Only read records of these roll numbers
+        batch_rows: Maximum rows per yielded DataFrame
+
+    Yields:
+        DataFrames with the requested columns
+    """
+    pa = _arrow()
+    import pyarrow.compute as pc
+
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"Parquet archive not found: {root}")
+    dataset = pa.dataset.dataset(root, format="parquet", schema=_schema(pa), partitioning=_partitioning(pa))
+
+    conditions = []
+    if subject is not None:
+        conditions.append(pc.field("Subject") == subject)
+    if start_date is not None:
+        conditions.append(pc.field("Date") >= start_date)
+    if end_date is not None:
+        conditions.append(pc.field("Date") <= end_date)
+    if roll_nos is not None:
+        conditions.append(pc.field("Roll No").isin(pa.array(list(roll_nos), type=pa.string())))
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    scanner = dataset.scanner(columns=columns or ATTENDANCE_COLUMNS, filter=expression, batch_size=batch_rows)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Parquet attendance archive")
+    parser.add_argument("command", choices=["convert", "export"],
+                        help="convert: from an attendance.xlsx; export: from the attendance database")
+    parser.add_argument("excel", nargs="?", default=ATTENDANCE_EXCEL, help="Workbook to convert")
+    parser.add_argument("--output", default=PARQUET_DIR, help="Archive directory")
+    parser.add_argument("--overwrite", action="store_true", help="Replace an existing archive")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert_excel_to_parquet(args.excel, args.output, overwrite=args.overwrite)
+    else:
+        with open_attendance_store() as attendance_store:
+            export_store_to_parquet(attendance_store, args.output, overwrite=args.overwrite)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,541 @@
+"""
+Multi-threaded capture -> detect/encode -> match -> write pipeline for taking attendance.
+
+Stages are connected by bounded queues:
+- capture thread: reads frames from the video source; when the detection
+  queue is full the oldest frame is dropped so workers always get fresh frames
+- worker pool: runs face detection and encoding (dlib releases the GIL)
+- matcher thread: matches all faces of a frame against the gallery in one
+  batch, drops results older than the last matched frame. With a FaceTracker
+  the workers only encode the faces whose track is expected to need a fresh
+  identity, and the matcher thread carries identities forward on the rest.
+  With a DetectionScheduler the workers only resize frames, and the matcher
+  thread runs the detector every Nth frame, propagating boxes in between. With an AdaptiveController the
+  detection scale, frame skipping and region of interest follow a latency
+  budget
+- writer thread: records attendance for newly recognized students
+
+Each worker ends its output with a None sentinel; the matcher drains its
+queue until every worker's sentinel arrived, so no frame is lost on shutdown.
+
+For recorded video, drop_frames=False turns off dropping: the capture thread
+waits for the workers and frames are matched in capture order.
+"""
+import os
+import time
+import queue
+import threading
+from collections import deque, namedtuple
+import cv2
+import numpy as np
+from face_detection_utils import detect_face_locations, encode_faces
+from face_detectors import FaceDetector, get_detector
+from face_tracker import FaceTracker
+
+# Result of one processed frame; face_locations are in full-frame coordinates
+FrameResult = namedtuple('FrameResult', [
+    'frame_id', 'captured_at', 'frame', 'face_locations', 'match_indices', 'distances'
+])
+
+class StageStats:
+    """Throughput and latency counters for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.dropped = 0
+        self.latencies = []
+        self.started_at = None
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.perf_counter() - latency
+            self.count += 1
+            self.latencies.append(latency)
+
+    def drop(self):
+        with self._lock:
+            self.dropped += 1
+
+    def summary(self):
+        """Return a dict with count, dropped, fps and latency percentiles in ms."""
+        with self._lock:
+            elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+            latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+            return {
+                "stage": self.name,
+                "count": self.count,
+                "dropped": self.dropped,
+                "fps": self.count / elapsed if elapsed > 0 else 0.0,
+                "mean_ms": float(latencies.mean()),
+                "p95_ms": float(np.percentile(latencies, 95)),
+            }
+
+def resolve_detector(detector):
+    """
+    Turn a detector setting into a FaceDetector.
+
+    Args:
+        detector: None (default HOG detection), a FaceDetector, a backend name,
+                  or a dict of create_detector arguments such as {"backend": "haar"}.
+                  Names and dicts can be sent to worker processes.
+    """
+    if detector is None or isinstance(detector, FaceDetector):
+        return detector
+    if isinstance(detector, str):
+        return get_detector(detector)
+    return get_detector(**detector)
+
+def locate_faces(rgb_frame, detector=None):
+    """Detect faces with the given detector, or the default HOG detection."""
+    detector = resolve_detector(detector)
+    if detector is None:
+        return detect_face_locations(rgb_frame)
+    return detector.detect(rgb_frame)
+
+def detect_and_encode(frame, scale=0.25, detector=None):
+    """
+    Detect and encode faces on a downscaled copy of the frame.
+
+    Args:
+        frame: BGR frame from the video source
+        scale: Downscale factor applied before detection
+        detector: Detector setting, see resolve_detector()
+
+    Returns:
+        face_locations: Face locations scaled back to the full frame
+        face_encodings: List of 128-dimensional face encodings
+    """
+    rgb_small_frame, face_locations = detect_only(frame, scale, detector)
+    face_encodings = encode_faces(rgb_small_frame, face_locations)
+    return scale_locations(face_locations, scale), face_encodings
+
+def detect_and_encode_prepared(rgb_small_frame, detector=None):
+    """
+    Detect and encode faces on a frame already downscaled and converted by prepare_frame().
+
+    Sending the small RGB frame instead of the full BGR frame keeps what is
+    pickled to a worker process small.
+
+    Returns:
+        face_locations: Face locations in rgb_small_frame coordinates
+        face_encodings: List of 128-dimensional face encodings
+    """
+    face_locations = locate_faces(rgb_small_frame, detector)
+    return face_locations, encode_faces(rgb_small_frame, face_locations)
+
+def detect_only(frame, scale=0.25, detector=None):
+    """
+    Detect faces on a downscaled copy of the frame without encoding them.
+
+    Returns:
+        rgb_small_frame: The downscaled RGB frame, for encoding faces later
+        face_locations: Face locations in rgb_small_frame coordinates
+    """
+    rgb_small_frame, _ = prepare_frame(frame, scale)
+    return rgb_small_frame, locate_faces(rgb_small_frame, detector)
+
+def prepare_frame(frame, scale=0.25):
+    """Downscale the frame and convert it to RGB; detection is left to a DetectionScheduler."""
+    small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    return cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB), None
+
+def scale_locations(face_locations, scale, offset=(0, 0)):
+    """
+    Map face locations found on a frame resized by scale back to the original frame.
+
+    Args:
+        offset: (left, top) of the region the resized frame was cropped from
+    """
+    x, y = offset
+    return [(int(top / scale) + y, int(right / scale) + x, int(bottom / scale) + y, int(left / scale) + x)
+            for top, right, bottom, left in face_locations]
+
+def crop_region(frame, roi):
+    """
+    Crop a (top, right, bottom, left) region of interest from the frame.
+
+    Returns:
+        (cropped frame, (left, top) offset); the whole frame if roi is None or empty
+    """
+    if roi is None:
+        return frame, (0, 0)
+    height, width = frame.shape[:2]
+    top, right, bottom, left = max(roi[0], 0), min(roi[1], width), min(roi[2], height), max(roi[3], 0)
+    if bottom - top < 2 or right - left < 2:
+        return frame, (0, 0)
+    return frame[top:bottom, left:right], (left, top)
+
+class AttendancePipeline:
+    """Run capture, detection/encoding, matching and attendance writes concurrently."""
+
+    def __init__(self, video_source, matcher, on_recognized, num_workers=None, queue_size=None,
+                 scale=0.25, tolerance=None, tracker=None, scheduler=None, detector=None, metrics=None,
+                 drop_frames=True, on_frame=None, controller=None, motion_gate=None, cache=None):
+        """
+        Args:
+            video_source: Object with a read() -> (ret, frame) method, e.g. cv2.VideoCapture
+            matcher: GalleryMatcher for the enrolled faces
+            on_recognized: Callback on_recognized(gallery_index) run on the writer
+                           thread the first time each identity (see
+                           GalleryMatcher labels) is recognized
+            num_workers: Number of detection/encoding threads (default: CPU count)
+            queue_size: Maximum frames waiting for detection (default: num_workers)
+            scale: Downscale factor applied before detection
+            tolerance: Match tolerance (defaults to the matcher's tolerance)
+            tracker: FaceTracker used to skip encoding faces with a known identity (optional)
+            scheduler: DetectionScheduler to detect only every Nth frame (optional,
+                       implies a FaceTracker)
+            detector: Face detector backend, see resolve_detector() (default: HOG)
+            metrics: SessionMetrics that also receives stage latencies, drops,
+                     faces per frame and match distances (optional)
+            drop_frames: Drop stale frames under backpressure to stay live. With
+                         False every frame is processed, in capture order, at the
+                         pace the workers manage (for recorded video)
+            on_frame: Callback on_frame(FrameResult) run on the matcher thread for
+                      every matched frame (optional)
+            controller: AdaptiveController that picks the detection scale, frame
+                        skipping and region of interest per frame (optional; the
+                        scale argument is then ignored)
+            motion_gate: MotionGate that skips detection on unchanged frames (their
+                         faces are carried over from the previous frame) and limits
+                         it to the changed region otherwise (optional)
+            cache: EncodingCache that detection and encoding results are read from
+                   and written to, keyed by the downscaled frame (optional; not
+                   used with a scheduler)
+        """
+        if scheduler is not None and (controller is not None or motion_gate is not None):
+            raise ValueError("A DetectionScheduler cannot be combined with an AdaptiveController or a MotionGate")
+        self.video_source = video_source
+        self.matcher = matcher
+        self.on_recognized = on_recognized
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.scale = scale
+        self.tolerance = tolerance
+        self.detector = resolve_detector(detector)
+        self.scheduler = scheduler
+        if scheduler is not None and tracker is None:
+            tracker = FaceTracker()
+        self.tracker = tracker
+        self.metrics = metrics
+        self.drop_frames = drop_frames
+        self.on_frame = on_frame
+        self.controller = controller
+        self.motion_gate = motion_gate
+        self.cache = cache
+
+        self._frames = queue.Queue(maxsize=queue_size or self.num_workers)
+        self._detections = queue.Queue(maxsize=2 * self.num_workers)
+        self._marks = queue.Queue()
+        self._stop_event = threading.Event()
+        self._capture_done = threading.Event()
+        self._threads = []
+        self._latest = None
+        self._last_frame_id = -1
+        self._recognized = set()
+        # Frame ids in capture order, for matching in order when frames are not dropped
+        self._sequence = deque()
+
+        stages = ("capture", "gate", "detect", "encode", "match", "write", "end_to_end")
+        self.stats = {name: StageStats(name) for name in stages if name != "gate" or motion_gate is not None}
+
+    def _record(self, stage, latency):
+        self.stats[stage].record(latency)
+        if self.metrics is not None:
+            self.metrics.observe(stage, latency)
+
+    def _drop(self, stage):
+        self.stats[stage].drop()
+        if self.metrics is not None:
+            self.metrics.drop(stage)
+
+    def start(self):
+        """Start all pipeline threads."""
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True)]
+        self._threads += [threading.Thread(target=self._detect_loop, daemon=True)
+                          for _ in range(self.num_workers)]
+        self._threads.append(threading.Thread(target=self._match_loop, daemon=True))
+        self._threads.append(threading.Thread(target=self._write_loop, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop capturing, finish pending attendance writes and join all threads."""
+        self._stop_event.set()
+        self._capture_done.set()
+        for thread in self._threads:
+            thread.join()
+
+    def is_running(self):
+        """False once the video source is exhausted and all frames were processed."""
+        return not self._stop_event.is_set() and any(thread.is_alive() for thread in self._threads[:-1])
+
+    def latest(self):
+        """Most recent FrameResult, or None before the first frame is matched."""
+        return self._latest
+
+    def _capture_loop(self):
+        frame_id = 0
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = self.video_source.read()
+            if not ret:
+                break
+            self._record("capture", time.perf_counter() - start)
+
+            frame_id += 1
+            if self.controller is not None and not self.controller.should_process():
+                if self.metrics is not None:
+                    self.metrics.skip("controller")
+                continue
+
+            # (changed, region) from the motion gate; None searches the whole frame
+            motion = None
+            if self.motion_gate is not None:
+                start = time.perf_counter()
+                motion = self._gate(frame)
+                self._record("gate", time.perf_counter() - start)
+                if not motion[0] and self.metrics is not None:
+                    self.metrics.skip("motion")
+            item = (frame_id - 1, time.perf_counter(), frame, motion)
+            if not self.drop_frames:
+                self._sequence.append(item[0])
+            while not self.drop_frames and not self._stop_event.is_set():
+                try:
+                    self._frames.put(item, timeout=0.05)
+                    break
+                except queue.Full:
+                    pass
+            while self.drop_frames:
+                try:
+                    self._frames.put_nowait(item)
+                    break
+                except queue.Full:
+                    # Backpressure: drop the stalest waiting frame, keep the new one
+                    try:
+                        self._frames.get_nowait()
+                        self._drop("capture")
+                    except queue.Empty:
+                        pass
+        self._capture_done.set()
+
+    def _gate(self, frame):
+        """Run the motion gate, growing a changed region to cover the faces already in view."""
+        changed, region = self.motion_gate.check(frame)
+        latest = self._latest
+        if region is not None and latest is not None and latest.face_locations:
+            boxes = list(latest.face_locations) + [region]
+            region = (min(box[0] for box in boxes), max(box[1] for box in boxes),
+                      max(box[2] for box in boxes), min(box[3] for box in boxes))
+        return changed, region
+
+    def _detect_loop(self):
+        try:
+            self._detect_frames()
+        finally:
+            # Tell the matcher this worker is done
+            self._detections.put(None)
+
+    def _detect_frames(self):
+        while True:
+            try:
+                frame_id, captured_at, frame, motion = self._frames.get(timeout=0.05)
+            except queue.Empty:
+                # The capture thread sets the event after its last put
+                if self._capture_done.is_set() and self._frames.empty():
+                    return
+                continue
+
+            # Nothing changed: the matcher carries the previous frame's faces over
+            if motion is not None and not motion[0]:
+                self._detections.put((frame_id, captured_at, frame, None, None))
+                continue
+
+            # Scale and crop offset the detections are relative to
+            geometry = (self.scale, (0, 0))
+            start = time.perf_counter()
+            if self.scheduler is not None:
+                detection = prepare_frame(frame, self.scale)
+            else:
+                scale, roi = self.scale, None
+                if self.controller is not None:
+                    settings = self.controller.settings()
+                    scale, roi = settings.scale, settings.roi
+                if motion is not None and motion[1] is not None:
+                    roi = motion[1]
+                region, offset = crop_region(frame, roi)
+                geometry = (scale, offset)
+                if self.cache is not None:
+                    rgb_small_frame, _ = prepare_frame(region, scale)
+                    small_locations, face_encodings = self.cache.locate_and_encode(rgb_small_frame, self.detector)
+                    # Cached results come with every face encoded
+                    face_locations = scale_locations(small_locations, *geometry)
+                    detection = ((face_locations, face_encodings) if self.tracker is None else
+                                 (rgb_small_frame, small_locations, dict(zip(face_locations, face_encodings))))
+                    self._record("detect", time.perf_counter() - start)
+                    self._detections.put((frame_id, captured_at, frame, detection, geometry))
+                    continue
+                detection = detect_only(region, scale, self.detector)
+            self._record("detect", time.perf_counter() - start)
+
+            if self.scheduler is None and self.tracker is None:
+                rgb_small_frame, small_locations = detection
+                start = time.perf_counter()
+                face_encodings = encode_faces(rgb_small_frame, small_locations)
+                self._record("encode", time.perf_counter() - start)
+                detection = (scale_locations(small_locations, *geometry), face_encodings)
+            elif self.scheduler is None:
+                detection = self._encode_ahead(*detection, geometry)
+            self._detections.put((frame_id, captured_at, frame, detection, geometry))
+
+    def _encode_ahead(self, rgb_small_frame, small_locations, geometry):
+        """
+        Encode the faces the tracker is expected to need, on the worker thread.
+
+        Returns:
+            (rgb_small_frame, small_locations, encodings keyed by full-frame box)
+        """
+        face_locations = scale_locations(small_locations, *geometry)
+        # Frames still ahead in the queues age the tracks before this one is matched
+        needed = self.tracker.predict_encoding(face_locations, lookahead=self.num_workers)
+        boxes = [i for i, need in enumerate(needed) if need]
+        start = time.perf_counter()
+        encodings = encode_faces(rgb_small_frame, [small_locations[i] for i in boxes])
+        self._record("encode", time.perf_counter() - start)
+        return rgb_small_frame, small_locations, {face_locations[i]: encoding for i, encoding in zip(boxes, encodings)}
+
+    def _match_loop(self):
+        # Without dropping, results that finish early wait here for the frames before them
+        waiting = {}
+        finished_workers = 0
+        while finished_workers < self.num_workers:
+            item = self._detections.get()
+            if item is None:
+                finished_workers += 1
+                continue
+
+            if self.drop_frames:
+                # Workers finish out of order; a result older than the shown one is stale
+                if item[0] < self._last_frame_id:
+                    self._drop("match")
+                    continue
+                self._match_frame(*item)
+                continue
+
+            waiting[item[0]] = item
+            while self._sequence and self._sequence[0] in waiting:
+                self._match_frame(*waiting.pop(self._sequence.popleft()))
+
+        # Frames queued behind one that stop() kept from being captured
+        for frame_id in sorted(waiting):
+            self._match_frame(*waiting[frame_id])
+        self._marks.put(None)
+
+    def _match_frame(self, frame_id, captured_at, frame, detection, geometry):
+        """Match the faces of one frame and queue attendance for new identities."""
+        if detection is None:
+            # Skipped by the motion gate; the scene and its faces are unchanged
+            previous = self._latest
+            empty = np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+            face_locations, match_indices, distances = (
+                (previous.face_locations, previous.match_indices, previous.distances) if previous is not None
+                else ([], *empty))
+            self._last_frame_id = frame_id
+            self._latest = FrameResult(frame_id, captured_at, frame, face_locations, match_indices, distances)
+            self._record("end_to_end", time.perf_counter() - captured_at)
+            if self.on_frame is not None:
+                self.on_frame(self._latest)
+            return
+
+        start = time.perf_counter()
+        if self.scheduler is not None:
+            rgb_small_frame, _ = detection
+            small_locations, _ = self.scheduler.locate(rgb_small_frame)
+            detection = (rgb_small_frame, small_locations, {})
+        if self.tracker is not None:
+            face_locations, match_indices, distances = self._track_and_match(*detection, geometry)
+        else:
+            face_locations, face_encodings = detection
+            match_indices, distances, _ = self.matcher.match(face_encodings, self.tolerance)
+        self._record("match", time.perf_counter() - start)
+
+        self._last_frame_id = frame_id
+        self._latest = FrameResult(frame_id, captured_at, frame, face_locations, match_indices, distances)
+        latency = time.perf_counter() - captured_at
+        self._record("end_to_end", latency)
+        if self.controller is not None:
+            queue_depth = self._frames.qsize() + self._detections.qsize()
+            tolerance = self.matcher.tolerance if self.tolerance is None else self.tolerance
+            if self.controller.update(latency, queue_depth, face_locations, distances, tolerance) \
+                    and self.metrics is not None:
+                self.metrics.observe_settings(self.controller)
+        if self.metrics is not None:
+            self.metrics.observe_frame(match_indices, distances)
+        if self.on_frame is not None:
+            self.on_frame(self._latest)
+
+        for index in match_indices:
+            if index >= 0 and self.matcher.identity(index) not in self._recognized:
+                self._recognized.add(self.matcher.identity(index))
+                self._marks.put(int(index))
+
+    def _track_and_match(self, rgb_small_frame, small_locations, encoded, geometry):
+        """
+        Carry identities forward on tracked faces, encoding only where needed.
+
+        Args:
+            encoded: Encodings computed ahead by the workers, keyed by full-frame box;
+                     faces the tracker needs beyond those are encoded here
+        """
+        # Tracks live in full-frame coordinates, so they survive changes of scale and crop
+        face_locations = scale_locations(small_locations, *geometry)
+        small_boxes = dict(zip(face_locations, small_locations))
+
+        def encode(boxes):
+            missing = [box for box in boxes if box not in encoded]
+            if missing:
+                start = time.perf_counter()
+                encoded.update(zip(missing, encode_faces(rgb_small_frame, [small_boxes[box] for box in missing])))
+                self._record("encode", time.perf_counter() - start)
+            return [encoded[box] for box in boxes]
+
+        tracks = self.tracker.process(face_locations, encode, self.matcher, self.tolerance)
+        match_indices = np.array([track.index for track in tracks], dtype=np.intp)
+        distances = np.array([track.distance for track in tracks], dtype=np.float32)
+        return face_locations, match_indices, distances
+
+    def _write_loop(self):
+        while True:
+            index = self._marks.get()
+            if index is None:
+                return
+            start = time.perf_counter()
+            try:
+                self.on_recognized(index)
+            except Exception as e:
+                print(f"Error recording attendance: {e}")
+            self._record("write", time.perf_counter() - start)
+
+    def format_stats(self):
+        """Per-stage FPS and latency as a printable table."""
+        lines = [f"{'Stage':<12} {'Count':>7} {'Dropped':>8} {'FPS':>8} {'Mean ms':>9} {'P95 ms':>9}",
+                 "=" * 58]
+        for stats in self.stats.values():
+            s = stats.summary()
+            lines.append(f"{s['stage']:<12} {s['count']:>7} {s['dropped']:>8} {s['fps']:>8.2f} "
+                         f"{s['mean_ms']:>9.2f} {s['p95_ms']:>9.2f}")
+        if self.scheduler is not None:
+            lines.append(f"Detector ran on {self.scheduler.detections} frames, boxes propagated on "
+                         f"{self.scheduler.propagations} ({100 * self.scheduler.detection_ratio():.1f}% detected)")
+        if self.tracker is not None:
+            lines.append(f"Faces encoded: {self.tracker.encoded}, carried forward by tracking: "
+                         f"{self.tracker.reused} ({100 * self.tracker.encode_ratio():.1f}% encoded)")
+        if self.motion_gate is not None:
+            lines.append(self.motion_gate.format_stats(self.stats["detect"].summary()["mean_ms"] / 1000))
+        if self.controller is not None:
+            lines.append(f"Controller: {self.controller.changes} setting changes, "
+                         f"{self.controller.skipped} frames skipped; now {self.controller.format_settings()}")
+        return "\n".join(lines)
@@ -0,0 +1,258 @@
+"""
+Headless multi-camera attendance server.
+
+Frames from every configured source are downscaled and converted to RGB in
+the capture threads, then detected and encoded in a process pool sized to
+the CPU cores. All results are matched in the main process
+against one shared gallery matcher, built only from the students enrolled in
+the subject, and deduplicated across cameras before attendance is written.
+
+Usage:
+    python attendance_server.py --config server.json
+    python attendance_server.py --subject Maths --source 0 --source rtsp://door2/stream
+
+Example server.json:
+    {
+        "subject": "Maths",
+        "sources": [0, "rtsp://192.168.1.20/stream", "recordings/door3.mp4"],
+        "workers": 8,
+        "scale": 0.25,
+        "tolerance": 0.6,
+        "detector": {"backend": "hog", "upsample": 1}
+    }
+"""
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from face_detection_utils import initialize_directories, load_students_data
+from gallery_store import open_gallery_store
+from attendance_store import open_attendance_store
+from attendance_pipeline import StageStats, detect_and_encode_prepared, prepare_frame
+from video_sources import FileVideoSource, open_video_source
+
+def load_server_config(file_path):
+    """Load the server configuration from a JSON or YAML file."""
+    with open(file_path) as f:
+        if file_path.endswith(('.yml', '.yaml')):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+class CameraDeduplicator:
+    """Keep only the first recognition of each student across all cameras."""
+
+    def __init__(self):
+        self.first_seen = {}
+        self._lock = threading.Lock()
+
+    def is_new(self, roll_no, camera):
+        """Return True the first time roll_no is seen by any camera."""
+        with self._lock:
+            if roll_no in self.first_seen:
+                return False
+            self.first_seen[roll_no] = (camera, time.time())
+            return True
+
+class AttendanceServer:
+    """Capture from several sources and mark attendance for one subject."""
+
+    def __init__(self, sources, subject, matcher, roll_nos, students_data, attendance_store,
+                 num_workers=None, scale=0.25, tolerance=None, max_in_flight=2, pace=False, detector=None):
+        """
+        Args:
+            sources: List of source specs (device index, stream URL, video file or image folder)
+            subject: Subject to mark attendance for
+            matcher: Shared GalleryMatcher for the enrolled faces
+            roll_nos: Roll number for each gallery row of the matcher
+            students_data: Student information keyed by roll number
+            attendance_store: AttendanceStore to write marks to
+            num_workers: Size of the detection/encoding process pool (default: CPU count)
+            scale: Downscale factor applied before detection
+            tolerance: Match tolerance (defaults to the matcher's tolerance)
+            max_in_flight: Frames per source allowed in the pool before new frames are dropped
+            pace: Deliver file sources at real-time speed
+            detector: Detector backend name or dict of create_detector arguments
+                      (built once in each worker process; default: HOG)
+        """
+        self.sources = list(sources)
+        self.subject = subject
+        self.matcher = matcher
+        self.roll_nos = roll_nos
+        self.students_data = students_data
+        self.attendance_store = attendance_store
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.scale = scale
+        self.tolerance = tolerance
+        self.max_in_flight = max_in_flight
+        self.pace = pace
+        self.detector = detector
+
+        self.deduplicator = CameraDeduplicator()
+        self.marked = []
+        self.stats = {camera: StageStats(f"camera {camera}") for camera in range(len(self.sources))}
+        self._results = queue.Queue()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Ask all capture threads to stop."""
+        self._stop_event.set()
+
+    def run(self):
+        """Process all sources until they are exhausted or stop() is called."""
+        with ProcessPoolExecutor(max_workers=self.num_workers) as pool:
+            threads = [threading.Thread(target=self._capture_loop, args=(pool, camera, spec), daemon=True)
+                       for camera, spec in enumerate(self.sources)]
+            for thread in threads:
+                thread.start()
+
+            try:
+                while any(thread.is_alive() for thread in threads) or not self._results.empty():
+                    try:
+                        camera, captured_at, future = self._results.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    self._handle_result(camera, captured_at, future)
+            except KeyboardInterrupt:
+                print("\nStopping attendance server...")
+                self.stop()
+                for thread in threads:
+                    thread.join()
+                # Frames already submitted still count; write their marks before shutting down
+                self._drain()
+
+        self.attendance_store.flush()
+
+    def _drain(self):
+        """Handle the results left in the queue once the capture threads have stopped."""
+        while True:
+            try:
+                camera, captured_at, future = self._results.get_nowait()
+            except queue.Empty:
+                return
+            self._handle_result(camera, captured_at, future)
+
+    def _capture_loop(self, pool, camera, spec):
+        """Read frames from one source and submit them to the process pool."""
+        source = open_video_source(spec, pace=self.pace)
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        pending = []
+
+        # Live sources drop frames under backpressure; unpaced files wait so no frame is lost
+        is_live = self.pace or not isinstance(source, FileVideoSource)
+
+        while not self._stop_event.is_set():
+            ret, frame = source.read()
+            if not ret:
+                break
+
+            # Backpressure: skip this frame if the pool is still busy with this camera
+            if not in_flight.acquire(blocking=not is_live):
+                self.stats[camera].drop()
+                continue
+
+            captured_at = time.perf_counter()
+            # Only the small RGB frame is pickled to the worker, not the full-resolution BGR one
+            rgb_small_frame, _ = prepare_frame(frame, self.scale)
+            future = pool.submit(detect_and_encode_prepared, rgb_small_frame, self.detector)
+            future.add_done_callback(lambda _, sem=in_flight: sem.release())
+            self._results.put((camera, captured_at, future))
+            pending.append(future)
+            pending = [f for f in pending if not f.done()]
+
+        # Keep the thread alive until this camera's frames are processed
+        for future in pending:
+            future.exception()
+        source.release()
+
+    def _handle_result(self, camera, captured_at, future):
+        """Match one processed frame and record attendance for new students."""
+        try:
+            _, face_encodings = future.result()
+        except Exception as e:
+            print(f"Camera {camera}: error processing frame: {e}")
+            return
+        self.stats[camera].record(time.perf_counter() - captured_at)
+
+        match_indices, _, _ = self.matcher.match(face_encodings, self.tolerance)
+        records = []
+        for index in match_indices:
+            if index < 0:
+                continue
+            roll_no = self.roll_nos[index]
+            data = self.students_data.get(roll_no)
+            if data is None or not self.deduplicator.is_new(roll_no, camera):
+                continue
+            records.append((data["name"], roll_no, self.subject, "Present"))
+
+        if records:
+            inserted = self.attendance_store.mark_many(records)
+            names = ", ".join(name for name, _, _, _ in records)
+            print(f"Camera {camera}: {inserted} new attendance mark(s) for {names}")
+            self.marked.extend(records)
+
+    def format_stats(self):
+        """Per-camera frames processed, dropped, FPS and latency as a printable table."""
+        lines = [f"{'Source':<30} {'Frames':>7} {'Dropped':>8} {'FPS':>8} {'Mean ms':>9} {'P95 ms':>9}",
+                 "=" * 76]
+        for camera, stats in self.stats.items():
+            s = stats.summary()
+            lines.append(f"{str(self.sources[camera])[:30]:<30} {s['count']:>7} {s['dropped']:>8} "
+                         f"{s['fps']:>8.2f} {s['mean_ms']:>9.2f} {s['p95_ms']:>9.2f}")
+        return "\n".join(lines)
+
+def main():
+    """Run the attendance server from a config file or command line options."""
+    parser = argparse.ArgumentParser(description="Headless multi-camera attendance server")
+    parser.add_argument("--config", help="JSON or YAML config file")
+    parser.add_argument("--subject", help="Subject to mark attendance for")
+    parser.add_argument("--source", action="append", dest="sources",
+                        help="Device index, stream URL, video file or image folder (repeatable)")
+    parser.add_argument("--workers", type=int, help="Process pool size (default: CPU count)")
+    parser.add_argument("--scale", type=float, help="Downscale factor before detection")
+    parser.add_argument("--tolerance", type=float, help="Face match tolerance")
+    parser.add_argument("--pace", action="store_true", help="Play file sources at real-time speed")
+    parser.add_argument("--detector", help="Detector backend: hog, haar or dnn")
+    args = parser.parse_args()
+
+    config = load_server_config(args.config) if args.config else {}
+    for key in ("subject", "sources", "workers", "scale", "tolerance", "detector"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    if args.pace:
+        config["pace"] = True
+
+    if not config.get("subject") or not config.get("sources"):
+        parser.error("a subject and at least one source are required")
+
+    initialize_directories()
+    gallery = open_gallery_store()
+    students_data = load_students_data()
+    if len(gallery) == 0:
+        print("No registered students found. Please register students first.")
+        return
+
+    # Only the students enrolled in the subject are searched
+    cohort = gallery.subject_view(config["subject"], students_data)
+    if len(cohort) == 0:
+        print(f"No registered faces for students enrolled in {config['subject']}.")
+        return
+    matcher = cohort.matcher(tolerance=config.get("tolerance", 0.6))
+
+    with open_attendance_store() as attendance_store:
+        server = AttendanceServer(config["sources"], config["subject"], matcher, cohort.roll_nos, cohort.students,
+                                  attendance_store, num_workers=config.get("workers"),
+                                  scale=config.get("scale", 0.25), pace=config.get("pace", False),
+                                  detector=config.get("detector"))
+        print(f"Taking attendance for {config['subject']} from {len(server.sources)} source(s) "
+              f"with {server.num_workers} worker processes. Press Ctrl+C to stop.")
+        server.run()
+
+    print(f"\nTotal students marked present: {len(server.marked)}")
+    print(server.format_stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Append-only attendance store backed by SQLite in WAL mode.
+
+Each mark is a single indexed INSERT; a UNIQUE (roll_no, subject, date)
+constraint replaces the old scan of the whole workbook for duplicates.
+Inserts are committed in batches, and a timer commits whatever is still
+pending commit_interval seconds later, so the tail of a burst never holds
+the write transaction open. attendance.xlsx is only produced on demand by
+export_excel().
+
+Triggers keep materialized aggregates up to date as each mark is inserted:
+present/total counts per (student, subject) and present/absent counts per
+(date, subject). Reports read these instead of scanning the log;
+check_aggregates() rebuilds them from the log to verify them.
+"""
+import os
+import sqlite3
+import threading
+from time import monotonic
+from pathlib import Path
+from datetime import datetime, time as time_of_day
+import pandas as pd
+
+ATTENDANCE_DB = "attendance.db"
+ATTENDANCE_EXCEL = "attendance.xlsx"
+ATTENDANCE_COLUMNS = ["Name", "Roll No", "Date", "Time", "Subject", "Status"]
+
+# Column names in the database for each attendance column
+_DB_COLUMNS = {
+    "Name": "name",
+    "Roll No": "roll_no",
+    "Date": "date",
+    "Time": "time",
+    "Subject": "subject",
+    "Status": "status",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    roll_no TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    status TEXT NOT NULL,
+    UNIQUE (roll_no, subject, date)
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_subject_date ON attendance (subject, date);
+
+CREATE TABLE IF NOT EXISTS student_subject_totals (
+    roll_no TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    present INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (roll_no, subject)
+);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    date TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    present INTEGER NOT NULL DEFAULT 0,
+    absent INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (date, subject)
+);
+
+CREATE TRIGGER IF NOT EXISTS attendance_aggregates_insert AFTER INSERT ON attendance
+BEGIN
+    INSERT OR IGNORE INTO student_subject_totals (roll_no, subject) VALUES (NEW.roll_no, NEW.subject);
+    UPDATE student_subject_totals
+        SET present = present + (NEW.status = 'Present'), total = total + 1
+        WHERE roll_no = NEW.roll_no AND subject = NEW.subject;
+    INSERT OR IGNORE INTO daily_totals (date, subject) VALUES (NEW.date, NEW.subject);
+    UPDATE daily_totals
+        SET present = present + (NEW.status = 'Present'), absent = absent + (NEW.status != 'Present')
+        WHERE date = NEW.date AND subject = NEW.subject;
+END;
+"""
+
+# Version of the aggregate tables; older databases are backfilled from the log on open
+_AGGREGATES_VERSION = 1
+
+# The aggregates as computed from scratch from the log
+_AGGREGATE_QUERIES = {
+    "student_subject_totals": (
+        ("roll_no", "subject"),
+        "SELECT roll_no, subject, SUM(status = 'Present') AS present, COUNT(*) AS total "
+        "FROM attendance GROUP BY roll_no, subject"),
+    "daily_totals": (
+        ("date", "subject"),
+        "SELECT date, subject, SUM(status = 'Present') AS present, SUM(status != 'Present') AS absent "
+        "FROM attendance GROUP BY date, subject"),
+}
+
+def _format_column(values, fmt):
+    """
+    Format dates or times as strings with fmt, whatever type the source gave them in.
+
+    Values that cannot be parsed are kept as they are; missing values become "".
+    """
+    # openpyxl returns time cells as datetime.time, which to_datetime does not accept
+    parsed = pd.to_datetime(values.map(lambda value: value.isoformat() if isinstance(value, time_of_day) else value),
+                            errors="coerce", format="mixed")
+    formatted = parsed.dt.strftime(fmt).astype(object)
+    unparsed = parsed.isna() & values.notna()
+    formatted[unparsed] = values[unparsed].astype(str)
+    return formatted.fillna("")
+
+def _as_text(value):
+    """A cell as a string: "" if missing, and whole floats (numeric roll numbers next to blanks) without ".0"."""
+    if pd.isna(value):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def normalize_attendance_frame(df):
+    """ATTENDANCE_COLUMNS as strings, with Date as YYYY-MM-DD, Time as HH:MM:SS and "" for missing values."""
+    df = df[ATTENDANCE_COLUMNS].copy()
+    for column in ATTENDANCE_COLUMNS:
+        if column == "Date":
+            df[column] = _format_column(df[column], "%Y-%m-%d")
+        elif column == "Time":
+            df[column] = _format_column(df[column], "%H:%M:%S")
+        else:
+            df[column] = df[column].map(_as_text)
+    return df.astype(str)
+
+class AttendanceStore:
+    """Append-only attendance log with batched commits."""
+
+    def __init__(self, db_path=ATTENDANCE_DB, batch_size=50, commit_interval=1.0):
+        """
+        Args:
+            db_path: Path of the SQLite database file
+            batch_size: Number of inserted marks per commit
+            commit_interval: Seconds after which pending marks are committed
+                             even if the batch is not full
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self._pending = 0
+        self._last_commit = monotonic()
+        self._lock = threading.Lock()
+        self._timer = None
+
+        # The connection is shared with writer threads, guarded by self._lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < _AGGREGATES_VERSION:
+            self.rebuild_aggregates()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def mark(self, student_name, roll_no, subject, status="Present", date=None, time=None):
+        """
+        Record attendance for one student.
+
+        Args:
+            student_name: Name of the student
+            roll_no: Roll number of the student
+            subject: Subject name
+            status: Attendance status (Present/Absent)
+            date: Date as YYYY-MM-DD (defaults to today)
+            time: Time as HH:MM:SS (defaults to now)
+
+        Returns:
+            True if the mark was recorded, False if the student already has
+            a record for this subject on that date
+        """
+        inserted = self.mark_many([(student_name, roll_no, subject, status, date, time)])
+        if inserted:
+            print(f"Attendance marked for {student_name} in {subject}")
+        else:
+            print(f"{student_name} already marked attendance for {subject} today!")
+        return bool(inserted)
+
+    def mark_many(self, records):
+        """
+        Record a batch of attendance marks.
+
+        Args:
+            records: Iterable of (name, roll_no, subject, status[, date[, time]]) tuples
+
+        Returns:
+            Number of marks recorded (duplicates are skipped)
+        """
+        now = datetime.now()
+        rows = []
+        for record in records:
+            name, roll_no, subject, status = record[:4]
+            date = record[4] if len(record) > 4 and record[4] else now.strftime("%Y-%m-%d")
+            # An explicit "" (a blank imported cell) is kept; only a missing time defaults to now
+            time = record[5] if len(record) > 5 and record[5] is not None else now.strftime("%H:%M:%S")
+            rows.append((name, str(roll_no), date, time, subject, status))
+
+        with self._lock:
+            # rowcount, unlike total_changes, leaves out the rows written by the aggregate triggers
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO attendance (name, roll_no, date, time, subject, status) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows).rowcount
+
+            self._pending += inserted
+            if (self._pending >= self.batch_size or len(rows) > 1
+                    or (self._pending and monotonic() - self._last_commit >= self.commit_interval)):
+                self._commit()
+            elif self._pending and self._timer is None:
+                self._timer = threading.Timer(self.commit_interval, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return inserted
+
+    def is_marked(self, roll_no, subject, date=None):
+        """Check whether roll_no already has a record for subject on date (default today)."""
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM attendance WHERE roll_no = ? AND subject = ? AND date = ?",
+                (str(roll_no), subject, date)).fetchone()
+        return row is not None
+
+    def roll_nos_with_status(self, subject, date, status="Present"):
+        """Set of roll numbers with the given status for subject on date."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT roll_no FROM attendance WHERE subject = ? AND date = ? AND status = ?",
+                (subject, date, status)).fetchall()
+        return {roll_no for (roll_no,) in rows}
+
+    def to_dataframe(self, columns=None, subject=None, start_date=None, end_date=None):
+        """
+        Read attendance records into a DataFrame with the Excel column names.
+
+        Args:
+            columns: Columns to read (defaults to all ATTENDANCE_COLUMNS)
+            subject: Only read records for this subject
+            start_date: Only read records on or after this date (YYYY-MM-DD)
+            end_date: Only read records on or before this date (YYYY-MM-DD)
+        """
+        columns = columns or ATTENDANCE_COLUMNS
+        select = ", ".join(f'{_DB_COLUMNS[col]} AS "{col}"' for col in columns)
+        conditions, params = [], []
+        if subject is not None:
+            conditions.append("subject = ?")
+            params.append(subject)
+        if start_date is not None:
+            conditions.append("date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append("date <= ?")
+            params.append(end_date)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            self._commit()
+            return pd.read_sql_query(f"SELECT {select} FROM attendance{where} ORDER BY id",
+                                     self._conn, params=params)
+
+    def iter_dataframes(self, chunk_rows=100000, columns=None):
+        """
+        Read all attendance records in chunks, oldest first.
+
+        The records are read over a separate read-only connection, so writers
+        are not blocked while the chunks are consumed.
+
+        Yields:
+            DataFrames of at most chunk_rows records with the Excel column names
+        """
+        columns = columns or ATTENDANCE_COLUMNS
+        select = ", ".join(f'{_DB_COLUMNS[col]} AS "{col}"' for col in columns)
+        self.flush()
+        reader = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            yield from pd.read_sql_query(f"SELECT {select} FROM attendance ORDER BY id", reader, chunksize=chunk_rows)
+        finally:
+            reader.close()
+
+    def student_totals(self, subject=None):
+        """
+        Present/total class counts per (student, subject) from the materialized aggregates.
+
+        Returns:
+            DataFrame with the Roll No, Subject, Total and Attended columns
+        """
+        where, params = ("WHERE subject = ?", [subject]) if subject is not None else ("", [])
+        with self._lock:
+            self._commit()
+            return pd.read_sql_query('SELECT roll_no AS "Roll No", subject AS "Subject", total AS "Total", '
+                                     f'present AS "Attended" FROM student_subject_totals {where}',
+                                     self._conn, params=params)
+
+    def daily_totals(self, subject=None):
+        """
+        Present/absent counts per (date, subject) from the materialized aggregates.
+
+        Returns:
+            DataFrame with the Date, Subject, Present and Absent columns
+        """
+        where, params = ("WHERE subject = ?", [subject]) if subject is not None else ("", [])
+        with self._lock:
+            self._commit()
+            return pd.read_sql_query('SELECT date AS "Date", subject AS "Subject", present AS "Present", '
+                                     f'absent AS "Absent" FROM daily_totals {where} ORDER BY date, subject',
+                                     self._conn, params=params)
+
+    def low_attendance(self, min_percentage, subject=None):
+        """
+        (student, subject) pairs whose attendance is below min_percentage.
+
+        Returns:
+            DataFrame with the Roll No, Subject, Total, Attended and Percentage columns
+        """
+        conditions, params = ["present * 100.0 < ? * total"], [min_percentage]
+        if subject is not None:
+            conditions.append("subject = ?")
+            params.append(subject)
+        with self._lock:
+            self._commit()
+            return pd.read_sql_query(
+                'SELECT roll_no AS "Roll No", subject AS "Subject", total AS "Total", present AS "Attended", '
+                'ROUND(present * 100.0 / total, 2) AS "Percentage" FROM student_subject_totals '
+                f'WHERE {" AND ".join(conditions)} ORDER BY roll_no, subject', self._conn, params=params)
+
+    def rebuild_aggregates(self):
+        """Recompute the materialized aggregates from the attendance log."""
+        with self._lock:
+            for table, (_, query) in _AGGREGATE_QUERIES.items():
+                self._conn.execute(f"DELETE FROM {table}")
+                self._conn.execute(f"INSERT INTO {table} {query}")
+            self._conn.execute(f"PRAGMA user_version = {_AGGREGATES_VERSION}")
+            self._commit()
+
+    def check_aggregates(self, repair=False):
+        """
+        Compare the materialized aggregates with a full recomputation from the log.
+
+        Args:
+            repair: Rebuild the aggregates if they differ
+
+        Returns:
+            Dict of table name -> number of rows that differ
+        """
+        mismatches = {}
+        with self._lock:
+            self._commit()
+            for table, (keys, query) in _AGGREGATE_QUERIES.items():
+                stored = pd.read_sql_query(f"SELECT * FROM {table}", self._conn).set_index(list(keys))
+                expected = pd.read_sql_query(query, self._conn).set_index(list(keys))
+                stored, expected = stored.align(expected, join="outer", fill_value=0)
+                mismatches[table] = int((stored != expected).any(axis=1).sum())
+
+        if repair and any(mismatches.values()):
+            self.rebuild_aggregates()
+        return mismatches
+
+    def export_excel(self, file_path=ATTENDANCE_EXCEL):
+        """Write all attendance records to an Excel file."""
+        df = self.to_dataframe()
+        df.to_excel(file_path, index=False)
+        print(f"Exported {len(df)} attendance records to {file_path}")
+        return file_path
+
+    def import_excel(self, file_path=ATTENDANCE_EXCEL):
+        """
+        Import records from a legacy attendance.xlsx.
+
+        Returns:
+            Number of records imported
+        """
+        df = pd.read_excel(file_path)
+        if df.empty:
+            return 0
+        df = normalize_attendance_frame(df)
+        incomplete = (df[["Roll No", "Subject", "Date"]] == "").any(axis=1)
+        if incomplete.any():
+            print(f"Skipping {int(incomplete.sum())} rows of {file_path} without a roll number, subject or date")
+            df = df[~incomplete]
+        records = df[["Name", "Roll No", "Subject", "Status", "Date", "Time"]].itertuples(index=False, name=None)
+        return self.mark_many(records)
+
+    def flush(self):
+        """Commit any pending marks."""
+        with self._lock:
+            self._commit()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+            if self._pending:
+                self._commit()
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+        self._last_commit = monotonic()
+
+    def close(self):
+        """Commit pending marks and close the database."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._commit()
+            self._conn.close()
+
+def open_attendance_store(db_path=ATTENDANCE_DB, excel_path=ATTENDANCE_EXCEL):
+    """
+    Open the attendance store, importing the legacy Excel file on first use.
+    """
+    is_new = not os.path.exists(db_path)
+    store = AttendanceStore(db_path)
+    if is_new and os.path.exists(excel_path):
+        try:
+            imported = store.import_excel(excel_path)
+            print(f"Imported {imported} attendance records from {excel_path}")
+        except Exception as e:
+            print(f"Error importing {excel_path}: {e}")
+    return store
@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the Face Recognition Attendance System.
+
+Run from the project root, e.g.: python -m benchmarks.bench_index
+"""
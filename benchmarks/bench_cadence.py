@@ -0,0 +1,110 @@
+"""
+Achieved FPS versus detection recall of periodic detection on a recorded clip.
+
+Every frame is first run through the full detector to get reference boxes.
+Each cadence setting is then replayed and its boxes (detected or propagated)
+are compared with the reference at IoU >= 0.5.
+
+The reference boxes are read from the encoding cache, keyed by the
+downscaled frame, so they are only detected on the first run over a clip
+(and are shared with replays at the same scale). The every-frame rate is
+timed on a sample of frames.
+
+Usage:
+    python -m benchmarks.bench_cadence recordings/door.mp4 --intervals 1 3 5 10 --propagators flow mil
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from face_detection_utils import detect_face_locations
+from face_tracker import box_iou
+from detection_scheduler import DetectionScheduler
+from video_sources import FileVideoSource
+from encoding_cache import EncodingCache
+
+def load_frames(path, scale, max_frames=None):
+    """Decode a clip into downscaled RGB frames."""
+    source = FileVideoSource(path)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = source.read()
+        if not ret:
+            break
+        small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+        frames.append(cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB))
+    source.release()
+    return frames
+
+def detection_recall(reference, predicted, iou_threshold=0.5):
+    """Fraction of reference boxes covered by a predicted box."""
+    found = total = 0
+    for ref_boxes, pred_boxes in zip(reference, predicted):
+        total += len(ref_boxes)
+        if ref_boxes and pred_boxes:
+            found += int((box_iou(ref_boxes, pred_boxes).max(axis=1) >= iou_threshold).sum())
+    return found / total if total else 1.0
+
+def run_scheduler(frames, scheduler):
+    """Replay frames through a scheduler; return (boxes per frame, fps)."""
+    boxes = []
+    start = time.perf_counter()
+    for frame in frames:
+        frame_boxes, _ = scheduler.locate(frame)
+        boxes.append(frame_boxes)
+    return boxes, len(frames) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark periodic detection with box propagation")
+    parser.add_argument("clip", help="Video file or image directory")
+    parser.add_argument("--scale", type=float, default=0.25)
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--intervals", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--propagators", nargs="+", default=["flow"], help="'flow' or OpenCV tracker names")
+    parser.add_argument("--no-adaptive", action="store_true", help="Keep the interval fixed")
+    parser.add_argument("--timing-frames", type=int, default=50, help="Frames the every-frame rate is timed on")
+    parser.add_argument("--no-cache", action="store_true", help="Detect the reference boxes without the encoding cache")
+    args = parser.parse_args()
+
+    frames = load_frames(args.clip, args.scale, args.max_frames)
+    if not frames:
+        print(f"No frames could be read from {args.clip}")
+        return
+
+    if args.no_cache:
+        reference = [detect_face_locations(frame) for frame in frames]
+    else:
+        with EncodingCache() as cache:
+            reference = [cache.locate_and_encode(frame)[0] for frame in frames]
+            print(cache.format_stats())
+
+    sample = [frames[i] for i in np.linspace(0, len(frames) - 1, min(args.timing_frames, len(frames)), dtype=int)]
+    start = time.perf_counter()
+    for frame in sample:
+        detect_face_locations(frame)
+    reference_fps = len(sample) / (time.perf_counter() - start)
+    num_faces = sum(len(boxes) for boxes in reference)
+
+    print(f"\nClip: {args.clip} ({len(frames)} frames, {num_faces} reference faces)")
+    print(f"\n{'Mode':<22} {'FPS':>8} {'Speedup':>8} {'Detected':>9} {'Recall':>8}")
+    print("="*60)
+    print(f"{'every frame':<22} {reference_fps:>8.1f} {1.0:>8.2f} {100.0:>8.1f}% {1.0:>8.3f}")
+
+    for propagator in args.propagators:
+        for interval in args.intervals:
+            try:
+                scheduler = DetectionScheduler(interval, max_interval=max(interval, 15), propagator=propagator,
+                                               adaptive=not args.no_adaptive)
+            except ValueError as e:
+                print(f"Skipping {propagator}: {e}")
+                break
+            boxes, fps = run_scheduler(frames, scheduler)
+            recall = detection_recall(reference, boxes)
+            mode = f"{propagator}, every {interval}"
+            print(f"{mode:<22} {fps:>8.1f} {fps / reference_fps:>8.2f} "
+                  f"{100 * scheduler.detection_ratio():>8.1f}% {recall:>8.3f}")
+
+    print("="*60)
+
+if __name__ == "__main__":
+    main()
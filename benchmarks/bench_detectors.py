@@ -0,0 +1,133 @@
+"""
+Compare face detector backends on a directory of images or a video.
+
+Reports frames/sec, faces/sec, per-frame latency percentiles and agreement
+with the reference backend (the first one listed): the fraction of boxes
+that have a counterpart at IoU >= 0.5 in the other backend's output (F1).
+
+With --reference, the reference boxes come from that backend through the
+encoding cache instead, so repeated runs over the same input do not detect
+them again and the reference backend need not be timed.
+
+Usage:
+    python -m benchmarks.bench_detectors recordings/door.mp4 --backends hog haar
+    python -m benchmarks.bench_detectors recordings/door.mp4 --backends haar --reference hog
+    python -m benchmarks.bench_detectors faces/ --backends hog dnn \\
+        --dnn-model models/res10_300x300_ssd_iter_140000.caffemodel --dnn-config models/deploy.prototxt
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from face_detectors import create_detector
+from encoding_cache import EncodingCache
+from face_tracker import box_iou
+from video_sources import FileVideoSource
+
+def load_frames(path, max_frames=None):
+    """Decode a video or image directory into RGB frames."""
+    source = FileVideoSource(path)
+    frames = []
+    while max_frames is None or len(frames) < max_frames:
+        ret, frame = source.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    source.release()
+    return frames
+
+def run_detector(detector, frames):
+    """Return (boxes per frame, per-frame latencies in seconds)."""
+    boxes, latencies = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        boxes.append(detector.detect(frame))
+        latencies.append(time.perf_counter() - start)
+    return boxes, np.array(latencies)
+
+def detector_options(backend, args):
+    """create_detector() arguments for a backend from the command line."""
+    options = {"scale": args.scale}
+    if args.upsample is not None:
+        options["upsample"] = args.upsample
+    if backend == "dnn":
+        options.update(model_path=args.dnn_model, config_path=args.dnn_config)
+    return options
+
+def agreement(reference, predicted, iou_threshold=0.5):
+    """F1 score of predicted boxes against reference boxes at the IoU threshold."""
+    matched_ref = matched_pred = total_ref = total_pred = 0
+    for ref_boxes, pred_boxes in zip(reference, predicted):
+        total_ref += len(ref_boxes)
+        total_pred += len(pred_boxes)
+        if ref_boxes and pred_boxes:
+            iou = box_iou(ref_boxes, pred_boxes)
+            matched_ref += int((iou.max(axis=1) >= iou_threshold).sum())
+            matched_pred += int((iou.max(axis=0) >= iou_threshold).sum())
+    if total_ref == 0 and total_pred == 0:
+        return 1.0
+    recall = matched_ref / total_ref if total_ref else 0.0
+    precision = matched_pred / total_pred if total_pred else 0.0
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detector backends")
+    parser.add_argument("input", help="Video file or image directory")
+    parser.add_argument("--backends", nargs="+", default=["hog", "haar"], help="hog, haar and/or dnn")
+    parser.add_argument("--scale", type=float, default=0.25, help="Input scale for every backend")
+    parser.add_argument("--upsample", type=int, help="Upsampling for every backend (default: backend's own)")
+    parser.add_argument("--dnn-model", help=".caffemodel or .onnx file for the dnn backend")
+    parser.add_argument("--dnn-config", help=".prototxt file for Caffe dnn models")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--reference", help="Backend to compare with, read from the encoding cache "
+                                            "(default: the first of --backends)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.input, args.max_frames)
+    if not frames:
+        print(f"No frames could be read from {args.input}")
+        return
+
+    results = {}
+    for backend in args.backends:
+        try:
+            detector = create_detector(backend, **detector_options(backend, args))
+        except (ValueError, FileNotFoundError, TypeError) as e:
+            print(f"Skipping {backend}: {e}")
+            continue
+        # Warm up once so model loading is not timed
+        detector.detect(frames[0])
+        results[backend] = run_detector(detector, frames)
+
+    if not results:
+        return
+
+    if args.reference:
+        reference_name = f"{args.reference} (cached)"
+        try:
+            reference = create_detector(args.reference, **detector_options(args.reference, args))
+        except (ValueError, FileNotFoundError, TypeError) as e:
+            print(f"Cannot create the reference backend {args.reference}: {e}")
+            return
+        with EncodingCache() as cache:
+            reference_boxes = [cache.locate_and_encode(frame, reference)[0] for frame in frames]
+            print(cache.format_stats())
+    else:
+        reference_name = next(iter(results))
+        reference_boxes = results[reference_name][0]
+
+    print(f"\nInput: {args.input} ({len(frames)} frames, scale {args.scale})")
+    print(f"\n{'Backend':<8} {'Faces':>7} {'Frames/s':>9} {'Faces/s':>9} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'Agree':>7}")
+    print("="*72)
+    for backend, (boxes, latencies) in results.items():
+        num_faces = sum(len(b) for b in boxes)
+        total_time = latencies.sum()
+        p50, p90, p99 = np.percentile(latencies * 1000, [50, 90, 99])
+        print(f"{backend:<8} {num_faces:>7} {len(frames) / total_time:>9.1f} {num_faces / total_time:>9.1f} "
+              f"{p50:>8.2f} {p90:>8.2f} {p99:>8.2f} {agreement(reference_boxes, boxes):>7.3f}")
+    print("="*72)
+    print(f"Agreement is the F1 score against '{reference_name}' at IoU >= 0.5")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Throughput of per-frame versus batched face encoding.
+
+Faces are detected once up front, so only encoding is timed.
+
+Usage:
+    python -m benchmarks.bench_encoding faces/ --workers 1 4 8 --batch-sizes 8 32
+"""
+import argparse
+import os
+import time
+from face_detection_utils import detect_face_locations, encode_faces, batch_face_encodings
+from benchmarks.bench_detectors import load_frames
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-frame vs batched face encoding")
+    parser.add_argument("input", help="Video file or image directory")
+    parser.add_argument("--max-frames", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    args = parser.parse_args()
+
+    frames = load_frames(args.input, args.max_frames)
+    items = [(frame, detect_face_locations(frame)) for frame in frames]
+    num_faces = sum(len(locations) for _, locations in items)
+    if num_faces == 0:
+        print(f"No faces found in {args.input}")
+        return
+
+    start = time.perf_counter()
+    for frame, locations in items:
+        encode_faces(frame, locations)
+    baseline = num_faces / (time.perf_counter() - start)
+
+    print(f"\nInput: {args.input} ({len(frames)} frames, {num_faces} faces)")
+    print(f"\n{'Mode':<28} {'Faces/s':>9} {'Speedup':>8}")
+    print("="*47)
+    print(f"{'per frame':<28} {baseline:>9.1f} {1.0:>8.2f}")
+    for workers in args.workers:
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            batch_face_encodings(items, num_workers=workers, batch_size=batch_size)
+            throughput = num_faces / (time.perf_counter() - start)
+            mode = f"batched ({workers} thr, {batch_size}/batch)"
+            print(f"{mode:<28} {throughput:>9.1f} {throughput / baseline:>8.2f}")
+    print("="*47)
+
+if __name__ == "__main__":
+    main()
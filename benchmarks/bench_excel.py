@@ -0,0 +1,80 @@
+"""
+Excel writing time of a large student-wise report sheet.
+
+Compares the old Styler-based writer (CSS computed for every cell, widths
+from every cell) with the xlsxwriter path using native conditional formats
+and sampled widths, with and without constant-memory mode.
+
+Usage:
+    python -m benchmarks.bench_excel --rows 100000
+"""
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from calculate_report import (
+    MIN_ATTENDANCE_PERCENTAGE,
+    build_report_data,
+    student_subject_summary,
+    open_report_writer,
+    write_sheet
+)
+from benchmarks.bench_reports import synthetic_log
+
+HIGHLIGHT = ["Percentage", "Status"]
+
+def legacy_write_sheet(df, writer, sheet_name, highlight=()):
+    """The old writer: a Styler with CSS for every cell and widths from every cell."""
+    def highlight_low_attendance(val):
+        if isinstance(val, (int, float, np.number)) and val < MIN_ATTENDANCE_PERCENTAGE:
+            return 'background-color: #FF9999'
+        if val == "Low":
+            return 'background-color: #FF9999'
+        return ''
+
+    df.style.map(highlight_low_attendance, subset=list(highlight)).to_excel(writer, sheet_name=sheet_name, index=False)
+    worksheet = writer.sheets[sheet_name]
+    for i, col in enumerate(df.columns):
+        max_length = max(df[col].astype(str).map(len).max(), len(col)) + 2
+        worksheet.set_column(i, i, max_length)
+
+def time_write(df, path, fast, constant_memory=False):
+    start = time.perf_counter()
+    if fast:
+        with open_report_writer(path, constant_memory) as writer:
+            write_sheet(df, writer, "Student-wise Report", highlight=HIGHLIGHT)
+    else:
+        with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+            legacy_write_sheet(df, writer, "Student-wise Report", highlight=HIGHLIGHT)
+    return time.perf_counter() - start, os.path.getsize(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report sheet writing")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows of the student-wise sheet")
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not time the old Styler writer")
+    args = parser.parse_args()
+
+    df, students_data = synthetic_log(args.rows // args.subjects, 4 * args.subjects, args.subjects)
+    sheet = student_subject_summary(build_report_data(df, students_data))
+    print(f"\nStudent-wise sheet: {len(sheet)} rows x {len(sheet.columns)} columns")
+
+    modes = [("fast", True, False), ("fast, constant memory", True, True)]
+    if not args.skip_legacy:
+        modes.insert(0, ("styler (old)", False, False))
+
+    print(f"\n{'Writer':<24} {'Seconds':>9} {'Rows/s':>10} {'MB':>7}")
+    print("="*53)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        baseline = None
+        for name, fast, constant_memory in modes:
+            seconds, size = time_write(sheet, os.path.join(tmp_dir, f"{name[:4]}.xlsx"), fast, constant_memory)
+            baseline = baseline or seconds
+            print(f"{name:<24} {seconds:>9.2f} {len(sheet) / seconds:>10.0f} {size / 1e6:>7.1f}"
+                  + (f"  ({baseline / seconds:.1f}x)" if seconds != baseline else ""))
+    print("="*53)
+
+if __name__ == "__main__":
+    main()
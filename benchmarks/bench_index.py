@@ -0,0 +1,83 @@
+"""
+Recall/latency benchmark of the approximate face index against exact matching.
+
+Usage:
+    python -m benchmarks.bench_index --gallery-size 50000 --n-lists 256 --n-probe 1 4 16
+"""
+import argparse
+import time
+import numpy as np
+from face_detection_utils import ENCODING_DIM, GalleryMatcher
+from face_index import build_index
+
+def synthetic_gallery(num_students, num_queries, noise=0.03, seed=0):
+    """
+    Generate a gallery of random face encodings and noisy probes of enrolled faces.
+
+    Returns:
+        gallery: Array of shape (num_students, 128)
+        queries: Array of shape (num_queries, 128)
+        query_ids: Gallery index each query was generated from
+    """
+    rng = np.random.default_rng(seed)
+    # Real encodings have entries of roughly this scale
+    gallery = rng.normal(0.0, 0.1, size=(num_students, ENCODING_DIM)).astype(np.float32)
+    query_ids = rng.integers(0, num_students, size=num_queries)
+    queries = gallery[query_ids] + rng.normal(0.0, noise, size=(num_queries, ENCODING_DIM)).astype(np.float32)
+    return gallery, queries, query_ids
+
+def time_search(index, queries, batch_size, **search_kwargs):
+    """Search all queries in frame-sized batches; return (ids, mean ms per batch)."""
+    ids = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        _, batch_ids = index.search(queries[i:i + batch_size], k=1, **search_kwargs)
+        ids.append(batch_ids[:, 0])
+    elapsed = time.perf_counter() - start
+    num_batches = (len(queries) + batch_size - 1) // batch_size
+    return np.concatenate(ids), 1000 * elapsed / num_batches
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark approximate vs exact face index")
+    parser.add_argument("--gallery-size", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--batch-size", type=int, default=30, help="Faces per frame")
+    parser.add_argument("--n-lists", type=int, default=256)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    gallery, queries, _ = synthetic_gallery(args.gallery_size, args.queries, seed=args.seed)
+
+    start = time.perf_counter()
+    exact = build_index(gallery, 'exact')
+    exact_build = time.perf_counter() - start
+    exact_ids, exact_ms = time_search(exact, queries, args.batch_size)
+
+    start = time.perf_counter()
+    ivf = build_index(gallery, 'ivf', n_lists=args.n_lists, seed=args.seed)
+    ivf_build = time.perf_counter() - start
+
+    print(f"\nGallery: {args.gallery_size} encodings, {args.queries} queries, {args.batch_size} faces/frame")
+    print(f"Build time: exact {exact_build:.2f}s, ivf {ivf_build:.2f}s ({args.n_lists} lists)")
+    print(f"\n{'Backend':<16} {'Recall@1':>10} {'ms/frame':>10} {'Speedup':>10}")
+    print("="*50)
+    print(f"{'exact':<16} {1.0:>10.4f} {exact_ms:>10.3f} {1.0:>10.2f}")
+
+    for n_probe in args.n_probe:
+        ivf_ids, ivf_ms = time_search(ivf, queries, args.batch_size, n_probe=n_probe)
+        recall = float(np.mean(ivf_ids == exact_ids))
+        print(f"{f'ivf/probe={n_probe}':<16} {recall:>10.4f} {ivf_ms:>10.3f} {exact_ms / ivf_ms:>10.2f}")
+
+    # The recognition path: GalleryMatcher searching through the index (default n_probe)
+    matcher = GalleryMatcher(gallery, index=ivf)
+    start = time.perf_counter()
+    matched = np.concatenate([matcher.match(queries[i:i + args.batch_size], tolerance=np.inf)[0]
+                              for i in range(0, len(queries), args.batch_size)])
+    matcher_ms = 1000 * (time.perf_counter() - start) / ((len(queries) + args.batch_size - 1) // args.batch_size)
+    recall = float(np.mean(matched == exact_ids))
+    print(f"{'matcher+ivf':<16} {recall:>10.4f} {matcher_ms:>10.3f} {exact_ms / matcher_ms:>10.2f}")
+    print("="*50)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Report aggregation time on a synthetic attendance log.
+
+Every student takes every subject, and sessions rotate over the subjects, so
+the log has students x sessions records. The old per-student filter is timed
+on a sample of students and extrapolated.
+
+Usage:
+    python -m benchmarks.bench_reports --students 10000 --sessions 200
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from calculate_report import (
+    build_report_data,
+    overall_summary,
+    student_subject_summary,
+    subject_summary,
+    daily_summary
+)
+
+def synthetic_log(num_students, num_sessions, num_subjects, present_rate=0.8, seed=0):
+    """
+    Build a synthetic attendance log and matching students_data.
+
+    Returns:
+        df: Attendance records with the Roll No, Date, Subject and Status columns
+        students_data: Student information keyed by roll number
+    """
+    rng = np.random.default_rng(seed)
+    roll_nos = np.array([f"R{i:06d}" for i in range(num_students)])
+    subjects = np.array([f"Subject {i}" for i in range(num_subjects)])
+    session_subjects = subjects[np.arange(num_sessions) % num_subjects]
+    session_dates = (pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(num_sessions) // num_subjects, unit="D")
+                     ).strftime("%Y-%m-%d").to_numpy()
+
+    # Students are slightly more or less diligent, so some fall below the minimum
+    diligence = np.clip(rng.normal(present_rate, 0.1, num_students), 0, 1)
+    present = rng.random((num_students, num_sessions)) < diligence[:, None]
+
+    df = pd.DataFrame({
+        "Roll No": np.repeat(roll_nos, num_sessions),
+        "Date": np.tile(session_dates, num_students),
+        "Subject": np.tile(session_subjects, num_students),
+        "Status": np.where(present.ravel(), "Present", "Absent"),
+    })
+    students_data = {roll_no: {"name": f"Student {roll_no}", "roll_no": roll_no, "semester": "1", "year": "2024",
+                               "subjects": list(subjects)} for roll_no in roll_nos}
+    return df, students_data
+
+def legacy_overall(df, students_data):
+    """The old per-student filter loop of create_overall_report."""
+    results = []
+    for roll_no in students_data:
+        student_df = df[df["Roll No"] == roll_no]
+        total_classes = len(student_df)
+        attended_classes = len(student_df[student_df["Status"] == "Present"])
+        results.append((roll_no, total_classes, attended_classes))
+    return results
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized attendance report engine")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--legacy-sample", type=int, default=50,
+                        help="Students to time with the old per-student loop (0 to skip)")
+    args = parser.parse_args()
+
+    df, students_data = timed(synthetic_log, args.students, args.sessions, args.subjects)[0]
+    print(f"\nSynthetic log: {args.students} students x {args.sessions} sessions = {len(df)} records")
+
+    report, build_time = timed(build_report_data, df, students_data)
+    timings = [("aggregate (shared)", build_time)]
+    for name, function in (("overall", overall_summary), ("student-wise", student_subject_summary),
+                           ("subject-wise", subject_summary), ("daily", daily_summary)):
+        timings.append((name, timed(function, report)[1]))
+
+    print(f"\n{'Step':<22} {'Seconds':>9}")
+    print("="*32)
+    for name, seconds in timings:
+        print(f"{name:<22} {seconds:>9.3f}")
+    total = sum(seconds for _, seconds in timings)
+    print(f"{'total':<22} {total:>9.3f}")
+    print("="*32)
+
+    if args.legacy_sample:
+        sample = dict(list(students_data.items())[:args.legacy_sample])
+        legacy_time = timed(legacy_overall, df, sample)[1] * len(students_data) / len(sample)
+        print(f"Old per-student overall report (extrapolated from {len(sample)} students): {legacy_time:.1f}s "
+              f"({legacy_time / total:.0f}x slower than all vectorized sheets)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+End-to-end benchmark suite for regression tracking.
+
+Runs fully offline: frames come from video files or image folders (or
+synthetic noise frames when none are given), galleries are random 128-d
+encodings and attendance histories are synthetic. For every gallery scale it
+times:
+
+- detect_faces on every input frame
+- recognize_faces with a prebuilt matcher and with the matrix rebuilt per call
+- update_attendance_excel against a workbook holding the history, next to
+  the SQLite attendance store it was replaced by
+- calculate_report's generate_attendance_report on the full history
+
+All data is generated from --seed, and the results are written as JSON so two
+runs can be compared with --compare.
+
+Usage:
+    python -m benchmarks.bench_suite --inputs recordings/door.mp4 faces/ --output results.json
+    python -m benchmarks.bench_suite --scales 1000 10000 --compare results.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import pickle
+import platform
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime
+import cv2
+import numpy as np
+import pandas as pd
+from face_detection_utils import (
+    ENCODING_DIM,
+    GalleryMatcher,
+    detect_faces,
+    recognize_faces,
+    update_attendance_excel
+)
+from attendance_store import ATTENDANCE_COLUMNS, ATTENDANCE_DB, AttendanceStore
+from video_sources import FileVideoSource
+from benchmarks.bench_index import synthetic_gallery
+from benchmarks.bench_reports import synthetic_log
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+# Rows above this are not written to the legacy workbook (xlsx holds about 1M rows)
+MAX_EXCEL_ROWS = 100000
+
+def latency_stats(latencies):
+    """Mean, p50, p95 and max in ms plus calls per second for a list of latencies in seconds."""
+    latencies = np.asarray(latencies, dtype=np.float64)
+    if latencies.size == 0:
+        return {"calls": 0}
+    ms = latencies * 1000
+    return {
+        "calls": int(latencies.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "max_ms": float(ms.max()),
+        "per_sec": float(latencies.size / latencies.sum()) if latencies.sum() > 0 else 0.0,
+    }
+
+def load_input_frames(inputs, max_frames, num_synthetic, seed):
+    """
+    Decode BGR frames from video files and image folders.
+
+    Without inputs, num_synthetic noise frames are generated instead (they
+    contain no faces, so only the cost of an empty scene is measured).
+
+    Returns:
+        Dict of input name -> list of frames
+    """
+    if not inputs:
+        rng = np.random.default_rng(seed)
+        return {"synthetic": [rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+                              for _ in range(num_synthetic)]}
+
+    frames = {}
+    for path in inputs:
+        source = FileVideoSource(path)
+        frames[path] = []
+        while max_frames is None or len(frames[path]) < max_frames:
+            ret, frame = source.read()
+            if not ret:
+                break
+            frames[path].append(frame)
+        source.release()
+    return frames
+
+def bench_detect(frames):
+    """Time detect_faces per frame; return (stats, face encodings per frame)."""
+    latencies, encodings = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        _, face_encodings = detect_faces(frame)
+        latencies.append(time.perf_counter() - start)
+        encodings.append(face_encodings)
+    stats = latency_stats(latencies)
+    stats["faces"] = sum(len(e) for e in encodings)
+    return stats, encodings
+
+def probe_batches(detected, gallery, num_frames, faces_per_frame, seed):
+    """
+    Probe encodings per frame for recognition.
+
+    Faces found in the input frames are used when there are any; otherwise
+    each frame holds faces_per_frame noisy copies of gallery faces.
+    """
+    batches = [e for e in detected if len(e)]
+    if batches:
+        return [np.asarray(e, dtype=np.float32) for e in batches]
+
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, len(gallery), size=(num_frames, faces_per_frame))
+    noise = rng.normal(0.0, 0.03, size=(num_frames, faces_per_frame, ENCODING_DIM)).astype(np.float32)
+    return list(gallery[ids] + noise)
+
+def bench_recognize(gallery, batches, rebuild_sample):
+    """Time recognize_faces with a prebuilt matcher and, on a sample, rebuilding it per call."""
+    names = [f"Student {i}" for i in range(len(gallery))]
+    start = time.perf_counter()
+    matcher = GalleryMatcher(gallery, names)
+    build_time = time.perf_counter() - start
+
+    latencies = []
+    for batch in batches:
+        start = time.perf_counter()
+        recognize_faces(batch, None, None, matcher=matcher)
+        latencies.append(time.perf_counter() - start)
+    results = {"prebuilt": dict(latency_stats(latencies), build_ms=build_time * 1000)}
+
+    latencies = []
+    for batch in batches[:rebuild_sample]:
+        start = time.perf_counter()
+        recognize_faces(batch, gallery, names)
+        latencies.append(time.perf_counter() - start)
+    results["rebuild"] = latency_stats(latencies)
+    return results
+
+def history_records(history, students_data):
+    """Attendance tuples (name, roll_no, subject, status, date, time) from a synthetic log."""
+    names = {roll_no: data["name"] for roll_no, data in students_data.items()}
+    return zip(history["Roll No"].map(names), history["Roll No"], history["Subject"], history["Status"],
+               history["Date"], ["09:00:00"] * len(history))
+
+def bench_excel(history, students_data, marks, store_marks, work_dir):
+    """Time update_attendance_excel on a workbook of the history, and AttendanceStore.mark for comparison."""
+    rows = history.head(MAX_EXCEL_ROWS)
+    excel_path = os.path.join(work_dir, "attendance.xlsx")
+    workbook = pd.DataFrame({
+        "Name": rows["Roll No"].map(lambda roll_no: students_data[roll_no]["name"]),
+        "Roll No": rows["Roll No"],
+        "Date": rows["Date"],
+        "Time": "09:00:00",
+        "Subject": rows["Subject"],
+        "Status": rows["Status"],
+    })[ATTENDANCE_COLUMNS]
+    workbook.to_excel(excel_path, index=False)
+
+    roll_nos = list(students_data)
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(marks):
+            roll_no = roll_nos[i % len(roll_nos)]
+            start = time.perf_counter()
+            update_attendance_excel(students_data[roll_no]["name"], roll_no, "Benchmark", file_path=excel_path)
+            latencies.append(time.perf_counter() - start)
+    results = {"excel": dict(latency_stats(latencies), rows=len(workbook))}
+
+    latencies = []
+    store = AttendanceStore(os.path.join(work_dir, "marks.db"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(store_marks):
+            roll_no = roll_nos[i % len(roll_nos)]
+            start = time.perf_counter()
+            store.mark(students_data[roll_no]["name"], roll_no, f"Benchmark {i // len(roll_nos)}")
+            latencies.append(time.perf_counter() - start)
+    store.close()
+    results["store"] = latency_stats(latencies)
+    return results
+
+def bench_report(history, students_data, jobs, work_dir):
+    """Time generate_attendance_report on the history in a scratch project directory."""
+    from face_detection_utils import STUDENTS_FILE, initialize_directories
+    from calculate_report import generate_attendance_report
+
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        initialize_directories()
+        with open(STUDENTS_FILE, "wb") as f:
+            pickle.dump(students_data, f)
+        with AttendanceStore(ATTENDANCE_DB) as store:
+            store.mark_many(history_records(history, students_data))
+
+        if os.path.exists("report.xlsx"):
+            os.remove("report.xlsx")
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            generate_attendance_report("report.xlsx", jobs=jobs)
+        seconds = time.perf_counter() - start
+        # generate_attendance_report prints its errors instead of raising them
+        if not os.path.exists("report.xlsx") or os.path.getsize("report.xlsx") == 0:
+            raise RuntimeError(f"generate_attendance_report did not write report.xlsx:\n{output.getvalue()}")
+        return {"seconds": seconds, "records": len(history), "records_per_sec": len(history) / seconds}
+    finally:
+        os.chdir(cwd)
+
+def run_suite(args):
+    """Run every benchmark and return the JSON-ready results."""
+    results = []
+    frames = load_input_frames(args.inputs, args.max_frames, args.frames, args.seed)
+
+    detected = []
+    for name, input_frames in frames.items():
+        print(f"detect_faces: {name} ({len(input_frames)} frames)")
+        stats, encodings = bench_detect(input_frames)
+        detected.extend(encodings)
+        results.append(dict(benchmark="detect_faces", variant=name, scale=None, **stats))
+
+    for scale in args.scales:
+        gallery, _, _ = synthetic_gallery(scale, 0, seed=args.seed)
+        batches = probe_batches(detected, gallery, args.frames, args.faces_per_frame, args.seed)
+        print(f"recognize_faces: gallery of {scale} ({len(batches)} frames)")
+        for variant, stats in bench_recognize(gallery, batches, args.rebuild_sample).items():
+            results.append(dict(benchmark="recognize_faces", variant=variant, scale=scale, **stats))
+
+        history, students_data = synthetic_log(scale, args.sessions, args.subjects, seed=args.seed)
+        with tempfile.TemporaryDirectory() as work_dir:
+            if not args.skip_excel:
+                print(f"update_attendance_excel: {min(len(history), MAX_EXCEL_ROWS)} history rows")
+                for variant, stats in bench_excel(history, students_data, args.excel_marks,
+                                                  args.store_marks, work_dir).items():
+                    results.append(dict(benchmark="update_attendance_excel", variant=variant, scale=scale, **stats))
+
+            if not args.skip_report:
+                print(f"calculate_report: {scale} students x {args.sessions} sessions")
+                stats = bench_report(history, students_data, args.jobs, work_dir)
+                results.append(dict(benchmark="calculate_report", variant="generate", scale=scale, **stats))
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+def _key(result):
+    return result["benchmark"], result["variant"], result["scale"]
+
+def _headline(result):
+    """The number compared between runs: seconds for reports, mean ms otherwise."""
+    return result.get("seconds", result.get("mean_ms"))
+
+def print_results(suite, baseline=None):
+    """Print the results, with the change against a baseline run if given."""
+    previous = {_key(r): r for r in baseline["results"]} if baseline else {}
+    print(f"\n{'Benchmark':<24} {'Variant':<14} {'Scale':>7} {'Calls':>6} {'Mean ms':>10} {'P95 ms':>10}"
+          + (f" {'vs base':>8}" if baseline else ""))
+    print("=" * (76 + (9 if baseline else 0)))
+    for r in suite["results"]:
+        if "seconds" in r:
+            mean, p95, calls = r["seconds"] * 1000, r["seconds"] * 1000, 1
+        else:
+            mean, p95, calls = r.get("mean_ms", 0.0), r.get("p95_ms", 0.0), r["calls"]
+        line = (f"{r['benchmark']:<24} {str(r['variant'])[:14]:<14} {r['scale'] or '-':>7} {calls:>6} "
+                f"{mean:>10.2f} {p95:>10.2f}")
+        base = previous.get(_key(r))
+        if base and _headline(base) and _headline(r) is not None:
+            line += f" {_headline(r) / _headline(base):>7.2f}x"
+        print(line)
+    print("=" * (76 + (9 if baseline else 0)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible end-to-end benchmark suite")
+    parser.add_argument("--inputs", nargs="*", default=[], help="Video files and/or image folders")
+    parser.add_argument("--max-frames", type=int, default=200, help="Frames read per input")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Gallery/history sizes")
+    parser.add_argument("--frames", type=int, default=50,
+                        help="Synthetic frames when no inputs are given, and probe frames without detected faces")
+    parser.add_argument("--faces-per-frame", type=int, default=5)
+    parser.add_argument("--rebuild-sample", type=int, default=10,
+                        help="Frames timed while rebuilding the gallery matrix per call")
+    parser.add_argument("--sessions", type=int, default=10, help="Sessions per student in the history")
+    parser.add_argument("--subjects", type=int, default=5)
+    parser.add_argument("--excel-marks", type=int, default=3, help="update_attendance_excel calls per scale")
+    parser.add_argument("--store-marks", type=int, default=200, help="AttendanceStore.mark calls per scale")
+    parser.add_argument("--jobs", type=int, help="Parallel jobs for the report (default: CPU count)")
+    parser.add_argument("--skip-excel", action="store_true")
+    parser.add_argument("--skip-report", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            parser.error(f"input not found: {path}")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    suite = run_suite(args)
+    print_results(suite, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(suite, f, indent=2)
+        print(f"Results written to {args.output}")
+    else:
+        json.dump(suite, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
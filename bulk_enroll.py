@@ -0,0 +1,345 @@
+"""
+Offline bulk enrolment of students from a CSV file and a folder of photos.
+
+The CSV needs the columns roll_no, name, semester and subjects (separated by
+';'), and may have year and photo columns. Without a photo column, the photo
+is looked up as <roll_no>.jpg/.jpeg/.png in the photo folder.
+
+Photos are detected in parallel worker processes, and the faces of each
+worker's batch of photos are encoded together. Photos with
+zero or several faces are rejected. All accepted students are committed to
+the gallery and students.pkl in one write each.
+
+Results are kept in the encoding cache keyed by the photo's content, so
+re-running an enrolment or re-indexing the saved photos with
+reindex_saved_photos() only processes new or changed photos.
+
+Usage:
+    python bulk_enroll.py intake.csv photos/ --workers 8
+    python bulk_enroll.py --reindex
+"""
+import os
+import csv
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from face_detection_utils import (
+    FACES_DIR,
+    initialize_directories,
+    load_students_data,
+    save_students_data,
+    batch_face_encodings
+)
+from attendance_pipeline import locate_faces
+from gallery_store import open_gallery_store
+from encoding_cache import EncodingCache, cache_config
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Photos per worker task, encoded in one batch
+ENCODE_BATCH_SIZE = 16
+
+def read_enrolment_csv(csv_path, photo_dir):
+    """
+    Read the enrolment CSV.
+
+    Returns:
+        List of student dicts with roll_no, name, semester, year, subjects and photo_path
+    """
+    students = []
+    with open(csv_path, newline='') as f:
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+            roll_no = row.get("roll_no")
+            if not roll_no or not row.get("name"):
+                print(f"Line {line_number}: missing roll_no or name, skipped")
+                continue
+
+            photo_path = None
+            if row.get("photo"):
+                photo_path = os.path.join(photo_dir, row["photo"])
+            else:
+                for extension in PHOTO_EXTENSIONS:
+                    candidate = os.path.join(photo_dir, roll_no + extension)
+                    if os.path.exists(candidate):
+                        photo_path = candidate
+                        break
+
+            students.append({
+                "roll_no": roll_no,
+                "name": row["name"],
+                "semester": row.get("semester", ""),
+                "year": row.get("year", ""),
+                "subjects": [s.strip() for s in row.get("subjects", "").split(";") if s.strip()],
+                "photo_path": photo_path,
+            })
+    return students
+
+def process_photo(photo_path, detector=None):
+    """
+    Load, detect and encode one enrolment photo (runs in a worker process).
+
+    Returns:
+        encoding: The face encoding, or None if the photo was rejected
+        reason: Why the photo was rejected, or None
+        timings: Seconds spent in the load, detect and encode stages
+        face_locations: Detected faces, or None if the photo could not be read
+    """
+    return process_photo_batch([photo_path], detector)[0]
+
+def process_photo_batch(photo_paths, detector=None):
+    """
+    Load, detect and encode several enrolment photos (runs in a worker process).
+
+    The faces of all accepted photos go through the encoder together in
+    one batch_face_encodings() call.
+
+    Returns:
+        List of process_photo() results in the order of photo_paths
+    """
+    results, items, accepted = [], [], []
+    for photo_path in photo_paths:
+        timings = {"load": 0.0, "detect": 0.0, "encode": 0.0}
+        if not photo_path or not os.path.exists(photo_path):
+            results.append((None, "photo not found", timings, None))
+            continue
+
+        start = time.perf_counter()
+        image = cv2.imread(photo_path)
+        timings["load"] = time.perf_counter() - start
+        if image is None:
+            results.append((None, "unreadable image", timings, None))
+            continue
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        start = time.perf_counter()
+        face_locations = locate_faces(rgb_image, detector)
+        timings["detect"] = time.perf_counter() - start
+        _, reason = _check_faces(face_locations)
+        if reason is None:
+            items.append((rgb_image, face_locations))
+            accepted.append(len(results))
+        results.append((None, reason, timings, face_locations))
+
+    if items:
+        start = time.perf_counter()
+        # Parallelism comes from the worker processes, so one thread per batch
+        encodings = batch_face_encodings(items, num_workers=1, batch_size=len(items))
+        encode_time = (time.perf_counter() - start) / len(items)
+        for position, face_encodings in zip(accepted, encodings):
+            _, reason, timings, face_locations = results[position]
+            timings["encode"] = encode_time
+            results[position] = (face_encodings[0], reason, timings, face_locations)
+    return results
+
+def _check_faces(face_locations, face_encodings=None):
+    """Accept a photo with exactly one face. Returns (encoding, reason)."""
+    if len(face_locations) == 0:
+        return None, "no face detected"
+    if len(face_locations) > 1:
+        return None, f"{len(face_locations)} faces detected"
+    return (face_encodings[0] if face_encodings else None), None
+
+def process_photos(photo_paths, num_workers=None, detector=None, cache=None):
+    """
+    Process photos in worker processes, reusing cached results.
+
+    Args:
+        photo_paths: Photo file paths (None for a missing photo)
+        num_workers: Number of worker processes (default: CPU count)
+        detector: Detector backend name or dict of create_detector arguments
+        cache: EncodingCache to read and fill (optional)
+
+    Returns:
+        List of process_photo() results in the order of photo_paths
+    """
+    results = [None] * len(photo_paths)
+    keys = [None] * len(photo_paths)
+    if cache is not None:
+        config = cache_config(detector)
+        for i, photo_path in enumerate(photo_paths):
+            if not photo_path or not os.path.exists(photo_path):
+                continue
+            with open(photo_path, 'rb') as f:
+                keys[i] = cache.make_key(f.read(), config)
+            cached = cache.get(keys[i])
+            if cached is not None:
+                face_locations, face_encodings = cached
+                encoding, reason = _check_faces(face_locations, face_encodings)
+                results[i] = (encoding, reason, {"load": 0.0, "detect": 0.0, "encode": 0.0}, face_locations)
+
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        num_workers = num_workers or os.cpu_count() or 1
+        batch_size = max(1, min(ENCODE_BATCH_SIZE, len(misses) // (4 * num_workers)))
+        batches = [[photo_paths[i] for i in misses[start:start + batch_size]]
+                   for start in range(0, len(misses), batch_size)]
+        with ProcessPoolExecutor(max_workers=num_workers) as pool:
+            processed = pool.map(process_photo_batch, batches, [detector] * len(batches))
+            for i, result in zip(misses, (result for batch in processed for result in batch)):
+                results[i] = result
+
+    if cache is not None:
+        for i in misses:
+            encoding, _, _, face_locations = results[i]
+            # Photos with several faces are not encoded, so there is nothing complete to cache
+            if keys[i] is not None and face_locations is not None and len(face_locations) <= 1:
+                cache.put(keys[i], face_locations, [] if encoding is None else [encoding])
+        cache.flush()
+    return results
+
+def bulk_enroll(csv_path, photo_dir, num_workers=None, detector=None, dry_run=False, use_cache=True):
+    """
+    Enrol all students of a CSV file in one batch.
+
+    Args:
+        csv_path: Enrolment CSV file
+        photo_dir: Folder with the student photos
+        num_workers: Number of worker processes (default: CPU count)
+        detector: Detector backend name or dict of create_detector arguments
+        dry_run: Only report which photos would be accepted
+        use_cache: Reuse and fill the encoding cache
+
+    Returns:
+        accepted: List of enrolled student dicts
+        rejected: List of (roll_no, reason) tuples
+    """
+    initialize_directories()
+    students = read_enrolment_csv(csv_path, photo_dir)
+    if not students:
+        print("No students found in the CSV file.")
+        return [], []
+    return enroll_students(students, num_workers, detector, dry_run, use_cache)
+
+def reindex_saved_photos(num_workers=None, detector=None, use_cache=True):
+    """
+    Re-encode the saved faces/<roll_no> photos of all registered students and rebuild the gallery.
+
+    The encoding of each accepted student is replaced by the encoding of the
+    saved photo; students whose photo is rejected keep their current one.
+    Students enrolled with several samples keep their prototypes (see
+    gallery_prototypes.py), which a single photo would only make worse.
+
+    Returns:
+        accepted: List of re-encoded student dicts
+        rejected: List of (roll_no, reason) tuples
+    """
+    initialize_directories()
+    students_data = load_students_data()
+    if not students_data:
+        print("No students registered yet!")
+        return [], []
+
+    gallery = open_gallery_store()
+    multi_sample = {roll_no for roll_no in students_data if len(gallery.encodings_for(roll_no)) > 1}
+    if multi_sample:
+        print(f"Keeping the multi-sample prototypes of {len(multi_sample)} students")
+    students = [{"roll_no": roll_no, "name": data["name"], "semester": data.get("semester", ""),
+                 "year": data.get("year", ""), "subjects": data.get("subjects", []),
+                 "photo_path": data.get("image_path")}
+                for roll_no, data in students_data.items() if roll_no not in multi_sample]
+    if not students:
+        return [], []
+    return enroll_students(students, num_workers, detector, use_cache=use_cache)
+
+def enroll_students(students, num_workers=None, detector=None, dry_run=False, use_cache=True):
+    """
+    Process the photos of a list of student dicts and commit the accepted students.
+
+    Returns:
+        accepted: List of enrolled student dicts
+        rejected: List of (roll_no, reason) tuples
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    print(f"Processing {len(students)} photos with {num_workers} worker processes...")
+
+    cache = EncodingCache() if use_cache else None
+    start = time.perf_counter()
+    results = process_photos([s["photo_path"] for s in students], num_workers, detector, cache)
+    process_time = time.perf_counter() - start
+    if cache is not None:
+        print(cache.format_stats())
+        cache.close()
+
+    accepted, rejected = [], []
+    stage_totals = {"load": 0.0, "detect": 0.0, "encode": 0.0}
+    seen = set()
+    for student, (encoding, reason, timings, _) in zip(students, results):
+        for stage, seconds in timings.items():
+            stage_totals[stage] += seconds
+        if reason is None and student["roll_no"] in seen:
+            reason = "duplicate roll number in CSV"
+        if reason is not None:
+            rejected.append((student["roll_no"], reason))
+            continue
+        seen.add(student["roll_no"])
+        student["encoding"] = encoding
+        accepted.append(student)
+
+    commit_time = 0.0
+    if accepted and not dry_run:
+        start = time.perf_counter()
+        commit_enrolment(accepted)
+        commit_time = time.perf_counter() - start
+
+    print(f"\nAccepted: {len(accepted)}, rejected: {len(rejected)}")
+    for roll_no, reason in rejected:
+        print(f"  {roll_no}: {reason}")
+
+    print(f"\n{'Stage':<10} {'CPU s':>9} {'Photos/s':>10}")
+    print("="*31)
+    for stage, seconds in stage_totals.items():
+        print(f"{stage:<10} {seconds:>9.2f} {len(students) / seconds if seconds else 0.0:>10.1f}")
+    print(f"{'wall':<10} {process_time:>9.2f} {len(students) / process_time:>10.1f}")
+    if not dry_run:
+        print(f"{'commit':<10} {commit_time:>9.2f} {len(accepted) / commit_time if commit_time else 0.0:>10.1f}")
+    print("="*31)
+    return accepted, rejected
+
+def commit_enrolment(accepted):
+    """Write a batch of accepted students to the gallery and students.pkl."""
+    gallery = open_gallery_store()
+    students_data = load_students_data()
+
+    # Re-enrolled students replace their previous encodings
+    gallery.replace_many([s["roll_no"] for s in accepted], [s["encoding"] for s in accepted])
+
+    for student in accepted:
+        image_path = os.path.join(FACES_DIR, f"{student['roll_no']}{os.path.splitext(student['photo_path'])[1]}")
+        if os.path.abspath(image_path) != os.path.abspath(student["photo_path"]):
+            shutil.copyfile(student["photo_path"], image_path)
+        students_data[student["roll_no"]] = {
+            "name": student["name"],
+            "roll_no": student["roll_no"],
+            "semester": student["semester"],
+            "year": student["year"],
+            "subjects": student["subjects"],
+            "image_path": image_path
+        }
+    save_students_data(students_data)
+    gallery.wait_for_compaction()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk enrol students from a CSV file and a photo folder")
+    parser.add_argument("csv", nargs="?", help="CSV with roll_no, name, semester, subjects (';'-separated) [, year, photo]")
+    parser.add_argument("photos", nargs="?", help="Folder with the student photos")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--detector", help="Detector backend: hog, haar or dnn (default: hog)")
+    parser.add_argument("--dry-run", action="store_true", help="Check the photos without enrolling")
+    parser.add_argument("--reindex", action="store_true",
+                        help="Re-encode the saved photos of all registered students instead of a CSV")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the encoding cache")
+    args = parser.parse_args()
+
+    if args.reindex:
+        reindex_saved_photos(num_workers=args.workers, detector=args.detector, use_cache=not args.no_cache)
+        return
+    if not args.csv or not args.photos:
+        parser.error("a CSV file and a photo folder are required (or --reindex)")
+    bulk_enroll(args.csv, args.photos, num_workers=args.workers, detector=args.detector, dry_run=args.dry_run,
+                use_cache=not args.no_cache)
+
+if __name__ == "__main__":
+    main()
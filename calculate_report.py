@@ -1,44 +1,258 @@
 """
 Script to calculate attendance reports and percentages.
+
+All sheets are built from one ReportData intermediate holding
+per-(student, subject) counts and per-(date, subject) counts, and every
+sheet and chart is derived from those instead of filtering the log per
+student. Reports read the counts from the attendance store's materialized
+aggregates (load_report_data); build_report_data computes the same counts
+from a raw attendance DataFrame with groupby/pivot_table, and
+stream_report_data from batches of records, e.g. streamed from the Parquet
+archive, so memory stays flat however long the history is.
+
+Usage:
+    python calculate_report.py
+    python calculate_report.py --subject Maths --from 2024-01-01 --to 2024-06-30
+    python calculate_report.py --semester 3 --parquet attendance_parquet
+    python calculate_report.py --jobs 8 --student-charts
 """
 import os
+import time
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import matplotlib
+matplotlib.use("Agg")  # Charts are only saved to files, also from worker processes
 import matplotlib.pyplot as plt
 from face_detection_utils import initialize_directories, load_students_data
+from attendance_store import ATTENDANCE_DB, ATTENDANCE_EXCEL, open_attendance_store
 
 # Constant for the minimum required attendance percentage
 MIN_ATTENDANCE_PERCENTAGE = 75
 
-def generate_attendance_report(output_file=None):
+# Directory for the attendance charts
+CHARTS_DIR = "attendance_charts"
+
+# Shared intermediate of all report sheets:
+# - students: Name, Semester and Year indexed by Roll No
+# - enrolled: (Roll No, Subject) pairs from the students' subject lists
+# - counts: Total and Attended classes indexed by (Roll No, Subject)
+# - daily: Present and Absent counts indexed by (Date, Subject)
+ReportData = namedtuple('ReportData', ['students', 'enrolled', 'counts', 'daily'])
+
+def build_report_data(df, students_data):
+    """
+    Aggregate the attendance log in one pass.
+    
+    Args:
+        df: Attendance records with the Roll No, Date, Subject and Status columns
+        students_data: Student information keyed by roll number
+    
+    Returns:
+        ReportData shared by all report sheets
+    """
+    students, enrolled = _student_frames(students_data)
+    counts, daily = _aggregate_records(df)
+    return ReportData(students, enrolled, counts, daily)
+
+def stream_report_data(batches, students_data):
+    """
+    Aggregate attendance records batch by batch.
+    
+    Memory is bounded by the number of (student, subject) and (date, subject)
+    pairs, not by the number of records.
+    
+    Args:
+        batches: Iterable of DataFrames with the Roll No, Date, Subject and Status columns
+        students_data: Student information keyed by roll number
+    
+    Returns:
+        ReportData shared by all report sheets
+    """
+    students, enrolled = _student_frames(students_data)
+    counts = daily = None
+    for df in batches:
+        batch_counts, batch_daily = _aggregate_records(df)
+        counts = batch_counts if counts is None else counts.add(batch_counts, fill_value=0)
+        daily = batch_daily if daily is None else daily.add(batch_daily, fill_value=0)
+    
+    if counts is None:
+        counts, daily = _aggregate_records(pd.DataFrame(columns=["Roll No", "Date", "Subject", "Status"]))
+    return ReportData(students, enrolled, counts.astype(int), daily.astype(int))
+
+def _aggregate_records(df):
+    """Per-(Roll No, Subject) Total/Attended and per-(Date, Subject) Present/Absent counts of records."""
+    # Categorical keys make the groupbys hash small integer codes instead of strings
+    records = pd.DataFrame({
+        "Roll No": df["Roll No"].astype(str).astype("category"),
+        "Subject": df["Subject"].astype("category"),
+        "Date": df["Date"].astype(str).astype("category"),
+        "Present": (df["Status"] == "Present").to_numpy(),
+    })
+    
+    counts = records.groupby(["Roll No", "Subject"], observed=True)["Present"].agg(["size", "sum"])
+    counts.columns = ["Total", "Attended"]
+    counts["Attended"] = counts["Attended"].astype(int)
+    
+    daily = records.pivot_table(index=["Date", "Subject"], columns="Present", values="Roll No",
+                                aggfunc="size", fill_value=0, observed=True)
+    daily = daily.reindex(columns=[True, False], fill_value=0)
+    daily.columns = ["Present", "Absent"]
+    daily.columns.name = None
+    
+    # Plain string keys, so partial results of different batches align
+    for frame in (counts, daily):
+        frame.index = pd.MultiIndex.from_arrays(
+            [frame.index.get_level_values(level).astype(str) for level in range(2)], names=frame.index.names)
+    return counts, daily
+
+def load_report_data(attendance_store, students_data, subject=None):
+    """
+    Read the report counts from the attendance store's materialized aggregates.
+    
+    Unlike build_report_data() this does not scan the attendance log.
+    
+    Args:
+        attendance_store: AttendanceStore to read from
+        students_data: Student information keyed by roll number
+        subject: Only report on this subject
+    
+    Returns:
+        ReportData shared by all report sheets
+    """
+    students, enrolled = _student_frames(students_data)
+    counts = attendance_store.student_totals(subject).set_index(["Roll No", "Subject"])
+    daily = attendance_store.daily_totals(subject).set_index(["Date", "Subject"])
+    return ReportData(students, enrolled, counts, daily)
+
+def select_students(students_data, subject=None, semester=None):
+    """Students enrolled in subject and/or in semester."""
+    selected = {}
+    for roll_no, data in students_data.items():
+        if subject is not None and subject not in data.get("subjects", []):
+            continue
+        if semester is not None and str(data.get("semester")) != str(semester):
+            continue
+        if subject is not None:
+            data = dict(data, subjects=[subject])
+        selected[roll_no] = data
+    return selected
+
+def _student_frames(students_data):
+    """Student details indexed by roll number, and the (Roll No, Subject) enrolment pairs."""
+    students = pd.DataFrame.from_dict(
+        {roll_no: {"Name": data["name"], "Semester": data.get("semester", "N/A"), "Year": data.get("year", "N/A")}
+         for roll_no, data in students_data.items()},
+        orient="index", columns=["Name", "Semester", "Year"])
+    students.index = students.index.astype(str)
+    students.index.name = "Roll No"
+    
+    enrolled = pd.DataFrame([(str(roll_no), subject) for roll_no, data in students_data.items()
+                             for subject in data.get("subjects", [])], columns=["Roll No", "Subject"])
+    return students, enrolled
+
+def _percentage(attended, total):
+    """Attendance percentage rounded to 2 decimals, 0 where no classes were held."""
+    attended = np.asarray(attended, dtype=float)
+    total = np.asarray(total, dtype=float)
+    return np.round(np.divide(attended * 100, total, out=np.zeros_like(attended), where=total > 0), 2)
+
+def overall_summary(report):
+    """One row per registered student with their attendance over all subjects."""
+    totals = report.counts.groupby(level="Roll No", observed=True)[["Total", "Attended"]].sum()
+    overall_df = report.students.join(totals).fillna({"Total": 0, "Attended": 0})
+    overall_df = overall_df.rename(columns={"Total": "Total Classes", "Attended": "Attended Classes"})
+    overall_df[["Total Classes", "Attended Classes"]] = overall_df[["Total Classes", "Attended Classes"]].astype(int)
+    overall_df["Overall Percentage"] = _percentage(overall_df["Attended Classes"], overall_df["Total Classes"])
+    overall_df["Status"] = np.where(overall_df["Overall Percentage"] >= MIN_ATTENDANCE_PERCENTAGE, "Good", "Low")
+    return overall_df.sort_index().reset_index()
+
+def student_subject_summary(report):
+    """One row per (student, enrolled subject) with attendance counts and percentage."""
+    counts = report.counts.reset_index()
+    counts["Roll No"] = counts["Roll No"].astype(str)
+    counts["Subject"] = counts["Subject"].astype(str)
+    student_df = report.enrolled.merge(counts, on=["Roll No", "Subject"], how="left")
+    student_df = student_df.fillna({"Total": 0, "Attended": 0})
+    student_df = student_df.join(report.students["Name"], on="Roll No")
+    
+    student_df["Total Classes"] = student_df["Total"].astype(int)
+    student_df["Attended Classes"] = student_df["Attended"].astype(int)
+    student_df["Percentage"] = _percentage(student_df["Attended Classes"], student_df["Total Classes"])
+    student_df["Status"] = np.where(student_df["Percentage"] >= MIN_ATTENDANCE_PERCENTAGE, "Good", "Low")
+    columns = ["Roll No", "Name", "Subject", "Total Classes", "Attended Classes", "Percentage", "Status"]
+    return student_df[columns].sort_values(["Roll No", "Subject"]).reset_index(drop=True)
+
+def subject_summary(report, student_df=None):
+    """One row per subject with classes held, enrolment and average attendance."""
+    if student_df is None:
+        student_df = student_subject_summary(report)
+    classes_held = report.daily.groupby(level="Subject", observed=True).size()
+    classes_held.index = classes_held.index.astype(str)
+    
+    subject_df = student_df.groupby("Subject").agg(
+        **{"Enrolled Students": ("Roll No", "size"),
+           "Average Percentage": ("Percentage", "mean"),
+           "Students Below Minimum": ("Status", lambda status: int((status == "Low").sum()))})
+    subject_df.insert(0, "Classes Held", classes_held.reindex(subject_df.index, fill_value=0).astype(int))
+    subject_df["Average Percentage"] = subject_df["Average Percentage"].round(2)
+    return subject_df.reset_index()
+
+def daily_summary(report):
+    """One row per (date, subject) with present/absent counts."""
+    daily_df = report.daily.reset_index()
+    daily_df[["Date", "Subject"]] = daily_df[["Date", "Subject"]].astype(str)
+    daily_df["Total"] = daily_df["Present"] + daily_df["Absent"]
+    daily_df["Attendance Percentage"] = _percentage(daily_df["Present"], daily_df["Total"])
+    return daily_df.sort_values(["Date", "Subject"]).reset_index(drop=True)
+
+def generate_attendance_report(output_file=None, subject=None, semester=None, start_date=None, end_date=None,
+                               parquet_dir=None, jobs=None, student_charts=False, constant_memory=None):
     """
     Generate attendance report with percentages for all students.
     
+    The sheet DataFrames are computed concurrently and the charts are rendered
+    in a process pool while the workbook is written.
+    
     Args:
         output_file: Path to save the output Excel report (optional)
+        subject: Only report on this subject (optional)
+        semester: Only report on students of this semester (optional)
+        start_date: Only count classes on or after this date, YYYY-MM-DD (optional)
+        end_date: Only count classes on or before this date, YYYY-MM-DD (optional)
+        parquet_dir: Stream the records from this Parquet archive instead of
+                     the attendance database (optional)
+        jobs: Number of parallel jobs for sheets and charts (default: CPU count)
+        student_charts: Also render one chart per student
+        constant_memory: Write the workbook in xlsxwriter's constant-memory mode
+                         (default: for sheets of CONSTANT_MEMORY_ROWS rows or more)
     """
     # Initialize directories
     initialize_directories()
     
     # Load student data
-    students_data = load_students_data()
+    students_data = select_students(load_students_data(), subject, semester)
     
     if not students_data:
         print("No students registered yet. Please register students first.")
         return
     
-    # Check if attendance file exists
-    attendance_file = "attendance.xlsx"
-    if not os.path.exists(attendance_file):
+    # Check if any attendance has been recorded
+    if parquet_dir is None and not os.path.exists(ATTENDANCE_DB) and not os.path.exists(ATTENDANCE_EXCEL):
         print("No attendance records found. Please take attendance first.")
         return
     
+    jobs = jobs or os.cpu_count() or 1
+    timings = []
     try:
-        # Load attendance data
-        df = pd.read_excel(attendance_file)
+        start = time.perf_counter()
+        report = load_filtered_report_data(students_data, subject, semester, start_date, end_date, parquet_dir)
+        timings.append(("load", time.perf_counter() - start))
         
-        if df.empty:
+        if report.counts.empty:
             print("No attendance records found in the file.")
             return
         
@@ -47,96 +261,415 @@ def generate_attendance_report(output_file=None):
             current_date = datetime.now().strftime("%Y%m%d")
             output_file = f"attendance_report_{current_date}.xlsx"
         
-        # Create Excel writer
-        with pd.ExcelWriter(output_file) as writer:
-            # 1. Overall Report Sheet
-            create_overall_report(df, students_data, writer)
+        start = time.perf_counter()
+        sheets = compute_sheets(report, jobs)
+        timings.append(("sheets", time.perf_counter() - start))
+        
+        # Charts render in worker processes while the workbook is written here
+        print("\nGenerating attendance charts...")
+        chart_tasks = chart_tasks_for(report, sheets, CHARTS_DIR, student_charts, jobs)
+        pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        try:
+            start = time.perf_counter()
+            if pool is not None:
+                chart_futures = [pool.submit(function, *args) for function, args in chart_tasks]
             
-            # 2. Subject-wise Report Sheet
-            create_subject_wise_report(df, students_data, writer)
+            # Create Excel writer; very large sheets are streamed to disk row by row
+            write_start = time.perf_counter()
+            if constant_memory is None:
+                constant_memory = max(len(df) for df in sheets.values()) >= CONSTANT_MEMORY_ROWS
+            with open_report_writer(output_file, constant_memory) as writer:
+                # 1. Overall Report Sheet
+                create_overall_report(sheets["overall"], writer)
+                
+                # 2. Subject-wise Report Sheet
+                create_subject_wise_report(sheets["subject"], writer)
+                
+                # 3. Student-wise Report Sheet
+                create_student_wise_report(sheets["student"], writer)
+                
+                # 4. Daily Attendance Sheet
+                create_daily_attendance_report(sheets["daily"], writer)
+            timings.append(("workbook", time.perf_counter() - write_start))
             
-            # 3. Student-wise Report Sheet
-            create_student_wise_report(df, students_data, writer)
+            print(f"\nAttendance report generated successfully: {output_file}")
             
-            # 4. Daily Attendance Sheet
-            create_daily_attendance_report(df, writer)
-        
-        print(f"\nAttendance report generated successfully: {output_file}")
-        
-        # Visualize attendance data
-        visualize_attendance_data(df, students_data)
+            # Visualize attendance data
+            if pool is not None:
+                for future in chart_futures:
+                    future.result()
+            else:
+                for function, args in chart_tasks:
+                    function(*args)
+            timings.append(("charts", time.perf_counter() - start))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        print(f"{len(chart_tasks)} chart jobs saved in the '{CHARTS_DIR}' directory.")
         
+        print(f"\n{'Stage':<10} {'Seconds':>9}")
+        print("="*20)
+        for stage, seconds in timings:
+            print(f"{stage:<10} {seconds:>9.2f}")
+        print("="*20)
+        print(f"(charts run alongside the workbook write, {jobs} job(s))")
+    
     except Exception as e:
         print(f"Error generating report: {e}")
 
-def create_overall_report(df, students_data, writer):
+def compute_sheets(report, jobs=1):
+    """
+    Compute the DataFrames of all report sheets concurrently.
+    
+    Returns:
+        Dict with the overall, subject, student and daily sheet DataFrames
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, 3))) as pool:
+        overall = pool.submit(overall_summary, report)
+        student = pool.submit(student_subject_summary, report)
+        daily = pool.submit(daily_summary, report)
+        # The subject sheet is derived from the student sheet
+        subject = subject_summary(report, student.result())
+        return {"overall": overall.result(), "subject": subject, "student": student.result(),
+                "daily": daily.result()}
+
+def load_filtered_report_data(students_data, subject=None, semester=None, start_date=None, end_date=None,
+                              parquet_dir=None):
+    """
+    Load the ReportData for a report, reading as little history as possible.
+    
+    Without a date range or semester the materialized totals are used.
+    Otherwise only the matching records are read: from the Parquet archive
+    only the needed partitions and columns are streamed batch by batch.
+    """
+    roll_nos = list(students_data) if semester is not None else None
+    columns = ["Roll No", "Date", "Subject", "Status"]
+    
+    if parquet_dir is not None:
+        from attendance_parquet import iter_attendance_batches
+        batches = iter_attendance_batches(parquet_dir, columns, subject, start_date, end_date, roll_nos)
+        return stream_report_data(batches, students_data)
+    
+    with open_attendance_store() as attendance_store:
+        if start_date is None and end_date is None and semester is None:
+            # The attendance counts are kept up to date as marks are written
+            return load_report_data(attendance_store, students_data, subject)
+        
+        df = attendance_store.to_dataframe(columns, subject, start_date, end_date)
+    if roll_nos is not None:
+        df = df[df["Roll No"].isin(roll_nos)]
+    return build_report_data(df, students_data)
+
+# Sheets with at least this many rows are written in xlsxwriter's constant-memory mode
+CONSTANT_MEMORY_ROWS = 200000
+
+# Highlight colour for attendance below the minimum
+LOW_ATTENDANCE_COLOR = '#FF9999'  # Light red color
+
+def open_report_writer(output_file, constant_memory=False):
+    """
+    Open an xlsxwriter-backed ExcelWriter for a report.
+    
+    In constant-memory mode each row is flushed to disk once the next row is
+    started, so memory stays flat for very large sheets; write_sheet() writes
+    strictly row by row to allow this.
+    """
+    options = {"constant_memory": constant_memory, "nan_inf_to_errors": True}
+    return pd.ExcelWriter(output_file, engine="xlsxwriter", engine_kwargs={"options": options})
+
+def column_widths(df, sample_rows=1000):
+    """
+    Column widths fitting the header and the longest value of a row sample.
+    
+    Widths come from vectorized string lengths over at most sample_rows
+    evenly spaced rows instead of every cell.
+    """
+    step = max(1, len(df) // sample_rows)
+    sample = df.iloc[::step]
+    widths = []
+    for col in df.columns:
+        longest = sample[col].astype(str).str.len().max() if len(sample) else 0
+        widths.append(max(int(longest), len(str(col))) + 2)
+    return widths
+
+def write_sheet(df, writer, sheet_name, highlight=()):
+    """
+    Write a report sheet, highlighting low attendance in the given columns.
+    
+    Highlighting uses native Excel conditional formats (one rule per column)
+    instead of a computed style for every cell.
+    """
+    workbook = writer.book
+    worksheet = workbook.add_worksheet(sheet_name)
+    writer.sheets[sheet_name] = worksheet
+    
+    # Column widths must be set before any row is written in constant-memory mode
+    for i, width in enumerate(column_widths(df)):
+        worksheet.set_column(i, i, width)
+    
+    header_format = workbook.add_format({"bold": True, "border": 1})
+    worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+    columns = [df[col].tolist() for col in df.columns]
+    for row, values in enumerate(zip(*columns), start=1):
+        worksheet.write_row(row, 0, values)
+    
+    low_format = workbook.add_format({"bg_color": LOW_ATTENDANCE_COLOR})
+    for col in highlight:
+        if col not in df.columns or df.empty:
+            continue
+        i = df.columns.get_loc(col)
+        if pd.api.types.is_numeric_dtype(df[col]):
+            rule = {"type": "cell", "criteria": "<", "value": MIN_ATTENDANCE_PERCENTAGE, "format": low_format}
+        else:
+            rule = {"type": "cell", "criteria": "==", "value": '"Low"', "format": low_format}
+        worksheet.conditional_format(1, i, len(df), i, rule)
+
+def create_overall_report(overall_df, writer):
     """Create overall attendance report sheet."""
     print("\nGenerating overall attendance report...")
+    write_sheet(overall_df, writer, "Overall Report", highlight=["Overall Percentage", "Status"])
+
+def create_subject_wise_report(subject_df, writer):
+    """Create subject-wise attendance report sheet."""
+    print("Generating subject-wise attendance report...")
+    write_sheet(subject_df, writer, "Subject-wise Report", highlight=["Average Percentage"])
+
+def create_student_wise_report(student_df, writer):
+    """Create student-wise attendance report sheet."""
+    print("Generating student-wise attendance report...")
+    write_sheet(student_df, writer, "Student-wise Report", highlight=["Percentage", "Status"])
+
+def create_daily_attendance_report(daily_df, writer):
+    """Create daily attendance report sheet."""
+    print("Generating daily attendance report...")
+    write_sheet(daily_df, writer, "Daily Attendance Report")
+
+def _chart_file_name(name):
+    """Make a subject name or roll number safe to use as a file name."""
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(name))
+
+def _minimum_line(ax, horizontal=True):
+    line = ax.axhline if horizontal else ax.axvline
+    line(MIN_ATTENDANCE_PERCENTAGE, color="red", linestyle="--", label=f"Minimum ({MIN_ATTENDANCE_PERCENTAGE}%)")
+
+def plot_subject_overview(subject_df, charts_dir):
+    """Bar chart of the average attendance per subject."""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bar(subject_df["Subject"], subject_df["Average Percentage"], color="skyblue")
+    _minimum_line(ax)
+    ax.set_title("Average Attendance by Subject")
+    ax.set_xlabel("Subject")
+    ax.set_ylabel("Attendance (%)")
+    ax.set_ylim(0, 100)
+    ax.legend()
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+    fig.tight_layout()
+    fig.savefig(os.path.join(charts_dir, "subject_attendance.png"))
+    plt.close(fig)
+
+def plot_attendance_distribution(percentages, charts_dir):
+    """Histogram of the overall attendance percentages of all students."""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.hist(percentages, bins=np.arange(0, 105, 5), color="lightgreen", edgecolor="black")
+    _minimum_line(ax, horizontal=False)
+    ax.set_title("Distribution of Overall Attendance")
+    ax.set_xlabel("Attendance (%)")
+    ax.set_ylabel("Number of Students")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(os.path.join(charts_dir, "attendance_distribution.png"))
+    plt.close(fig)
+
+def plot_daily_trend(daily_df, charts_dir, title="Daily Attendance", file_name="daily_attendance.png"):
+    """Line chart of the attendance percentage per date."""
+    daily_totals = daily_df.groupby("Date")[["Present", "Total"]].sum().sort_index()
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(daily_totals.index.astype(str), _percentage(daily_totals["Present"], daily_totals["Total"]),
+            marker="o", color="steelblue")
+    _minimum_line(ax)
+    ax.set_title(title)
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Attendance (%)")
+    ax.set_ylim(0, 100)
+    ax.legend()
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+    fig.tight_layout()
+    fig.savefig(os.path.join(charts_dir, file_name))
+    plt.close(fig)
+
+def plot_subject_chart(subject, percentages, daily_df, charts_dir):
+    """Per-subject chart: distribution of the students' attendance and the daily trend."""
+    fig, (hist_ax, trend_ax) = plt.subplots(1, 2, figsize=(14, 5))
+    hist_ax.hist(percentages, bins=np.arange(0, 105, 5), color="lightgreen", edgecolor="black")
+    _minimum_line(hist_ax, horizontal=False)
+    hist_ax.set_title(f"{subject}: Student Attendance")
+    hist_ax.set_xlabel("Attendance (%)")
+    hist_ax.set_ylabel("Number of Students")
     
-    # Get all subjects
-    all_subjects = set()
-    for data in students_data.values():
-        all_subjects.update(data.get("subjects", []))
+    daily_df = daily_df.sort_values("Date")
+    trend_ax.plot(daily_df["Date"], daily_df["Attendance Percentage"], marker="o", color="steelblue")
+    _minimum_line(trend_ax)
+    trend_ax.set_title(f"{subject}: Daily Attendance")
+    trend_ax.set_xlabel("Date")
+    trend_ax.set_ylim(0, 100)
+    plt.setp(trend_ax.get_xticklabels(), rotation=45, ha="right")
+    fig.tight_layout()
+    fig.savefig(os.path.join(charts_dir, "subjects", f"{_chart_file_name(subject)}.png"))
+    plt.close(fig)
+
+def plot_student_charts(students, charts_dir):
+    """
+    Per-student bar charts of the attendance in each subject.
     
-    # Create a list to store results
-    results = []
+    Args:
+        students: List of (roll_no, name, subjects, percentages) tuples
+        charts_dir: Directory to save the charts in
+    """
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for roll_no, name, subjects, percentages in students:
+        ax.clear()
+        colors = ["salmon" if p < MIN_ATTENDANCE_PERCENTAGE else "skyblue" for p in percentages]
+        ax.bar(subjects, percentages, color=colors)
+        _minimum_line(ax)
+        ax.set_title(f"{name} ({roll_no})")
+        ax.set_ylabel("Attendance (%)")
+        ax.set_ylim(0, 100)
+        ax.legend()
+        plt.setp(ax.get_xticklabels(), rotation=45, ha="right")
+        fig.tight_layout()
+        fig.savefig(os.path.join(charts_dir, "students", f"{_chart_file_name(roll_no)}.png"))
+    plt.close(fig)
+
+def chart_tasks_for(report, sheets, charts_dir=CHARTS_DIR, student_charts=False, jobs=1):
+    """
+    List the chart rendering jobs of a report as (function, args) pairs.
     
-    # Calculate for each student
-    for roll_no, data in students_data.items():
-        student_name = data["name"]
-        student_subjects = data.get("subjects", [])
-        
-        # Filter attendance records for this student
-        student_df = df[df["Roll No"] == roll_no]
+    Each job only receives the slice of data it plots, so it is cheap to
+    send to a worker process. Student charts are split into about four jobs
+    per worker, at most 50 students each.
+    """
+    os.makedirs(os.path.join(charts_dir, "subjects"), exist_ok=True)
+    tasks = [
+        (plot_subject_overview, (sheets["subject"], charts_dir)),
+        (plot_attendance_distribution, (sheets["overall"]["Overall Percentage"].to_numpy(), charts_dir)),
+        (plot_daily_trend, (sheets["daily"], charts_dir)),
+    ]
+    
+    student_df = sheets["student"]
+    daily_by_subject = dict(tuple(sheets["daily"].groupby("Subject")))
+    for subject, rows in student_df.groupby("Subject"):
+        subject_daily = daily_by_subject.get(subject, sheets["daily"].iloc[:0])
+        tasks.append((plot_subject_chart, (subject, rows["Percentage"].to_numpy(), subject_daily, charts_dir)))
+    
+    if student_charts:
+        os.makedirs(os.path.join(charts_dir, "students"), exist_ok=True)
+        students = [(roll_no, rows["Name"].iloc[0], rows["Subject"].tolist(), rows["Percentage"].tolist())
+                    for roll_no, rows in student_df.groupby("Roll No", sort=False)]
+        students_per_task = min(50, max(1, -(-len(students) // (4 * jobs))))
+        for i in range(0, len(students), students_per_task):
+            tasks.append((plot_student_charts, (students[i:i + students_per_task], charts_dir)))
+    return tasks
+
+def visualize_attendance_data(report, charts_dir=CHARTS_DIR, jobs=1, student_charts=False):
+    """
+    Create attendance charts in the charts directory.
+    
+    Args:
+        report: ReportData from build_report_data()
+        charts_dir: Directory to save the charts in
+        jobs: Number of worker processes to render the charts with
+        student_charts: Also render one chart per student
+    """
+    print("\nGenerating attendance charts...")
+    tasks = chart_tasks_for(report, compute_sheets(report, jobs), charts_dir, student_charts, jobs)
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for future in [pool.submit(function, *args) for function, args in tasks]:
+                future.result()
+    else:
+        for function, args in tasks:
+            function(*args)
+    print(f"Charts saved in the '{charts_dir}' directory.")
+
+def show_low_attendance():
+    """Print students below the minimum attendance percentage in any subject."""
+    students_data = load_students_data()
+    if not students_data:
+        print("No students registered yet. Please register students first.")
+        return
+    
+    # Read from the materialized per-(student, subject) counts
+    with open_attendance_store() as attendance_store:
+        low_df = attendance_store.low_attendance(MIN_ATTENDANCE_PERCENTAGE)
+    low_df = low_df[low_df["Roll No"].isin(students_data)]
+    if low_df.empty:
+        print(f"\nNo students below {MIN_ATTENDANCE_PERCENTAGE}% attendance.")
+        return
+    
+    print(f"\n===== Students Below {MIN_ATTENDANCE_PERCENTAGE}% Attendance =====")
+    print(f"{'Roll No':<10} {'Name':<20} {'Subject':<15} {'Attended':>9} {'Total':>6} {'%':>7}")
+    print("="*70)
+    for roll_no, subject, total, attended, percentage in low_df.itertuples(index=False):
+        name = students_data[roll_no]["name"]
+        print(f"{roll_no:<10} {name:<20} {subject:<15} {attended:>9} {total:>6} {percentage:>7.2f}")
+    print("="*70)
+
+def check_attendance_totals():
+    """Verify the materialized attendance totals against the attendance log, repairing them if needed."""
+    with open_attendance_store() as attendance_store:
+        mismatches = attendance_store.check_aggregates()
+        if not any(mismatches.values()):
+            print("\nAttendance totals are consistent with the attendance log.")
+            return
         
-        # Create a dictionary for this student
-        student_result = {
-            "Roll No": roll_no,
-            "Name": student_name,
-            "Semester": data.get("semester", "N/A"),
-            "Year": data.get("year", "N/A")
-        }
+        for table, count in mismatches.items():
+            print(f"{table}: {count} rows differ from the attendance log")
+        confirm = input("Rebuild the totals from the attendance log? (y/n): ")
+        if confirm.lower() == 'y':
+            attendance_store.rebuild_aggregates()
+            print("Attendance totals rebuilt.")
+
+def main(argv=None):
+    """Main function to run the report system; with options, generate one report directly."""
+    parser = argparse.ArgumentParser(description="Generate attendance reports")
+    parser.add_argument("--output", help="Output Excel file")
+    parser.add_argument("--subject", help="Only report on this subject")
+    parser.add_argument("--semester", help="Only report on students of this semester")
+    parser.add_argument("--from", dest="start_date", help="First date to include (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", help="Last date to include (YYYY-MM-DD)")
+    parser.add_argument("--parquet", help="Read the records from this Parquet archive")
+    parser.add_argument("--jobs", type=int, help="Parallel jobs for sheets and charts (default: CPU count)")
+    parser.add_argument("--student-charts", action="store_true", help="Also render one chart per student")
+    parser.add_argument("--constant-memory", action="store_true", default=None,
+                        help="Stream the workbook to disk row by row (automatic for very large sheets)")
+    args = parser.parse_args(argv)
+    
+    if any(value not in (None, False) for value in vars(args).values()):
+        generate_attendance_report(args.output, args.subject, args.semester, args.start_date, args.end_date,
+                                   args.parquet, jobs=args.jobs, student_charts=args.student_charts,
+                                   constant_memory=args.constant_memory)
+        return
+    
+    while True:
+        print("\n===== Attendance Reports =====")
+        print("1. Generate Attendance Report")
+        print("2. Show Students Below Minimum Attendance")
+        print("3. Check Attendance Totals")
+        print("4. Exit")
         
-        # Total classes (counting both present and absent)
-        total_classes = len(student_df)
-        attended_classes = len(student_df[student_df["Status"] == "Present"])
+        choice = input("\nEnter your choice (1-4): ")
         
-        if total_classes > 0:
-            overall_percentage = (attended_classes / total_classes) * 100
+        if choice == '1':
+            generate_attendance_report()
+        elif choice == '2':
+            show_low_attendance()
+        elif choice == '3':
+            check_attendance_totals()
+        elif choice == '4':
+            print("Exiting report system...")
+            break
         else:
-            overall_percentage = 0
-        
-        student_result["Total Classes"] = total_classes
-        student_result["Attended Classes"] = attended_classes
-        student_result["Overall Percentage"] = round(overall_percentage, 2)
-        student_result["Status"] = "Good" if overall_percentage >= MIN_ATTENDANCE_PERCENTAGE else "Low"
-        
-        # Add to results
-        results.append(student_result)
-    
-    # Create DataFrame
-    overall_df = pd.DataFrame(results)
-    
-    # Sort by roll number
-    overall_df = overall_df.sort_values("Roll No")
-    
-    # Apply conditional formatting to highlight low attendance
-    def highlight_low_attendance(val):
-        if isinstance(val, (int, float)) and isinstance(val, str) is False:
-            if val < MIN_ATTENDANCE_PERCENTAGE:
-                return 'background-color: #FF9999'  # Light red color
-        if val == "Low":
-            return 'background-color: #FF9999'  # Light red color
-        return ''
-    
-    # Convert to Excel
-    overall_df.style.applymap(highlight_low_attendance).to_excel(writer, sheet_name="Overall Report", index=False)
-    
-    # Adjust column widths
-    worksheet = writer.sheets["Overall Report"]
-    for i, col in enumerate(overall_df.columns):
-        max_length = max(overall_df[col].astype(str).map(len).max(), len(col)) + 2
-        worksheet.set_column(i, i, max_length)
-
-def create_subject_wise_report(df, students_data, writer):
-    """Create subject-wise attendance report sheet."""
+            print("Invalid choice. Please try again.")
+
+if __name__ == "__main__":
+    main()
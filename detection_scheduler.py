@@ -0,0 +1,210 @@
+"""
+Run the full face detector only every Nth frame and propagate boxes in between.
+
+Between detections, boxes are moved either with sparse optical flow
+(Lucas-Kanade on corner points inside each box) or with an OpenCV object
+tracker per box. The detection interval adapts: it drops back to every
+frame when the scene changes suddenly, when propagation loses a face or when
+a detection finds a new face, and grows again while the scene is stable.
+"""
+import cv2
+import numpy as np
+from face_detection_utils import detect_face_locations
+
+def _to_gray(frame):
+    return frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+
+class OpticalFlowPropagator:
+    """Move boxes by the median Lucas-Kanade flow of corner points inside them."""
+
+    def __init__(self, max_corners=30, min_points=4):
+        """
+        Args:
+            max_corners: Corner points tracked per box
+            min_points: A box with fewer successfully tracked points is lost
+        """
+        self.max_corners = max_corners
+        self.min_points = min_points
+        self._prev_gray = None
+        self._points = None
+        self._labels = None
+        self._boxes = []
+
+    def init(self, frame, boxes):
+        """Start propagating the given (top, right, bottom, left) boxes from frame."""
+        gray = _to_gray(frame)
+        points, labels = [], []
+        for i, (top, right, bottom, left) in enumerate(boxes):
+            mask = np.zeros_like(gray)
+            mask[max(top, 0):max(bottom, 0), max(left, 0):max(right, 0)] = 255
+            corners = cv2.goodFeaturesToTrack(gray, self.max_corners, 0.01, 3, mask=mask)
+            if corners is not None:
+                points.append(corners.reshape(-1, 2))
+                labels.append(np.full(len(corners), i))
+
+        self._prev_gray = gray
+        self._boxes = [tuple(map(float, box)) for box in boxes]
+        self._points = np.concatenate(points).astype(np.float32) if points else np.empty((0, 2), np.float32)
+        self._labels = np.concatenate(labels) if labels else np.empty(0, dtype=int)
+
+    def update(self, frame):
+        """
+        Propagate the boxes to frame.
+
+        Returns:
+            List of boxes, or None if any face was lost and a detection is needed
+        """
+        gray = _to_gray(frame)
+        if not self._boxes:
+            self._prev_gray = gray
+            return []
+        if len(self._points) == 0:
+            return None
+
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(self._prev_gray, gray, self._points.reshape(-1, 1, 2),
+                                                          None, winSize=(15, 15), maxLevel=2)
+        next_points = next_points.reshape(-1, 2)
+        good = status.reshape(-1) == 1
+
+        boxes = []
+        for i, (top, right, bottom, left) in enumerate(self._boxes):
+            box_mask = good & (self._labels == i)
+            if box_mask.sum() < self.min_points:
+                return None
+            dx, dy = np.median(next_points[box_mask] - self._points[box_mask], axis=0)
+            boxes.append((top + dy, right + dx, bottom + dy, left + dx))
+
+        self._prev_gray = gray
+        self._points = next_points[good]
+        self._labels = self._labels[good]
+        self._boxes = boxes
+        return [tuple(int(round(v)) for v in box) for box in boxes]
+
+class OpenCVTrackerPropagator:
+    """Move boxes with one OpenCV object tracker (MIL, KCF, CSRT, ...) per box."""
+
+    def __init__(self, kind='mil'):
+        """
+        Args:
+            kind: Tracker name; KCF and CSRT need opencv-contrib-python
+        """
+        self.kind = kind
+        self._create = self._find_factory(kind)
+        self._trackers = []
+
+    @staticmethod
+    def _find_factory(kind):
+        name = f"Tracker{kind.upper()}_create"
+        for module in (cv2, getattr(cv2, 'legacy', None)):
+            if module is not None and hasattr(module, name):
+                return getattr(module, name)
+        raise ValueError(f"OpenCV tracker '{kind}' is not available in this OpenCV build")
+
+    def init(self, frame, boxes):
+        """Start propagating the given (top, right, bottom, left) boxes from frame."""
+        self._trackers = []
+        for top, right, bottom, left in boxes:
+            tracker = self._create()
+            tracker.init(frame, (int(left), int(top), int(right - left), int(bottom - top)))
+            self._trackers.append(tracker)
+
+    def update(self, frame):
+        """
+        Propagate the boxes to frame.
+
+        Returns:
+            List of boxes, or None if any face was lost and a detection is needed
+        """
+        boxes = []
+        for tracker in self._trackers:
+            ok, (x, y, w, h) = tracker.update(frame)
+            if not ok:
+                return None
+            boxes.append((int(y), int(x + w), int(y + h), int(x)))
+        return boxes
+
+def create_propagator(kind='flow'):
+    """Create a box propagator: 'flow' for optical flow or an OpenCV tracker name."""
+    if kind == 'flow':
+        return OpticalFlowPropagator()
+    return OpenCVTrackerPropagator(kind)
+
+class DetectionScheduler:
+    """Decide per frame whether to run the detector or propagate the last boxes."""
+
+    def __init__(self, detect_interval=5, min_interval=1, max_interval=15, propagator='flow',
+                 adaptive=True, motion_threshold=0.04, detect=detect_face_locations):
+        """
+        Args:
+            detect_interval: Initial number of frames between detections
+            min_interval: Interval used right after motion or a new face
+            max_interval: Largest interval reached while the scene is stable
+            propagator: 'flow' or an OpenCV tracker name ('mil', 'kcf', 'csrt')
+            adaptive: Adapt the interval to motion and new entrants
+            motion_threshold: Mean absolute change of a tiny grayscale thumbnail
+                              (0..1) that counts as a scene change
+            detect: Detector taking an RGB frame and returning face locations
+        """
+        self.interval = detect_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.adaptive = adaptive
+        self.motion_threshold = motion_threshold
+        self.detect = detect
+        self.propagator = create_propagator(propagator) if isinstance(propagator, str) else propagator
+
+        self._since_detection = None
+        self._prev_thumbnail = None
+        self._boxes = []
+        self.detections = 0
+        self.propagations = 0
+
+    def _motion(self, frame):
+        """Mean absolute change of a 32x24 grayscale thumbnail since the last frame."""
+        thumbnail = cv2.resize(_to_gray(frame), (32, 24), interpolation=cv2.INTER_AREA).astype(np.float32)
+        motion = 0.0 if self._prev_thumbnail is None else float(np.abs(thumbnail - self._prev_thumbnail).mean()) / 255
+        self._prev_thumbnail = thumbnail
+        return motion
+
+    def locate(self, rgb_frame):
+        """
+        Return face locations for this frame, detecting or propagating as scheduled.
+
+        Returns:
+            face_locations: List of (top, right, bottom, left) boxes
+            detected: True if the detector ran on this frame
+        """
+        motion = self._motion(rgb_frame)
+        if self.adaptive and motion > self.motion_threshold:
+            self.interval = self.min_interval
+
+        boxes = None
+        if self._since_detection is not None and self._since_detection < self.interval:
+            boxes = self.propagator.update(rgb_frame)
+
+        if boxes is None:
+            # Scheduled detection, or propagation lost a face
+            previous_count = len(self._boxes)
+            boxes = self.detect(rgb_frame)
+            self.propagator.init(rgb_frame, boxes)
+            self.detections += 1
+            self._since_detection = 1
+
+            if self.adaptive:
+                if len(boxes) > previous_count:
+                    # New entrant: keep checking closely
+                    self.interval = self.min_interval
+                else:
+                    self.interval = min(self.interval + 1, self.max_interval)
+            self._boxes = list(boxes)
+            return list(boxes), True
+
+        self._since_detection += 1
+        self.propagations += 1
+        self._boxes = boxes
+        return boxes, False
+
+    def detection_ratio(self):
+        """Fraction of frames on which the detector ran."""
+        total = self.detections + self.propagations
+        return self.detections / total if total else 0.0
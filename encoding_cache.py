@@ -0,0 +1,231 @@
+"""
+Persistent cache of face locations and encodings keyed by image content.
+
+Rebuilding the gallery or re-running evaluation over saved photos and
+recorded clips detects and encodes the same images again and again. The
+cache stores the face locations and 128-d encodings of each image in a
+SQLite database, keyed by a hash of the image content plus the
+detector/encoder configuration, so a changed photo or a different detector
+is a miss rather than a stale hit.
+
+The cache is bounded to max_entries images; the least recently used
+entries are evicted first.
+"""
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+import face_recognition
+from face_detection_utils import FACES_DIR, ENCODING_DIM, encode_faces
+from attendance_pipeline import resolve_detector, locate_faces
+
+ENCODING_CACHE_DB = os.path.join(FACES_DIR, 'encoding_cache.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS encodings (
+    key TEXT PRIMARY KEY,
+    locations BLOB NOT NULL,
+    encodings BLOB NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_encodings_last_used ON encodings (last_used);
+"""
+
+def content_hash(data):
+    """
+    Hash image content.
+
+    Args:
+        data: Raw file bytes or a decoded image array
+
+    Returns:
+        Hex digest of the content
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    if isinstance(data, np.ndarray):
+        digest.update(str((data.shape, data.dtype.str)).encode())
+        data = np.ascontiguousarray(data)
+    digest.update(memoryview(data))
+    return digest.hexdigest()
+
+def cache_config(detector=None, num_jitters=1):
+    """Describe the detector/encoder settings that produced an entry."""
+    detector = resolve_detector(detector)
+    version = getattr(face_recognition, '__version__', 'unknown')
+    return f"{detector!r}|jitters={num_jitters}|face_recognition={version}"
+
+class EncodingCache:
+    """SQLite-backed LRU cache of (face_locations, face_encodings) per image."""
+
+    def __init__(self, db_path=ENCODING_CACHE_DB, max_entries=200000, batch_size=500):
+        """
+        Args:
+            db_path: Path of the SQLite database file
+            max_entries: Number of images kept before the least recently used are evicted
+            batch_size: Number of writes per commit
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pending = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._size, last_used = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM encodings").fetchone()
+
+        # Logical clock for LRU order; survives restarts through the stored values
+        self._clock = last_used
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self._size
+
+    @staticmethod
+    def make_key(data, config):
+        """Cache key for image content (file bytes or array) under a detector/encoder config."""
+        return f"{content_hash(data)}:{hashlib.blake2b(config.encode(), digest_size=8).hexdigest()}"
+
+    def get(self, key):
+        """
+        Look up an entry.
+
+        Returns:
+            (face_locations, face_encodings) or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT locations, encodings FROM encodings WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._clock += 1
+            self._touched[key] = self._clock
+            self._note_write()
+
+        locations = [tuple(box) for box in np.frombuffer(row[0], dtype=np.int32).reshape(-1, 4).tolist()]
+        encodings = list(np.frombuffer(row[1], dtype=np.float64).reshape(-1, ENCODING_DIM))
+        return locations, encodings
+
+    def put(self, key, face_locations, face_encodings):
+        """Store the face locations and encodings of one image."""
+        locations = np.asarray(face_locations, dtype=np.int32).reshape(-1, 4).tobytes()
+        encodings = np.asarray(face_encodings, dtype=np.float64).reshape(-1, ENCODING_DIM).tobytes()
+        with self._lock:
+            self._clock += 1
+            before = self._conn.total_changes
+            self._conn.execute("INSERT OR IGNORE INTO encodings (key, locations, encodings, last_used) "
+                               "VALUES (?, ?, ?, ?)", (key, locations, encodings, self._clock))
+            if self._conn.total_changes > before:
+                self._size += 1
+            else:
+                self._conn.execute("UPDATE encodings SET locations = ?, encodings = ?, last_used = ? WHERE key = ?",
+                                   (locations, encodings, self._clock, key))
+            self._touched.pop(key, None)
+            if self._size > self.max_entries:
+                self._evict(self._size - self.max_entries)
+            self._note_write()
+
+    def locate_and_encode(self, rgb_image, detector=None, key_data=None, config=None):
+        """
+        Detect and encode the faces of an image, reusing a cached result.
+
+        Args:
+            rgb_image: RGB image array
+            detector: Detector setting, see attendance_pipeline.resolve_detector()
+            key_data: Content to hash for the key (default: the image itself),
+                      e.g. the raw file bytes of a photo
+            config: Precomputed cache_config(detector)
+
+        Returns:
+            face_locations: List of (top, right, bottom, left) boxes
+            face_encodings: List of 128-dimensional face encodings
+        """
+        key = self.make_key(rgb_image if key_data is None else key_data, config or cache_config(detector))
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        face_locations = locate_faces(rgb_image, detector)
+        face_encodings = encode_faces(rgb_image, face_locations)
+        self.put(key, face_locations, face_encodings)
+        return face_locations, face_encodings
+
+    def _evict(self, count):
+        """Drop the count least recently used entries (caller holds the lock)."""
+        self._flush_touched()
+        before = self._conn.total_changes
+        self._conn.execute("DELETE FROM encodings WHERE key IN "
+                           "(SELECT key FROM encodings ORDER BY last_used LIMIT ?)", (count,))
+        evicted = self._conn.total_changes - before
+        self._size -= evicted
+        self.evictions += evicted
+
+    def _flush_touched(self):
+        """Write the recency of cache hits (caller holds the lock)."""
+        if self._touched:
+            self._conn.executemany("UPDATE encodings SET last_used = ? WHERE key = ?",
+                                   [(tick, key) for key, tick in self._touched.items()])
+            self._touched = {}
+
+    def _note_write(self):
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._commit()
+
+    def _commit(self):
+        self._flush_touched()
+        self._conn.commit()
+        self._pending = 0
+
+    def flush(self):
+        """Commit pending writes."""
+        with self._lock:
+            self._commit()
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM encodings")
+            self._touched = {}
+            self._size = 0
+            self._commit()
+
+    def stats(self):
+        """Return a dict with entries, hits, misses, hit_rate and evictions."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def format_stats(self):
+        """Cache statistics as a printable line."""
+        s = self.stats()
+        return (f"Encoding cache: {s['hits']} hits, {s['misses']} misses ({100 * s['hit_rate']:.1f}% hit rate), "
+                f"{s['evictions']} evicted, {s['entries']} entries")
+
+    def close(self):
+        """Commit pending writes and close the database."""
+        with self._lock:
+            self._commit()
+            self._conn.close()
@@ -6,6 +6,8 @@ import cv2
 import face_recognition
 import numpy as np
 import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pandas as pd
 
@@ -13,6 +15,7 @@ import pandas as pd
 FACES_DIR = 'faces'
 ENCODINGS_FILE = os.path.join(FACES_DIR, 'encodings.pkl')
 STUDENTS_FILE = os.path.join(FACES_DIR, 'students.pkl')
+ENCODING_DIM = 128
 
 def initialize_directories():
     """Create necessary directories if they don't exist."""
@@ -69,12 +72,183 @@ def detect_faces(frame):
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     
     # Find all face locations and encodings in the current frame
-    face_locations = face_recognition.face_locations(rgb_frame)
-    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+    face_locations = detect_face_locations(rgb_frame)
+    face_encodings = encode_faces(rgb_frame, face_locations)
     
     return face_locations, face_encodings
 
-def recognize_faces(face_encodings, known_face_encodings, known_face_names):
+def detect_face_locations(rgb_frame):
+    """
+    Detect faces in an RGB frame without encoding them.
+    
+    Args:
+        rgb_frame: The RGB image frame to detect faces in
+        
+    Returns:
+        List of face locations in (top, right, bottom, left) format
+    """
+    return face_recognition.face_locations(rgb_frame)
+
+def encode_faces(rgb_frame, face_locations):
+    """
+    Compute 128-dimensional encodings for the given faces of an RGB frame.
+    
+    Args:
+        rgb_frame: The RGB image frame containing the faces
+        face_locations: List of face locations in (top, right, bottom, left) format
+        
+    Returns:
+        List of 128-dimensional face encodings
+    """
+    if len(face_locations) == 0:
+        return []
+    return face_recognition.face_encodings(rgb_frame, face_locations)
+
+class GalleryMatcher:
+    """
+    Match face encodings against the enrolled gallery in one batched operation.
+    
+    The gallery is kept as a single contiguous float32 matrix together with
+    its precomputed squared norms, so matching all faces of a frame is one
+    matrix multiplication instead of a Python loop over the faces.
+    
+    A student may have several gallery rows (samples or prototypes). Rows
+    with the same label belong to one identity, and the match margin is then
+    measured against the closest row of a different identity.
+    
+    For large galleries a face index (see face_index.py) built over the same
+    rows narrows each probe down to a few candidate rows first.
+    """
+    
+    def __init__(self, known_face_encodings, known_face_names=None, tolerance=0.6, labels=None,
+                 index=None, candidates=8):
+        """
+        Args:
+            known_face_encodings: List or array of 128-dimensional face encodings
+            known_face_names: Names corresponding to known_face_encodings (optional)
+            tolerance: Default maximum distance for a face to count as a match
+            labels: Identity of each row, e.g. its roll number (optional, every
+                    row is its own identity if not given)
+            index: Face index whose ids are the rows of known_face_encodings
+                   (optional; without it every probe scans the whole gallery)
+            candidates: Rows fetched from the index per probe; the margin is
+                        measured within them
+        """
+        encodings = np.asarray(known_face_encodings, dtype=np.float32)
+        self.encodings = np.ascontiguousarray(encodings.reshape(-1, ENCODING_DIM))
+        self.sq_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+        self.names = list(known_face_names) if known_face_names is not None else None
+        self.tolerance = tolerance
+        self.index = index
+        self.candidates = candidates
+        
+        self.labels = list(labels) if labels is not None else None
+        if labels is not None:
+            codes = {}
+            self.label_codes = np.array([codes.setdefault(label, len(codes)) for label in labels], dtype=np.intp)
+        else:
+            self.label_codes = None
+    
+    def identity(self, index):
+        """Label of gallery row index (the row itself if there are no labels)."""
+        return self.labels[index] if self.labels is not None else index
+    
+    def __len__(self):
+        return len(self.encodings)
+    
+    def distances(self, face_encodings):
+        """
+        Compute the euclidean distance from every probe to every gallery face.
+        
+        Args:
+            face_encodings: List or array of probe face encodings
+            
+        Returns:
+            Array of shape (num_probes, gallery_size) with the distances
+        """
+        probes = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        probe_sq_norms = np.einsum('ij,ij->i', probes, probes)
+        
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b
+        sq_dists = probe_sq_norms[:, None] + self.sq_norms[None, :] - 2.0 * (probes @ self.encodings.T)
+        np.maximum(sq_dists, 0.0, out=sq_dists)
+        return np.sqrt(sq_dists, out=sq_dists)
+    
+    def match(self, face_encodings, tolerance=None):
+        """
+        Find the closest gallery face for each probe encoding.
+        
+        Args:
+            face_encodings: List or array of probe face encodings
+            tolerance: Maximum distance for a match (defaults to self.tolerance)
+            
+        Returns:
+            best_indices: Index of the best gallery face, or -1 if it is not within tolerance
+            best_distances: Distance to the closest gallery face
+            margins: Distance gap between the closest gallery face and the closest
+                     one of a different identity
+        """
+        if tolerance is None:
+            tolerance = self.tolerance
+        
+        num_probes = len(face_encodings)
+        if num_probes == 0 or len(self) == 0:
+            return (np.full(num_probes, -1, dtype=np.intp),
+                    np.full(num_probes, np.inf, dtype=np.float32),
+                    np.full(num_probes, np.inf, dtype=np.float32))
+        
+        if self.index is not None:
+            return self._match_candidates(face_encodings, tolerance)
+        
+        dists = self.distances(face_encodings)
+        rows = np.arange(num_probes)
+        
+        if dists.shape[1] > 2:
+            # Only the two smallest distances are needed, no full sort
+            top_two = np.argpartition(dists, 1, axis=1)[:, :2]
+        else:
+            top_two = np.argsort(dists, axis=1)
+        
+        first = dists[rows[:, None], top_two]
+        order = np.argsort(first, axis=1)
+        best_indices = top_two[rows, order[:, 0]]
+        best_distances = first[rows, order[:, 0]]
+        
+        if self.label_codes is not None:
+            # Rows of the best identity do not count as competitors
+            same_identity = self.label_codes[None, :] == self.label_codes[best_indices][:, None]
+            margins = np.where(same_identity, np.inf, dists).min(axis=1) - best_distances
+        elif dists.shape[1] > 1:
+            margins = first[rows, order[:, 1]] - best_distances
+        else:
+            margins = np.full(num_probes, np.inf, dtype=np.float32)
+        
+        best_indices = np.where(best_distances <= tolerance, best_indices, -1)
+        return best_indices, best_distances, margins
+    
+    def _match_candidates(self, face_encodings, tolerance):
+        """match() through the index: only the nearest candidate rows of each probe are compared."""
+        dists, ids = self.index.search(face_encodings, k=min(self.candidates, len(self)))
+        best_indices, best_distances = ids[:, 0], dists[:, 0]
+        found = ids >= 0
+        
+        if self.label_codes is not None:
+            codes = self.label_codes[np.maximum(ids, 0)]
+            competitors = found & (codes != codes[:, :1])
+        else:
+            competitors = found.copy()
+            competitors[:, 0] = False
+        margins = np.where(competitors, dists, np.inf).min(axis=1) - best_distances
+        
+        best_indices = np.where(found[:, 0] & (best_distances <= tolerance), best_indices, -1)
+        return best_indices, best_distances, margins.astype(np.float32)
+    
+    def match_names(self, face_encodings, tolerance=None):
+        """Return the matched name (or "Unknown") for each probe encoding."""
+        best_indices, _, _ = self.match(face_encodings, tolerance)
+        return [self.names[i] if i >= 0 else "Unknown" for i in best_indices]
+
+def recognize_faces(face_encodings, known_face_encodings, known_face_names, tolerance=0.6, matcher=None):
     """
     Recognize faces by comparing them to known face encodings.
     
@@ -82,27 +256,110 @@ def recognize_faces(face_encodings, known_face_encodings, known_face_names):
         face_encodings: List of face encodings to recognize
         known_face_encodings: List of known face encodings
         known_face_names: List of names corresponding to known_face_encodings
+        tolerance: Maximum face distance to count as a match
+        matcher: Prebuilt GalleryMatcher for the known faces (optional, avoids
+                 rebuilding the gallery matrix on every call)
         
     Returns:
         List of names for the recognized faces
     """
-    face_names = []
+    if matcher is None:
+        matcher = GalleryMatcher(known_face_encodings, known_face_names)
     
-    for face_encoding in face_encodings:
-        # Compare faces with the known faces
-        matches = face_recognition.compare_faces(known_face_encodings, face_encoding, tolerance=0.6)
-        name = "Unknown"
-        
-        # Use the known face with the smallest distance to the new face
-        face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
-        if len(face_distances) > 0:
-            best_match_index = np.argmin(face_distances)
-            if matches[best_match_index]:
-                name = known_face_names[best_match_index]
+    return matcher.match_names(face_encodings, tolerance)
+
+_dlib_models = None
+_dlib_models_lock = threading.Lock()
+
+def _load_dlib_models():
+    """
+    Load dlib's 5-point shape predictor and face recognition network once per process.
+    
+    These are the models face_recognition.face_encodings uses (model="small"),
+    loaded from the face_recognition_models package it installs.
+    
+    Returns:
+        (dlib, shape_predictor, face_encoder), or None if dlib or the models are missing
+    """
+    global _dlib_models
+    with _dlib_models_lock:
+        if _dlib_models is None:
+            try:
+                import dlib
+                import face_recognition_models
+                _dlib_models = (
+                    dlib,
+                    dlib.shape_predictor(face_recognition_models.pose_predictor_five_point_model_location()),
+                    dlib.face_recognition_model_v1(face_recognition_models.face_recognition_model_location()))
+            except (ImportError, RuntimeError):
+                _dlib_models = False
+        return _dlib_models or None
+
+def _encode_image_batch(items, num_jitters=1):
+    """
+    Encode the faces of several images with one call to the dlib encoder.
+    
+    Landmarks are found per image, then every face in the batch goes through
+    the network together. Falls back to face_recognition.face_encodings per
+    image if dlib's models cannot be loaded, and to one encoder call per image
+    if the installed dlib has no batched descriptor API.
+    """
+    models = _load_dlib_models()
+    if models is None:
+        return [list(face_recognition.face_encodings(image, locations, num_jitters)) if len(locations) else []
+                for image, locations in items]
+    dlib, shape_predictor, face_encoder = models
+    
+    images, landmarks, positions = [], [], []
+    for position, (image, locations) in enumerate(items):
+        if len(locations):
+            images.append(np.ascontiguousarray(image))
+            faces = dlib.full_object_detections()
+            for top, right, bottom, left in locations:
+                faces.append(shape_predictor(images[-1], dlib.rectangle(int(left), int(top), int(right), int(bottom))))
+            landmarks.append(faces)
+            positions.append(position)
+    
+    results = [[] for _ in items]
+    if not images:
+        return results
+    
+    try:
+        descriptors = face_encoder.compute_face_descriptor(images, landmarks, num_jitters)
+    except (TypeError, RuntimeError):
+        descriptors = [face_encoder.compute_face_descriptor(image, faces, num_jitters)
+                       for image, faces in zip(images, landmarks)]
+    
+    for position, image_descriptors in zip(positions, descriptors):
+        results[position] = [np.array(descriptor) for descriptor in image_descriptors]
+    return results
+
+def batch_face_encodings(items, num_workers=None, batch_size=16, num_jitters=1):
+    """
+    Encode the faces of many images at once.
+    
+    Images are grouped into batches that each go through the encoder in one
+    call, and batches run in parallel on a thread pool (dlib releases the GIL).
+    
+    Args:
+        items: List of (rgb_image, face_locations) pairs, e.g. frames from
+               several cameras or photos from a bulk enrolment folder
+        num_workers: Number of threads (default: CPU count)
+        batch_size: Number of images per encoder call
+        num_jitters: Times to re-sample each face when encoding
         
-        face_names.append(name)
+    Returns:
+        List with the face encodings of each item, in the same order
+    """
+    items = list(items)
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    if len(batches) <= 1:
+        return _encode_image_batch(items, num_jitters)
     
-    return face_names
+    num_workers = min(num_workers or os.cpu_count() or 1, len(batches))
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        encoded_batches = pool.map(lambda batch: _encode_image_batch(batch, num_jitters), batches)
+    return [encodings for batch in encoded_batches for encodings in batch]
 
 def draw_face_boxes(frame, face_locations, face_names):
     """
@@ -0,0 +1,196 @@
+"""
+Pluggable face detector backends.
+
+Every detector takes an RGB frame and returns face locations in
+(top, right, bottom, left) format in the coordinates of that frame, like
+face_recognition.face_locations. Each backend has its own input scale
+(the frame is resized by it before detection and boxes are mapped back)
+and upsampling (number of times the scaled frame is doubled in size, to
+find smaller faces).
+
+Backends:
+- hog: face_recognition HOG detector (dlib)
+- haar: OpenCV Haar cascade
+- dnn: OpenCV DNN with a local model file, either the Caffe res10 SSD
+       (.caffemodel + .prototxt) or a YuNet .onnx model
+"""
+import os
+import threading
+import cv2
+import numpy as np
+import face_recognition
+
+class FaceDetector:
+    """Base class handling input scale and mapping boxes back to the frame."""
+
+    name = None
+
+    def __init__(self, scale=1.0, upsample=0):
+        """
+        Args:
+            scale: Resize factor applied to the frame before detection
+            upsample: Number of times to double the scaled frame (finds smaller faces)
+        """
+        self.scale = scale
+        self.upsample = upsample
+
+    def detect(self, rgb_frame):
+        """
+        Detect faces in an RGB frame.
+
+        Returns:
+            List of face locations in (top, right, bottom, left) format
+        """
+        if self.scale != 1.0:
+            frame = cv2.resize(rgb_frame, (0, 0), fx=self.scale, fy=self.scale)
+        else:
+            frame = rgb_frame
+        boxes = self._detect(frame)
+
+        height, width = rgb_frame.shape[:2]
+        locations = []
+        for top, right, bottom, left in boxes:
+            locations.append((max(int(top / self.scale), 0), min(int(right / self.scale), width),
+                              min(int(bottom / self.scale), height), max(int(left / self.scale), 0)))
+        return locations
+
+    def _detect(self, rgb_frame):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}(scale={self.scale}, upsample={self.upsample})"
+
+class HOGDetector(FaceDetector):
+    """face_recognition's HOG detector."""
+
+    name = 'hog'
+
+    def __init__(self, scale=1.0, upsample=1):
+        super().__init__(scale, upsample)
+
+    def _detect(self, rgb_frame):
+        return face_recognition.face_locations(rgb_frame, number_of_times_to_upsample=self.upsample, model='hog')
+
+class _UpsamplingDetector(FaceDetector):
+    """Apply upsampling by resizing, for detectors without built-in support."""
+
+    def _detect(self, rgb_frame):
+        factor = 2 ** self.upsample
+        if factor != 1:
+            rgb_frame = cv2.resize(rgb_frame, (0, 0), fx=factor, fy=factor)
+        return [tuple(int(v / factor) for v in box) for box in self._detect_boxes(rgb_frame)]
+
+    def _detect_boxes(self, rgb_frame):
+        raise NotImplementedError
+
+class HaarDetector(_UpsamplingDetector):
+    """OpenCV Haar cascade detector."""
+
+    name = 'haar'
+
+    def __init__(self, scale=1.0, upsample=0, cascade_path=None, scale_factor=1.1, min_neighbors=5,
+                 min_size=(20, 20)):
+        """
+        Args:
+            cascade_path: Cascade XML file (defaults to OpenCV's frontal face cascade)
+            scale_factor: Image pyramid step of detectMultiScale
+            min_neighbors: Neighbouring detections required to keep a face
+            min_size: Smallest face size in pixels
+        """
+        super().__init__(scale, upsample)
+        cascade_path = cascade_path or os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        self.classifier = cv2.CascadeClassifier(cascade_path)
+        if self.classifier.empty():
+            raise ValueError(f"Could not load Haar cascade: {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+
+    def _detect_boxes(self, rgb_frame):
+        gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY)
+        faces = self.classifier.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                 minNeighbors=self.min_neighbors, minSize=self.min_size)
+        return [(y, x + w, y + h, x) for (x, y, w, h) in faces]
+
+class DNNDetector(_UpsamplingDetector):
+    """OpenCV DNN detector for a local Caffe SSD or YuNet ONNX model."""
+
+    name = 'dnn'
+
+    def __init__(self, model_path, config_path=None, scale=1.0, upsample=0, confidence=0.6, input_size=(300, 300)):
+        """
+        Args:
+            model_path: .caffemodel (res10 SSD) or .onnx (YuNet) model file
+            config_path: .prototxt for Caffe models
+            confidence: Minimum detection score
+            input_size: Network input size for Caffe models
+        """
+        super().__init__(scale, upsample)
+        if not model_path or not os.path.exists(model_path):
+            raise FileNotFoundError(f"DNN model not found: {model_path}")
+        self.model_path = model_path
+        self.confidence = confidence
+        self.input_size = tuple(input_size)
+
+        # A network holds its input/output state, so threads must not share a forward pass
+        self._lock = threading.Lock()
+
+        if model_path.endswith('.onnx'):
+            self.net = None
+            self.yunet = cv2.FaceDetectorYN.create(model_path, "", (320, 320), confidence)
+        else:
+            if not config_path or not os.path.exists(config_path):
+                raise FileNotFoundError("Caffe models need the .prototxt config file")
+            self.net = cv2.dnn.readNetFromCaffe(config_path, model_path)
+            self.yunet = None
+
+    def _detect_boxes(self, rgb_frame):
+        height, width = rgb_frame.shape[:2]
+        bgr_frame = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2BGR)
+
+        if self.yunet is not None:
+            with self._lock:
+                self.yunet.setInputSize((width, height))
+                _, faces = self.yunet.detect(bgr_frame)
+            if faces is None:
+                return []
+            return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in faces[:, :4]]
+
+        blob = cv2.dnn.blobFromImage(cv2.resize(bgr_frame, self.input_size), 1.0, self.input_size,
+                                     (104.0, 177.0, 123.0))
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()[0, 0]
+        boxes = []
+        for detection in detections[detections[:, 2] >= self.confidence]:
+            left, top, right, bottom = (detection[3:7] * np.array([width, height, width, height])).astype(int)
+            boxes.append((max(top, 0), min(right, width), min(bottom, height), max(left, 0)))
+        return boxes
+
+DETECTOR_BACKENDS = {
+    'hog': HOGDetector,
+    'haar': HaarDetector,
+    'dnn': DNNDetector,
+}
+
+def create_detector(backend='hog', **kwargs):
+    """
+    Create a face detector.
+
+    Args:
+        backend: 'hog', 'haar' or 'dnn'
+        **kwargs: Backend options, e.g. scale, upsample, model_path
+    """
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}'. Choose from: {', '.join(DETECTOR_BACKENDS)}")
+    return DETECTOR_BACKENDS[backend](**kwargs)
+
+# Detectors created in this process, so worker processes build each one only once
+_detector_cache = {}
+
+def get_detector(backend='hog', **kwargs):
+    """Return a cached detector for this process (OpenCV models cannot be pickled to workers)."""
+    key = (backend, tuple(sorted((k, str(v)) for k, v in kwargs.items())))
+    if key not in _detector_cache:
+        _detector_cache[key] = create_detector(backend, **kwargs)
+    return _detector_cache[key]
@@ -0,0 +1,335 @@
+"""
+Nearest-neighbour indexes over the enrolled 128-d face encodings.
+
+Two backends share the same add/search interface:
+- BruteForceIndex: exact linear scan using the batched GalleryMatcher
+- IVFIndex: approximate inverted-file index with k-means coarse quantization
+
+Index ids are the positions of the encodings in the order they were added,
+and each index keeps the roll number of every id. An index is built in
+memory from a GalleryStore snapshot or a SubjectView, and GalleryMatcher
+searches through it for large galleries (see INDEX_MIN_SIZE).
+"""
+import numpy as np
+from face_detection_utils import ENCODING_DIM, GalleryMatcher
+
+# Galleries with at least this many rows are searched through an IVF index
+INDEX_MIN_SIZE = 5000
+
+def _as_matrix(encodings):
+    """Convert a list of encodings to a contiguous float32 matrix."""
+    return np.ascontiguousarray(np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM))
+
+def _squared_distances(queries, vectors, vector_sq_norms):
+    """Squared euclidean distances between every query and every vector."""
+    query_sq_norms = np.einsum('ij,ij->i', queries, queries)
+    sq_dists = query_sq_norms[:, None] + vector_sq_norms[None, :] - 2.0 * (queries @ vectors.T)
+    return np.maximum(sq_dists, 0.0, out=sq_dists)
+
+def _top_k(sq_dists, k):
+    """Return (distances, column indices) of the k smallest entries per row, sorted."""
+    k = min(k, sq_dists.shape[1])
+    if k < sq_dists.shape[1]:
+        cols = np.argpartition(sq_dists, k - 1, axis=1)[:, :k]
+    else:
+        cols = np.tile(np.arange(sq_dists.shape[1]), (len(sq_dists), 1))
+    rows = np.arange(len(sq_dists))[:, None]
+    order = np.argsort(sq_dists[rows, cols], axis=1)
+    cols = cols[rows, order]
+    return np.sqrt(sq_dists[rows, cols]), cols
+
+def _empty_result(num_queries, k):
+    return (np.full((num_queries, k), np.inf, dtype=np.float32),
+            np.full((num_queries, k), -1, dtype=np.intp))
+
+class _RollNumbers:
+    """Mapping from index ids to roll numbers, shared by both backends."""
+
+    def _add_roll_nos(self, roll_nos, count):
+        if roll_nos is None:
+            roll_nos = [None] * count
+        elif len(roll_nos) != count:
+            raise ValueError("roll_nos and encodings must have the same length")
+        self.roll_nos.extend(str(roll_no) if roll_no is not None else None for roll_no in roll_nos)
+
+    def roll_no(self, index_id):
+        """Roll number of an index id, or None for -1 (no result)."""
+        return self.roll_nos[index_id] if index_id >= 0 else None
+
+class BruteForceIndex(_RollNumbers):
+    """Exact index: scans every enrolled encoding for each query."""
+
+    def __init__(self):
+        self.vectors = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        self.matcher = GalleryMatcher(self.vectors)
+        self.roll_nos = []
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def add(self, encodings, roll_nos=None):
+        """
+        Add encodings to the index.
+
+        Args:
+            encodings: List or array of 128-dimensional face encodings
+            roll_nos: Roll number of each encoding (optional)
+
+        Returns:
+            Array with the ids assigned to the new encodings
+        """
+        new_vectors = _as_matrix(encodings)
+        self._add_roll_nos(roll_nos, len(new_vectors))
+        ids = np.arange(len(self.vectors), len(self.vectors) + len(new_vectors))
+        self.vectors = np.concatenate([self.vectors, new_vectors])
+        self.matcher = GalleryMatcher(self.vectors)
+        return ids
+
+    def empty_copy(self):
+        """Return a new, empty index with the same settings."""
+        return BruteForceIndex()
+
+    def search(self, queries, k=1):
+        """
+        Find the k nearest enrolled encodings for each query.
+
+        Args:
+            queries: List or array of probe face encodings
+            k: Number of neighbours to return
+
+        Returns:
+            distances: Array of shape (num_queries, k), inf where fewer than k exist
+            ids: Array of shape (num_queries, k), -1 where fewer than k exist
+        """
+        queries = _as_matrix(queries)
+        distances, ids = _empty_result(len(queries), k)
+        if len(queries) == 0 or len(self) == 0:
+            return distances, ids
+
+        sq_dists = _squared_distances(queries, self.matcher.encodings, self.matcher.sq_norms)
+        top_dists, top_ids = _top_k(sq_dists, k)
+        distances[:, :top_ids.shape[1]] = top_dists
+        ids[:, :top_ids.shape[1]] = top_ids
+        return distances, ids
+
+class IVFIndex(_RollNumbers):
+    """
+    Approximate inverted-file index.
+
+    Encodings are assigned to the nearest of n_lists k-means centroids, and a
+    query only scans the n_probe lists whose centroids are closest to it.
+    Until enough encodings have been added to train the centroids, the index
+    answers queries with an exact scan.
+    """
+
+    def __init__(self, n_lists=64, n_probe=8, min_train_size=None, n_iter=20, seed=0):
+        """
+        Args:
+            n_lists: Number of k-means cells
+            n_probe: Number of cells scanned per query (recall/latency trade-off)
+            min_train_size: Encodings required before training (default 20 * n_lists)
+            n_iter: Number of k-means iterations
+            seed: Random seed for centroid initialization
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size or 20 * n_lists
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = None
+        self.size = 0
+        self.roll_nos = []
+
+        # Encodings added before training, and the per-cell vectors/ids after it
+        self._pending_vectors = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        self._list_vectors = []
+        self._list_sq_norms = []
+        self._list_ids = []
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def empty_copy(self):
+        """Return a new, untrained index with the same settings."""
+        return IVFIndex(n_lists=self.n_lists, n_probe=self.n_probe, min_train_size=self.min_train_size,
+                        n_iter=self.n_iter, seed=self.seed)
+
+    def train(self, encodings):
+        """
+        Fit the coarse quantizer with k-means and re-assign all stored encodings.
+
+        Args:
+            encodings: Training sample of face encodings
+        """
+        data = _as_matrix(encodings)
+        n_lists = min(self.n_lists, len(data))
+        rng = np.random.default_rng(self.seed)
+        centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            assignment = self._assign(data, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, data)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+            # Re-seed empty cells with random points so no cell is wasted
+            if not filled.all():
+                centroids[~filled] = data[rng.choice(len(data), int((~filled).sum()))]
+
+        # Collect everything stored so far and re-assign it to the new cells
+        stored_vectors, stored_ids = self._all_vectors()
+        self.centroids = centroids
+        self._list_vectors = [np.empty((0, ENCODING_DIM), dtype=np.float32) for _ in range(n_lists)]
+        self._list_sq_norms = [np.empty(0, dtype=np.float32) for _ in range(n_lists)]
+        self._list_ids = [np.empty(0, dtype=np.intp) for _ in range(n_lists)]
+        self._pending_vectors = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        self._insert(stored_vectors, stored_ids)
+
+    def add(self, encodings, roll_nos=None):
+        """
+        Add encodings to the index, training it once enough data is available.
+
+        Args:
+            encodings: List or array of 128-dimensional face encodings
+            roll_nos: Roll number of each encoding (optional)
+
+        Returns:
+            Array with the ids assigned to the new encodings
+        """
+        new_vectors = _as_matrix(encodings)
+        self._add_roll_nos(roll_nos, len(new_vectors))
+        ids = np.arange(self.size, self.size + len(new_vectors))
+        self.size += len(new_vectors)
+
+        if self.is_trained:
+            self._insert(new_vectors, ids)
+        else:
+            self._pending_vectors = np.concatenate([self._pending_vectors, new_vectors])
+            if len(self._pending_vectors) >= self.min_train_size:
+                self.train(self._pending_vectors)
+
+        return ids
+
+    def search(self, queries, k=1, n_probe=None):
+        """
+        Find approximately the k nearest enrolled encodings for each query.
+
+        Args:
+            queries: List or array of probe face encodings
+            k: Number of neighbours to return
+            n_probe: Number of cells to scan (defaults to self.n_probe)
+
+        Returns:
+            distances: Array of shape (num_queries, k), inf where fewer than k were found
+            ids: Array of shape (num_queries, k), -1 where fewer than k were found
+        """
+        queries = _as_matrix(queries)
+        distances, ids = _empty_result(len(queries), k)
+        if len(queries) == 0 or self.size == 0:
+            return distances, ids
+
+        if not self.is_trained:
+            vectors = self._pending_vectors
+            sq_dists = _squared_distances(queries, vectors, np.einsum('ij,ij->i', vectors, vectors))
+            top_dists, top_ids = _top_k(sq_dists, k)
+            distances[:, :top_ids.shape[1]] = top_dists
+            ids[:, :top_ids.shape[1]] = top_ids
+            return distances, ids
+
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        centroid_dists = _squared_distances(queries, self.centroids,
+                                            np.einsum('ij,ij->i', self.centroids, self.centroids))
+        probed_lists = np.argpartition(centroid_dists, n_probe - 1, axis=1)[:, :n_probe]
+
+        # Group queries that probe the same set of cells so each group is one matrix product
+        groups = {}
+        for query_index, lists in enumerate(probed_lists):
+            groups.setdefault(tuple(sorted(lists)), []).append(query_index)
+
+        for lists, query_indices in groups.items():
+            candidate_ids = np.concatenate([self._list_ids[i] for i in lists])
+            if len(candidate_ids) == 0:
+                continue
+            candidate_vectors = np.concatenate([self._list_vectors[i] for i in lists])
+            candidate_sq_norms = np.concatenate([self._list_sq_norms[i] for i in lists])
+
+            sq_dists = _squared_distances(queries[query_indices], candidate_vectors, candidate_sq_norms)
+            top_dists, top_cols = _top_k(sq_dists, k)
+            distances[query_indices, :top_cols.shape[1]] = top_dists
+            ids[query_indices, :top_cols.shape[1]] = candidate_ids[top_cols]
+
+        return distances, ids
+
+    def _assign(self, data, centroids):
+        """Index of the nearest centroid for each row of data."""
+        sq_dists = _squared_distances(data, centroids, np.einsum('ij,ij->i', centroids, centroids))
+        return np.argmin(sq_dists, axis=1)
+
+    def _insert(self, vectors, ids):
+        """Append vectors to the cells of their nearest centroids."""
+        if len(vectors) == 0:
+            return
+        assignment = self._assign(vectors, self.centroids)
+        sq_norms = np.einsum('ij,ij->i', vectors, vectors)
+        for list_index in np.unique(assignment):
+            mask = assignment == list_index
+            self._list_vectors[list_index] = np.concatenate([self._list_vectors[list_index], vectors[mask]])
+            self._list_sq_norms[list_index] = np.concatenate([self._list_sq_norms[list_index], sq_norms[mask]])
+            self._list_ids[list_index] = np.concatenate([self._list_ids[list_index], ids[mask]])
+
+    def _all_vectors(self):
+        """All stored vectors and their ids, in id order."""
+        if not self.is_trained:
+            return self._pending_vectors, np.arange(len(self._pending_vectors))
+        vectors = np.concatenate(self._list_vectors)
+        ids = np.concatenate(self._list_ids)
+        order = np.argsort(ids)
+        return vectors[order], ids[order]
+
+INDEX_BACKENDS = {
+    'exact': BruteForceIndex,
+    'ivf': IVFIndex,
+}
+
+def create_index(backend='exact', **kwargs):
+    """
+    Create an empty face index.
+
+    Args:
+        backend: Name of the backend ('exact' or 'ivf')
+        **kwargs: Backend specific options (e.g. n_lists, n_probe for 'ivf')
+    """
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend '{backend}'. Choose from: {', '.join(INDEX_BACKENDS)}")
+    return INDEX_BACKENDS[backend](**kwargs)
+
+def build_index(encodings, backend='exact', roll_nos=None, **kwargs):
+    """
+    Create an index of the given backend and add all encodings to it.
+
+    Args:
+        encodings: List or array of 128-dimensional face encodings
+        backend: Name of the backend ('exact' or 'ivf')
+        roll_nos: Roll number of each encoding (optional)
+        **kwargs: Backend specific options
+    """
+    index = create_index(backend, **kwargs)
+    if len(encodings) > 0:
+        index.add(encodings, roll_nos)
+    return index
+
+def build_gallery_index(gallery, backend='ivf', **kwargs):
+    """
+    Build an index over the live rows of a GalleryStore.
+
+    Index ids are positions in gallery.snapshot(), and index.roll_no(id) gives
+    the roll number of each.
+    """
+    encodings, roll_nos = gallery.snapshot()
+    return build_index(encodings, backend, roll_nos=roll_nos, **kwargs)
@@ -0,0 +1,198 @@
+"""
+Lightweight IoU/centroid face tracker.
+
+Faces are associated across frames by box overlap (falling back to centroid
+distance), so a student standing in front of the camera keeps the identity
+from an earlier encoding. A track is only re-encoded when it is new, when its
+identity is not confident, or every reencode_interval frames.
+"""
+import numpy as np
+
+class Track:
+    """A face followed across frames, with the identity from its last encoding."""
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.index = -1
+        self.distance = float('inf')
+        self.margin = float('inf')
+        self.frames_since_encode = None
+        self.missed = 0
+        self.hits = 1
+
+    def __repr__(self):
+        return f"Track(id={self.track_id}, box={self.box}, index={self.index}, distance={self.distance:.3f})"
+
+def box_iou(boxes_a, boxes_b):
+    """
+    Pairwise intersection-over-union of two lists of (top, right, bottom, left) boxes.
+
+    Returns:
+        Array of shape (len(boxes_a), len(boxes_b))
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    right = np.minimum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    left = np.maximum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    area_a = (a[:, 1] - a[:, 3]) * (a[:, 2] - a[:, 0])
+    area_b = (b[:, 1] - b[:, 3]) * (b[:, 2] - b[:, 0])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-6), 0.0)
+
+def _centroids(boxes):
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+class FaceTracker:
+    """Associate detections with tracks and decide which faces need encoding."""
+
+    def __init__(self, iou_threshold=0.3, max_missed=5, reencode_interval=10,
+                 confident_distance=0.45, min_margin=0.05):
+        """
+        Args:
+            iou_threshold: Minimum IoU for a detection to continue a track
+            max_missed: Frames a track survives without a matching detection
+            reencode_interval: Re-encode a confident track every this many frames
+            confident_distance: Match distance below which an identity is trusted
+            min_margin: Required gap to the second-best gallery face to trust an identity
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.reencode_interval = reencode_interval
+        self.confident_distance = confident_distance
+        self.min_margin = min_margin
+        self.tracks = []
+        self._next_id = 0
+
+        # Number of faces encoded vs carried forward from their track
+        self.encoded = 0
+        self.reused = 0
+
+    def update(self, face_locations):
+        """
+        Associate detections with existing tracks, creating tracks for new faces.
+
+        Args:
+            face_locations: Detected boxes in (top, right, bottom, left) format
+
+        Returns:
+            List of tracks, one per detection in the same order
+        """
+        assigned = [None] * len(face_locations)
+        unmatched_tracks = set(range(len(self.tracks)))
+
+        if self.tracks and face_locations:
+            track_boxes = [track.box for track in self.tracks]
+
+            # Greedy association by highest IoU first
+            iou = box_iou(face_locations, track_boxes)
+            for flat in np.argsort(-iou, axis=None):
+                det, trk = np.unravel_index(flat, iou.shape)
+                if iou[det, trk] < self.iou_threshold:
+                    break
+                if assigned[det] is None and trk in unmatched_tracks:
+                    assigned[det] = self.tracks[trk]
+                    unmatched_tracks.discard(trk)
+
+            # Fast movers can lose overlap; fall back to the nearest centroid within one box size
+            remaining = [det for det, track in enumerate(assigned) if track is None]
+            if remaining and unmatched_tracks:
+                det_centroids = _centroids([face_locations[det] for det in remaining])
+                for det, centroid in zip(remaining, det_centroids):
+                    top, right, bottom, left = face_locations[det]
+                    size = max(right - left, bottom - top)
+                    candidates = list(unmatched_tracks)
+                    dists = np.linalg.norm(_centroids([self.tracks[t].box for t in candidates]) - centroid, axis=1)
+                    best = int(np.argmin(dists))
+                    if dists[best] < size:
+                        assigned[det] = self.tracks[candidates[best]]
+                        unmatched_tracks.discard(candidates[best])
+
+        for det, box in enumerate(face_locations):
+            track = assigned[det]
+            if track is None:
+                track = Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(track)
+                assigned[det] = track
+            else:
+                track.box = box
+                track.missed = 0
+                track.hits += 1
+                if track.frames_since_encode is not None:
+                    track.frames_since_encode += 1
+
+        # Age out tracks that were not seen for too long
+        for trk in unmatched_tracks:
+            self.tracks[trk].missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        return assigned
+
+    def needs_encoding(self, track):
+        """True if the track is new, not confidently identified, or due for a refresh."""
+        if track.frames_since_encode is None:
+            return True
+        if track.index < 0 or track.distance > self.confident_distance or track.margin < self.min_margin:
+            return True
+        return track.frames_since_encode >= self.reencode_interval
+
+    def predict_encoding(self, face_locations, lookahead=1):
+        """
+        Guess which detections process() will encode, without changing any track.
+
+        Detection workers call this to encode ahead of process(): a detection
+        is expected to need encoding unless it overlaps a track whose identity
+        is trusted and not due for a refresh within lookahead frames.
+
+        Returns:
+            List with one bool per detection
+        """
+        trusted = [track for track in list(self.tracks) if not self.needs_encoding(track)
+                   and track.frames_since_encode + lookahead < self.reencode_interval]
+        if not trusted or not face_locations:
+            return [True] * len(face_locations)
+        iou = box_iou(face_locations, [track.box for track in trusted])
+        return [bool(best < self.iou_threshold) for best in iou.max(axis=1)]
+
+    def assign(self, track, index, distance, margin):
+        """Store the identity from a fresh encoding on the track."""
+        track.index = int(index)
+        track.distance = float(distance)
+        track.margin = float(margin)
+        track.frames_since_encode = 0
+
+    def process(self, face_locations, encode, matcher, tolerance=None):
+        """
+        Track the detections of one frame, encoding and matching only where needed.
+
+        Args:
+            face_locations: Detected boxes in (top, right, bottom, left) format
+            encode: Callable taking a list of boxes and returning their encodings
+            matcher: GalleryMatcher for the enrolled faces
+            tolerance: Match tolerance (defaults to the matcher's tolerance)
+
+        Returns:
+            List of tracks, one per detection in the same order
+        """
+        tracks = self.update(face_locations)
+        to_encode = [i for i, track in enumerate(tracks) if self.needs_encoding(track)]
+
+        if to_encode:
+            encodings = encode([face_locations[i] for i in to_encode])
+            indices, distances, margins = matcher.match(encodings, tolerance)
+            for i, index, distance, margin in zip(to_encode, indices, distances, margins):
+                self.assign(tracks[i], index, distance, margin)
+
+        self.encoded += len(to_encode)
+        self.reused += len(tracks) - len(to_encode)
+        return tracks
+
+    def encode_ratio(self):
+        """Fraction of tracked faces that had to be encoded."""
+        total = self.encoded + self.reused
+        return self.encoded / total if total else 0.0
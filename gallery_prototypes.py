@@ -0,0 +1,103 @@
+"""
+Condense several enrolment samples per student into k prototypes and a centroid.
+
+Storing every sample improves recall but grows the gallery linearly with the
+number of samples. Instead, each student's samples are clustered with
+k-means; the cluster centres (prototypes) cover different poses and
+lighting, and the centroid of all samples is added as one more row. The
+matcher searches these rows, grouped into one identity per roll number.
+
+Usage:
+    python gallery_prototypes.py --k 3
+"""
+import argparse
+import numpy as np
+from face_detection_utils import ENCODING_DIM
+from gallery_store import open_gallery_store
+
+# Default number of prototypes kept per student
+PROTOTYPES_PER_STUDENT = 3
+
+def compute_prototypes(encodings, k=PROTOTYPES_PER_STUDENT, n_iter=10, seed=0):
+    """
+    Cluster one student's encodings into at most k prototypes.
+
+    Args:
+        encodings: Array of shape (n, 128) with the student's samples
+        k: Number of prototypes
+        n_iter: Number of k-means iterations
+        seed: Random seed for the initial centres
+
+    Returns:
+        prototypes: Array of shape (min(n, k), 128)
+        centroid: Mean of all samples, shape (128,)
+    """
+    samples = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    centroid = samples.mean(axis=0)
+    if len(samples) <= k:
+        return samples.copy(), centroid
+
+    # k-means++ style seeding: start far apart so distinct poses get their own prototype
+    rng = np.random.default_rng(seed)
+    centres = [samples[rng.integers(len(samples))]]
+    for _ in range(1, k):
+        sq_dists = np.min([((samples - c) ** 2).sum(axis=1) for c in centres], axis=0)
+        centres.append(samples[int(np.argmax(sq_dists))])
+    centres = np.array(centres)
+
+    for _ in range(n_iter):
+        assignment = np.argmin(((samples[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2), axis=1)
+        for cluster in range(k):
+            members = samples[assignment == cluster]
+            if len(members):
+                centres[cluster] = members.mean(axis=0)
+    return centres, centroid
+
+def condensed_rows(encodings, k=PROTOTYPES_PER_STUDENT, include_centroid=True):
+    """Gallery rows for one student: k prototypes plus (optionally) the centroid."""
+    prototypes, centroid = compute_prototypes(encodings, k)
+    if include_centroid and len(prototypes) > 1:
+        return np.vstack([prototypes, centroid[None, :]])
+    return prototypes
+
+def condense_student(gallery, roll_no, k=PROTOTYPES_PER_STUDENT, include_centroid=True):
+    """
+    Replace a student's samples in the gallery by their prototypes and centroid.
+
+    Returns:
+        Number of rows the student has afterwards
+    """
+    encodings = gallery.encodings_for(roll_no)
+    max_rows = k + 1 if include_centroid else k
+    if len(encodings) <= max_rows:
+        return len(encodings)
+    rows = condensed_rows(encodings, k, include_centroid)
+    gallery.replace(roll_no, rows)
+    return len(rows)
+
+def condense_gallery(k=PROTOTYPES_PER_STUDENT, include_centroid=True, gallery=None):
+    """
+    Condense every multi-sample student of the gallery.
+
+    Returns:
+        (rows before, rows after)
+    """
+    gallery = gallery or open_gallery_store()
+    before = len(gallery)
+    with gallery.defer_compaction():
+        for roll_no in gallery.roll_numbers():
+            condense_student(gallery, roll_no, k, include_centroid)
+    gallery.compact()
+    return before, len(gallery)
+
+def main():
+    parser = argparse.ArgumentParser(description="Condense multi-sample students into prototypes")
+    parser.add_argument("--k", type=int, default=PROTOTYPES_PER_STUDENT, help="Prototypes per student")
+    parser.add_argument("--no-centroid", action="store_true", help="Do not add the centroid row")
+    args = parser.parse_args()
+
+    before, after = condense_gallery(args.k, include_centroid=not args.no_centroid)
+    print(f"Gallery condensed from {before} to {after} encodings.")
+
+if __name__ == "__main__":
+    main()
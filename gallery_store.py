@@ -0,0 +1,525 @@
+"""
+Roll-number keyed, memory-mapped store for the enrolled face encodings.
+
+The gallery lives in FACES_DIR/gallery as three fixed-width .npy files that
+are memory-mapped on open:
+- encodings.<gen>.npy: float32 matrix of shape (capacity, 128)
+- roll_nos.<gen>.npy: fixed-width roll number for each row
+- tombstones.<gen>.npy: bitmap with one bit per row, set when the row is deleted
+
+meta.json records the generation, capacity and number of used and deleted
+rows. Appends and deletes only touch the affected rows and meta.json; deleted
+rows are dropped by compaction, which writes a new generation in the background.
+
+Several processes may open the same gallery (e.g. registration while the web
+service runs). Every write and snapshot holds an exclusive flock on
+gallery/.lock and first re-reads meta.json, reopening the files if another
+process appended, deleted or compacted in the meantime.
+
+An attendance session only needs the students enrolled in its subject, so
+subject_view() slices the gallery down to that cohort.
+"""
+import os
+import json
+import pickle
+import threading
+from contextlib import contextmanager
+import numpy as np
+try:
+    import fcntl
+except ImportError:
+    # Without fcntl (Windows) only the threads of one process are serialized
+    fcntl = None
+from face_detection_utils import (
+    FACES_DIR,
+    ENCODINGS_FILE,
+    STUDENTS_FILE,
+    ENCODING_DIM,
+    GalleryMatcher
+)
+
+GALLERY_DIR = os.path.join(FACES_DIR, 'gallery')
+META_FILE_NAME = 'meta.json'
+LOCK_FILE_NAME = '.lock'
+ROLL_NO_WIDTH = 32
+ROLL_NO_DTYPE = f'<U{ROLL_NO_WIDTH}'
+
+# Compact automatically once this fraction of the used rows is deleted
+COMPACTION_THRESHOLD = 0.25
+
+class SubjectView:
+    """Gallery rows of the students enrolled in one subject."""
+
+    def __init__(self, subject, encodings, roll_nos, students):
+        """
+        Args:
+            subject: Subject name
+            encodings: Array of shape (n, 128) with the cohort's gallery rows
+            roll_nos: Roll number for each row
+            students: Student information of the cohort keyed by roll number
+        """
+        self.subject = subject
+        self.encodings = encodings
+        self.roll_nos = roll_nos
+        self.students = students
+        self.names = [students[roll_no]["name"] for roll_no in roll_nos]
+
+        # Rows of each student within the view
+        self.rows_by_roll = {}
+        for row, roll_no in enumerate(roll_nos):
+            self.rows_by_roll.setdefault(roll_no, []).append(row)
+
+    def __len__(self):
+        return len(self.roll_nos)
+
+    def __contains__(self, roll_no):
+        return roll_no in self.rows_by_roll
+
+    def student(self, index):
+        """Roll number and student information for a row of the view."""
+        roll_no = self.roll_nos[index]
+        return roll_no, self.students[roll_no]
+
+    def index(self, backend='ivf', **kwargs):
+        """Face index over the view's rows; index ids are rows of the view."""
+        from face_index import build_index
+        if backend == 'ivf':
+            # About 2 * sqrt(n) cells keeps each probed cell small as the gallery grows
+            kwargs.setdefault('n_lists', max(64, int(2 * np.sqrt(len(self)))))
+        return build_index(self.encodings, backend, roll_nos=self.roll_nos, **kwargs)
+
+    def matcher(self, tolerance=0.6, index='auto'):
+        """
+        GalleryMatcher over the cohort, grouping each student's rows into one identity.
+
+        Args:
+            tolerance: Match tolerance
+            index: Face index over the view's rows, 'auto' (default) to build an
+                   IVF index for views of at least face_index.INDEX_MIN_SIZE rows,
+                   or None to scan every row
+        """
+        if index == 'auto':
+            from face_index import INDEX_MIN_SIZE
+            index = self.index() if len(self) >= INDEX_MIN_SIZE else None
+        return GalleryMatcher(self.encodings, self.names, tolerance=tolerance, labels=self.roll_nos, index=index)
+
+class GalleryStore:
+    """Memory-mapped gallery of face encodings keyed by roll number."""
+
+    def __init__(self, path=GALLERY_DIR, initial_capacity=1024):
+        """
+        Open the gallery at path, creating an empty one if it does not exist.
+
+        Args:
+            path: Directory holding the gallery files
+            initial_capacity: Number of rows to preallocate for a new gallery
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._compaction_thread = None
+        self._compaction_deferred = 0
+
+        # Inter-process lock, held while self._lock_depth > 0
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = open(os.path.join(path, LOCK_FILE_NAME), 'a')
+        self._lock_depth = 0
+        self._meta_state = None
+
+        # Entering the lock opens an existing gallery
+        with self._locked():
+            if not os.path.exists(self._meta_path):
+                self._write_generation(0, initial_capacity, 0,
+                                       np.empty((0, ENCODING_DIM), dtype=np.float32),
+                                       np.empty(0, dtype=ROLL_NO_DTYPE))
+                self._open()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold the thread lock and the inter-process file lock.
+
+        On the outermost entry the store is synced with meta.json, so writes
+        always go to the current generation.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                try:
+                    if os.path.exists(self._meta_path):
+                        self._sync()
+                except BaseException:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    raise
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self):
+        with open(self._meta_path) as f:
+            return json.load(f)
+
+    def _sync(self):
+        """Reopen the gallery if another process changed it since it was last read or written here."""
+        meta = self._read_meta()
+        if (meta["generation"], meta["count"], meta.get("deleted", 0)) != self._meta_state:
+            self._open()
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.path, META_FILE_NAME)
+
+    def _file(self, name, generation):
+        return os.path.join(self.path, f"{name}.{generation}.npy")
+
+    def _write_meta(self, generation, capacity, count, deleted=0):
+        """Atomically replace meta.json."""
+        tmp_path = self._meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"generation": generation, "capacity": capacity,
+                       "count": count, "deleted": deleted, "dim": ENCODING_DIM}, f)
+        os.replace(tmp_path, self._meta_path)
+        self._meta_state = (generation, count, deleted)
+
+    def _write_generation(self, generation, capacity, count, encodings, roll_nos, tombstone_bits=None):
+        """
+        Write a complete set of gallery files and point meta.json at them.
+
+        Args:
+            tombstone_bits: Tombstone bytes to carry over (default: no deleted rows)
+        """
+        enc = np.lib.format.open_memmap(self._file('encodings', generation), mode='w+',
+                                        dtype=np.float32, shape=(capacity, ENCODING_DIM))
+        ids = np.lib.format.open_memmap(self._file('roll_nos', generation), mode='w+',
+                                        dtype=ROLL_NO_DTYPE, shape=(capacity,))
+        tombstones = np.lib.format.open_memmap(self._file('tombstones', generation), mode='w+',
+                                               dtype=np.uint8, shape=((capacity + 7) // 8,))
+        enc[:count] = encodings
+        ids[:count] = roll_nos
+        tombstones[:] = 0
+        deleted = 0
+        if tombstone_bits is not None:
+            tombstones[:len(tombstone_bits)] = tombstone_bits
+            deleted = int(np.unpackbits(tombstone_bits, bitorder='little')[:count].sum())
+        for array in (enc, ids, tombstones):
+            array.flush()
+        del enc, ids, tombstones
+
+        # Switching meta.json is the commit point of the new generation
+        self._write_meta(generation, capacity, count, deleted)
+
+    def _open(self):
+        """Memory-map the files of the current generation."""
+        meta = self._read_meta()
+        if meta.get("dim", ENCODING_DIM) != ENCODING_DIM:
+            raise ValueError(f"Gallery has {meta['dim']}-d encodings, expected {ENCODING_DIM}")
+
+        self.generation = meta["generation"]
+        self.capacity = meta["capacity"]
+        self.count = meta["count"]
+        self._encodings = np.load(self._file('encodings', self.generation), mmap_mode='r+')
+        self._roll_nos = np.load(self._file('roll_nos', self.generation), mmap_mode='r+')
+        self._tombstones = np.load(self._file('tombstones', self.generation), mmap_mode='r+')
+
+        # Row lookup by roll number, skipping deleted rows
+        self._rows_by_roll = {}
+        live = self.live_mask()
+        for row, roll_no in enumerate(self._roll_nos[:self.count]):
+            if live[row]:
+                self._rows_by_roll.setdefault(str(roll_no), []).append(row)
+        self.deleted_count = int(self.count - live.sum())
+        self._meta_state = (self.generation, self.count, meta.get("deleted", 0))
+
+    def _remove_generation(self, generation):
+        for name in ('encodings', 'roll_nos', 'tombstones'):
+            try:
+                os.remove(self._file(name, generation))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        """Number of live (not deleted) encodings."""
+        return self.count - self.deleted_count
+
+    def __contains__(self, roll_no):
+        return roll_no in self._rows_by_roll
+
+    def roll_numbers(self):
+        """Roll numbers that have at least one live encoding."""
+        return list(self._rows_by_roll)
+
+    def live_mask(self):
+        """Boolean array marking the used rows that are not deleted."""
+        bits = np.unpackbits(self._tombstones, bitorder='little')[:self.count]
+        return bits == 0
+
+    def append(self, roll_no, encoding):
+        """Append one encoding for roll_no. Returns the row it was written to."""
+        return self.append_many([roll_no], [encoding])[0]
+
+    def append_many(self, roll_nos, encodings):
+        """
+        Append a batch of encodings in one write.
+
+        Args:
+            roll_nos: Roll number for each encoding
+            encodings: List or array of 128-dimensional face encodings
+
+        Returns:
+            List of rows the encodings were written to
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        roll_nos = [str(roll_no) for roll_no in roll_nos]
+        if len(roll_nos) != len(encodings):
+            raise ValueError("roll_nos and encodings must have the same length")
+        for roll_no in roll_nos:
+            if len(roll_no) > ROLL_NO_WIDTH:
+                raise ValueError(f"Roll number '{roll_no}' is longer than {ROLL_NO_WIDTH} characters")
+
+        with self._locked():
+            if self.count + len(roll_nos) > self.capacity:
+                self._grow(self.count + len(roll_nos))
+
+            start, end = self.count, self.count + len(roll_nos)
+            self._encodings[start:end] = encodings
+            self._roll_nos[start:end] = roll_nos
+            self._encodings.flush()
+            self._roll_nos.flush()
+
+            # Rows only become visible once the count in meta.json covers them
+            self.count = end
+            self._write_meta(self.generation, self.capacity, self.count, self.deleted_count)
+
+            for row, roll_no in zip(range(start, end), roll_nos):
+                self._rows_by_roll.setdefault(roll_no, []).append(row)
+            return list(range(start, end))
+
+    def replace(self, roll_no, encodings):
+        """Replace all encodings of roll_no with the given ones. Returns the new rows."""
+        return self.replace_many([roll_no] * len(encodings), encodings)
+
+    def replace_many(self, roll_nos, encodings):
+        """
+        Replace all encodings of every roll number in roll_nos with the given ones.
+
+        The old rows are tombstoned and the new ones appended under one lock,
+        with compaction deferred until both are done.
+
+        Args:
+            roll_nos: Roll number for each new encoding
+            encodings: List or array of 128-dimensional face encodings
+
+        Returns:
+            List of rows the new encodings were written to
+        """
+        with self._locked(), self.defer_compaction():
+            for roll_no in dict.fromkeys(str(roll_no) for roll_no in roll_nos):
+                self.delete(roll_no)
+            return self.append_many(roll_nos, encodings)
+
+    def delete(self, roll_no):
+        """
+        Delete all encodings of roll_no by setting their tombstone bits.
+
+        Returns:
+            Number of encodings deleted
+        """
+        with self._locked():
+            rows = self._rows_by_roll.pop(roll_no, [])
+            for row in rows:
+                self._tombstones[row >> 3] |= np.uint8(1 << (row & 7))
+            if rows:
+                self._tombstones.flush()
+                self.deleted_count += len(rows)
+                self._write_meta(self.generation, self.capacity, self.count, self.deleted_count)
+
+            self._maybe_compact()
+            return len(rows)
+
+    def _maybe_compact(self):
+        """Start a background compaction once enough rows are deleted, unless it is deferred."""
+        if self._compaction_deferred == 0 and self.count and self.deleted_count / self.count >= COMPACTION_THRESHOLD:
+            self.compact_async()
+
+    @contextmanager
+    def defer_compaction(self):
+        """
+        Suppress automatic compaction during a bulk replace/delete loop.
+
+        Row positions stay stable inside the block; compaction starts on exit
+        if the deleted rows crossed the threshold.
+        """
+        with self._lock:
+            self._compaction_deferred += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._compaction_deferred -= 1
+                self._maybe_compact()
+
+    def encodings_for(self, roll_no):
+        """Live encodings of roll_no as an array of shape (n, 128)."""
+        with self._locked():
+            rows = self._rows_by_roll.get(roll_no, [])
+            return np.array(self._encodings[rows])
+
+    def snapshot(self):
+        """
+        Live encodings and their roll numbers, in row order.
+
+        When nothing is deleted the encodings are a zero-copy view of the
+        memory-mapped file.
+
+        Returns:
+            encodings: Array of shape (n, 128)
+            roll_nos: List of roll numbers
+        """
+        with self._locked():
+            encodings = self._encodings[:self.count]
+            roll_nos = self._roll_nos[:self.count]
+            if self.deleted_count:
+                live = self.live_mask()
+                encodings = encodings[live]
+                roll_nos = roll_nos[live]
+            return encodings, [str(roll_no) for roll_no in roll_nos]
+
+    def subject_view(self, subject, students_data):
+        """
+        Slice the gallery down to the students enrolled in subject.
+
+        Args:
+            subject: Subject name
+            students_data: Student information keyed by roll number
+
+        Returns:
+            SubjectView of the enrolled students that have face encodings
+        """
+        return self.subject_views(students_data, [subject])[subject]
+
+    def subject_views(self, students_data, subjects=None):
+        """
+        Slice the gallery into one view per subject in a single pass.
+
+        Args:
+            students_data: Student information keyed by roll number
+            subjects: Subjects to build views for (default: every enrolled subject)
+
+        Returns:
+            Dict of subject -> SubjectView
+        """
+        encodings, roll_nos = self.snapshot()
+        if subjects is None:
+            subjects = sorted({subject for data in students_data.values() for subject in data.get("subjects", [])})
+        rows_by_subject = {subject: [] for subject in subjects}
+        for row, roll_no in enumerate(roll_nos):
+            data = students_data.get(roll_no)
+            if data is None:
+                continue
+            for subject in data.get("subjects", []):
+                if subject in rows_by_subject:
+                    rows_by_subject[subject].append(row)
+
+        views = {}
+        for subject, rows in rows_by_subject.items():
+            cohort = [roll_nos[row] for row in rows]
+            views[subject] = SubjectView(subject, np.asarray(encodings[rows], dtype=np.float32).reshape(-1, ENCODING_DIM),
+                                         cohort, {roll_no: students_data[roll_no] for roll_no in cohort})
+        return views
+
+    def _grow(self, min_capacity):
+        """Move to a new generation with at least min_capacity rows."""
+        capacity = max(self.capacity, 1)
+        while capacity < min_capacity:
+            capacity *= 2
+        self._rewrite(capacity, keep_deleted=True)
+
+    def _rewrite(self, capacity, keep_deleted):
+        """Copy the gallery into a new generation and switch to it."""
+        old_generation = self.generation
+        if keep_deleted:
+            encodings = self._encodings[:self.count]
+            roll_nos = self._roll_nos[:self.count]
+            tombstones = np.array(self._tombstones)
+        else:
+            live = self.live_mask()
+            encodings = self._encodings[:self.count][live]
+            roll_nos = self._roll_nos[:self.count][live]
+            tombstones = None
+
+        self._write_generation(old_generation + 1, capacity, len(encodings), encodings, roll_nos, tombstones)
+        self._open()
+        self._remove_generation(old_generation)
+
+    def compact(self):
+        """Rewrite the gallery without deleted rows."""
+        with self._locked():
+            if self.deleted_count == 0:
+                return
+            live_count = len(self)
+            capacity = self.capacity
+            while capacity > 1024 and live_count < capacity // 4:
+                capacity //= 2
+            self._rewrite(capacity, keep_deleted=False)
+            print(f"Gallery compacted: {live_count} encodings kept.")
+
+    def compact_async(self):
+        """Run compact() on a background thread unless one is already running."""
+        with self._lock:
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return self._compaction_thread
+            self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compaction_thread.start()
+            return self._compaction_thread
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished."""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+
+def _load_pickle(file_path, default):
+    """Load a legacy pickle file, returning default if it is missing or empty."""
+    try:
+        with open(file_path, 'rb') as f:
+            return pickle.load(f)
+    except (FileNotFoundError, EOFError):
+        return default
+
+def migrate_from_pickles(encodings_file=ENCODINGS_FILE, students_file=STUDENTS_FILE, path=GALLERY_DIR):
+    """
+    Create the gallery store from the legacy encodings.pkl/students.pkl files.
+
+    The legacy files are paired by position: the i-th encoding belongs to the
+    i-th roll number in students.pkl.
+
+    Returns:
+        The new GalleryStore
+    """
+    encodings = _load_pickle(encodings_file, [])
+    students_data = _load_pickle(students_file, {})
+    roll_nos = list(students_data.keys())
+
+    if len(encodings) != len(roll_nos):
+        print(f"Warning: {len(encodings)} encodings for {len(roll_nos)} students, "
+              f"only the first {min(len(encodings), len(roll_nos))} pairs are migrated.")
+    num_pairs = min(len(encodings), len(roll_nos))
+
+    store = GalleryStore(path, initial_capacity=max(1024, num_pairs))
+    if num_pairs:
+        store.append_many(roll_nos[:num_pairs], encodings[:num_pairs])
+    print(f"Migrated {num_pairs} face encodings to {path}")
+    return store
+
+def open_gallery_store(path=GALLERY_DIR):
+    """
+    Open the gallery store, migrating the legacy pickle files on first use.
+    """
+    if not os.path.exists(os.path.join(path, META_FILE_NAME)) and os.path.exists(ENCODINGS_FILE):
+        return migrate_from_pickles(path=path)
+    return GalleryStore(path)
@@ -4,17 +4,18 @@ Script to register new students with their face encodings.
 import os
 import cv2
 import face_recognition
-import pickle
-import time
-import numpy as np
 from face_detection_utils import (
     FACES_DIR, 
     initialize_directories, 
-    load_face_encodings, 
     load_students_data, 
-    save_face_encodings, 
     save_students_data
 )
+from gallery_store import open_gallery_store
+from bulk_enroll import bulk_enroll, reindex_saved_photos
+from gallery_prototypes import PROTOTYPES_PER_STUDENT, condensed_rows
+
+# Number of face samples captured when registering a student
+SAMPLES_PER_STUDENT = 5
 
 def register_new_student():
     """Register a new student with their face and information."""
@@ -22,7 +23,7 @@ def register_new_student():
     initialize_directories()
     
     # Load existing data
-    known_face_encodings = load_face_encodings()
+    gallery = open_gallery_store()
     students_data = load_students_data()
     
     # Get student details
@@ -46,13 +47,15 @@ def register_new_student():
         subject = input(f"Enter subject {i+1}: ")
         subjects.append(subject)
     
-    # Capture face image using webcam
+    # Capture face images using webcam
     print("\nPreparing to capture face...")
-    print("Position your face in front of the camera.")
+    print(f"Position your face in front of the camera. Up to {SAMPLES_PER_STUDENT} samples will be captured;")
+    print("turn your head slightly between captures for better recognition.")
     print("Press 'c' to capture, 'r' to retake, or 'q' to quit.")
     
     cap = cv2.VideoCapture(0)
-    face_encoding = None
+    face_encodings = []
+    captured_frame = None
     
     while True:
         ret, frame = cap.read()
@@ -93,33 +96,46 @@ def register_new_student():
                 continue
             
             # Get the face encoding
-            face_encoding = face_recognition.face_encodings(rgb_frame, face_locations)[0]
+            face_encodings.append(face_recognition.face_encodings(rgb_frame, face_locations)[0])
+            if captured_frame is None:
+                captured_frame = frame.copy()
+            
+            if len(face_encodings) >= SAMPLES_PER_STUDENT:
+                break
             
             # Show the captured image
-            cv2.putText(display_frame, "Face captured! Press 'r' to retake or any other key to continue.", 
-                      (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(display_frame, f"Sample {len(face_encodings)}/{SAMPLES_PER_STUDENT} captured! "
+                      "'r' to retake, 'f' to finish, any other key to continue.", 
+                      (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
             cv2.imshow("Register Face", display_frame)
             
             key = cv2.waitKey(0) & 0xFF
             if key == ord('r'):
                 print("Retaking capture...")
+                face_encodings.pop()
+                if not face_encodings:
+                    captured_frame = None
                 continue
-            else:
+            elif key == ord('f'):
                 break
     
     cap.release()
     cv2.destroyAllWindows()
     
-    if face_encoding is None:
+    if not face_encodings:
         print("No face was captured. Registration failed.")
         return
     
     # Save the face image
     student_image_path = os.path.join(FACES_DIR, f"{roll_no}.jpg")
-    cv2.imwrite(student_image_path, frame)
+    cv2.imwrite(student_image_path, captured_frame)
     
-    # Update encodings and student data
-    known_face_encodings.append(face_encoding)
+    # Keep a compact set of prototypes and a centroid instead of every sample
+    new_encodings = condensed_rows(face_encodings) if len(face_encodings) > PROTOTYPES_PER_STUDENT + 1 \
+        else face_encodings
+    
+    # Replace any previous encodings of this roll number
+    gallery.replace(roll_no, new_encodings)
     
     students_data[roll_no] = {
         "name": name,
@@ -131,7 +147,6 @@ def register_new_student():
     }
     
     # Save updated data
-    save_face_encodings(known_face_encodings)
     save_students_data(students_data)
     
     print(f"\nStudent {name} (Roll No: {roll_no}) registered successfully!")
@@ -157,7 +172,6 @@ def view_registered_students():
 def delete_student():
     """Delete a registered student."""
     students_data = load_students_data()
-    known_face_encodings = load_face_encodings()
     
     if not students_data:
         print("No students registered yet!")
@@ -178,12 +192,11 @@ def delete_student():
         return
     
     # Remove student data
-    student_index = list(students_data.keys()).index(roll_no)
     del students_data[roll_no]
     
-    # Remove face encoding
-    if student_index < len(known_face_encodings):
-        known_face_encodings.pop(student_index)
+    # Remove face encodings (tombstoned, compacted in the background)
+    gallery = open_gallery_store()
+    gallery.delete(roll_no)
     
     # Remove face image if exists
     image_path = student.get("image_path")
@@ -191,9 +204,10 @@ def delete_student():
         os.remove(image_path)
     
     # Save updated data
-    save_face_encodings(known_face_encodings)
     save_students_data(students_data)
     
+    gallery.wait_for_compaction()
+    
     print(f"Student {student['name']} (Roll No: {roll_no}) deleted successfully!")
 
 def main():
@@ -205,9 +219,11 @@ def main():
         print("1. Register New Student")
         print("2. View Registered Students")
         print("3. Delete Student")
-        print("4. Exit")
+        print("4. Bulk Enrol from CSV")
+        print("5. Rebuild Gallery from Saved Photos")
+        print("6. Exit")
         
-        choice = input("\nEnter your choice (1-4): ")
+        choice = input("\nEnter your choice (1-6): ")
         
         if choice == '1':
             register_new_student()
@@ -216,6 +232,14 @@ def main():
         elif choice == '3':
             delete_student()
         elif choice == '4':
+            csv_path = input("Enter path of the enrolment CSV: ")
+            photo_dir = input("Enter path of the photo folder: ")
+            bulk_enroll(csv_path, photo_dir)
+        elif choice == '5':
+            confirm = input("Replace every student's encodings with their saved photo? (y/n): ")
+            if confirm.lower() == 'y':
+                reindex_saved_photos()
+        elif choice == '6':
             print("Exiting registration system...")
             break
         else:
@@ -1,10 +1,62 @@
 """
 Script to detect faces and mark attendance.
 """
+import os
+import json
+import time
+import argparse
 import cv2
-import face_recognition
 import numpy as np
-import tzl_nos]
+from datetime import datetime
+from face_detection_utils import (
+    initialize_directories,
+    load_students_data,
+    detect_face_locations,
+    draw_face_boxes
+)
+from attendance_pipeline import AttendancePipeline, resolve_detector
+from video_sources import FileVideoSource
+from face_tracker import FaceTracker
+from detection_scheduler import DetectionScheduler
+from gallery_store import open_gallery_store
+from attendance_store import ATTENDANCE_EXCEL, open_attendance_store
+from attendance_metrics import SessionMetrics, serve_metrics
+from adaptive_controller import AdaptiveController
+from motion_gate import MotionGate
+from encoding_cache import EncodingCache
+
+# Per-frame results logs of headless replays
+REPLAY_LOG_DIR = "attendance_logs"
+
+def take_attendance(detect_interval=None, detector=None, scale=0.25, latency_budget=None, motion_gate=False,
+                    num_workers=None):
+    """
+    Take attendance using face recognition from the webcam.
+    
+    Args:
+        detect_interval: Run the face detector only every Nth frame (adapting to
+                         motion) and propagate boxes in between. None detects on
+                         every frame.
+        detector: Face detector backend ('hog', 'haar', 'dnn', a dict of
+                  create_detector arguments or a FaceDetector; default: HOG)
+        scale: Downscale factor applied to frames before detection
+        latency_budget: Per-frame latency budget in seconds; detection scale, frame
+                        skipping and ROI cropping then adapt to hold it (optional,
+                        not combined with detect_interval)
+        motion_gate: Skip detection on unchanged frames and search only the changed
+                     region otherwise (not combined with detect_interval)
+        num_workers: Number of detection threads (default: CPU count)
+    """
+    # Initialize required directories
+    initialize_directories()
+    
+    # Load the gallery and student data
+    gallery = open_gallery_store()
+    students_data = load_students_data()
+    
+    if len(gallery) == 0 or not students_data:
+        print("No registered students found. Please register students first.")
+        return
     
     # Select subject for marking attendance
     print("\nAvailable subjects:")
@@ -29,88 +81,230 @@ import tzl_nos]
         except ValueError:
             print("Please enter a valid number.")
     
+    # Only the students enrolled in this subject are searched
+    # Students may have several gallery rows; roll numbers group them into one identity
+    cohort = gallery.subject_view(selected_subject, students_data)
+    if len(cohort) == 0:
+        print(f"No registered faces for students enrolled in {selected_subject}.")
+        return
+    matcher = cohort.matcher()
+    
     print(f"\nTaking attendance for subject: {selected_subject}")
+    print(f"Matching against {len(cohort.rows_by_roll)} enrolled students.")
     print("Press 'q' to stop attendance.")
     
-    # Initialize webcam
+    # Initialize webcam and attendance store
     cap = cv2.VideoCapture(0)
+    attendance_store = open_attendance_store()
     
     # Set to store students already marked present
     marked_students = set()
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Failed to grab frame")
-            break
-        
-        # Resize frame for faster processing (optional)
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        
-        # Detect faces
-        face_locations, face_encodings = detect_faces(small_frame)
-        
-        # Scale back face locations
-        face_locations = [(top * 4, right * 4, bottom * 4, left * 4) 
-                         for top, right, bottom, left in face_locations]
-        
-        # Recognize faces
-        face_names = recognize_faces(face_encodings, known_face_encodings, names)
-        
-        # Draw boxes around faces
-        frame = draw_face_boxes(frame, face_locations, face_names)
-        
-        # Mark attendance for recognized students
-        for name in face_names:
-            if name != "Unknown" and name not in marked_students:
-                # Find the roll number for this student
-                student_roll_no = None
-                for roll_no, data in students_data.items():
-                    if data["name"] == name:
-                        student_roll_no = roll_no
-                        
-                        # Check if student is enrolled in this subject
-                        if selected_subject not in data.get("subjects", []):
-                            print(f"{name} is not enrolled in {selected_subject}")
-                            continue
-                        
-                        break
-                
-                if student_roll_no:
-                    success = update_attendance_excel(name, student_roll_no, selected_subject)
-                    if success:
-                        marked_students.add(name)
-                        
-                        # Display confirmation message on screen
-                        cv2.putText(frame, f"Attendance marked for {name}!", 
-                                  (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                        
-                        # Show the frame with the message for 2 seconds
-                        cv2.imshow("Attendance System", frame)
-                        cv2.waitKey(2000)
-        
-        # Add info text
-        cv2.putText(frame, f"Subject: {selected_subject}", 
-                  (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    # Per-stage timings, faces per frame and match distances for this session
+    metrics = SessionMetrics(selected_subject)
+    
+    # Confirmation message shown on screen as (text, shown_until)
+    confirmation = [None, 0.0]
+    
+    def mark_student(index):
+        """Record attendance for a recognized gallery face (runs on the writer thread)."""
+        roll_no, data = cohort.student(index)
+        name = data["name"]
         
-        # Show number of students marked
-        cv2.putText(frame, f"Marked: {len(marked_students)}", 
-                  (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        if attendance_store.mark(name, roll_no, selected_subject):
+            marked_students.add(name)
+            metrics.mark()
+            confirmation[:] = [f"Attendance marked for {name}!", time.time() + 2]
+    
+    # Capture, detection/encoding, matching and attendance writes run on their own threads
+    # Faces are tracked across frames so a student is only re-encoded when needed
+    detector = resolve_detector(detector)
+    scheduler = controller = gate = None
+    if detect_interval:
+        scheduler = DetectionScheduler(detect_interval, detect=detector.detect if detector else detect_face_locations)
+    else:
+        controller = AdaptiveController(latency_budget) if latency_budget else None
+        gate = MotionGate() if motion_gate else None
+    pipeline = AttendancePipeline(cap, matcher, on_recognized=mark_student, num_workers=num_workers,
+                                  tracker=FaceTracker(), scheduler=scheduler, detector=detector, scale=scale,
+                                  metrics=metrics, controller=controller, motion_gate=gate).start()
+    last_frame_id = -1
+    
+    while pipeline.is_running():
+        result = pipeline.latest()
         
-        # Display the frame
-        cv2.imshow("Attendance System", frame)
+        # Redraw only when a new frame has been processed
+        if result is not None and result.frame_id != last_frame_id:
+            last_frame_id = result.frame_id
+            frame = result.frame.copy()
+            face_names = [cohort.names[i] if i >= 0 else "Unknown" for i in result.match_indices]
+            
+            # Draw boxes around faces
+            with metrics.time("draw"):
+                frame = draw_face_boxes(frame, result.face_locations, face_names)
+            
+            # Add info text
+            cv2.putText(frame, f"Subject: {selected_subject}", 
+                      (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            
+            # Show number of students marked
+            cv2.putText(frame, f"Marked: {len(marked_students)}", 
+                      (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            
+            # Display confirmation message for 2 seconds without blocking the loop
+            message, shown_until = confirmation
+            if message and time.time() < shown_until:
+                cv2.putText(frame, message, 
+                          (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            
+            # Show the quality settings chosen by the controller
+            if controller is not None:
+                cv2.putText(frame, controller.format_settings(), 
+                          (10, frame.shape[0] - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+            
+            # Display the frame
+            cv2.imshow("Attendance System", frame)
         
         # Break loop on 'q' key
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        if cv2.waitKey(10) & 0xFF == ord('q'):
             break
     
-    # Release webcam and close windows
+    # Stop the pipeline (pending attendance writes are finished), release webcam and close windows
+    pipeline.stop()
     cap.release()
     cv2.destroyAllWindows()
+    attendance_store.close()
+    
+    print("\nPipeline statistics:")
+    print(pipeline.format_stats())
+    if controller is not None:
+        metrics.observe_settings(controller)
+    print(metrics.format_summary())
+    print(f"Session summary saved to {metrics.save_summary()}")
     
     print(f"\nAttendance completed for {selected_subject}.")
     print(f"Total students marked present: {len(marked_students)}")
-    print("Attendance has been saved to attendance.xlsx")
+    print("Attendance has been saved. Use 'Export Attendance to Excel' to update attendance.xlsx")
+
+def _file_name_part(text):
+    return "".join(c if c.isalnum() else "_" for c in text)
+
+def replay_attendance(subject, source, pace=False, log_file=None, detect_interval=None, detector=None,
+                      scale=0.25, num_workers=None, latency_budget=None, motion_gate=False, use_cache=True):
+    """
+    Take attendance headlessly from a recorded video, image sequence or image directory.
+    
+    Every frame is processed (none are dropped) as fast as the workers allow,
+    without a display. Attendance is written to the attendance database and
+    the faces found in each frame are logged as JSON lines.
+    
+    Args:
+        subject: Subject to mark attendance for
+        source: Video file, image directory or image sequence pattern (frames/*.jpg)
+        pace: Deliver frames at the clip's frame rate to mimic a live camera
+        log_file: Path of the per-frame results log
+                  (default: attendance_logs/<source>_<subject>_<time>.jsonl)
+        detect_interval: Run the face detector only every Nth frame, see take_attendance()
+        detector: Face detector backend, see take_attendance()
+        scale: Downscale factor applied to frames before detection
+        num_workers: Number of detection threads (default: CPU count)
+        latency_budget: Per-frame latency budget in seconds, see take_attendance()
+        motion_gate: Skip detection on unchanged frames, see take_attendance()
+        use_cache: Reuse and fill the encoding cache, so replaying the same
+                   recording again skips detection and encoding (not used with
+                   detect_interval)
+        
+    Returns:
+        Set of roll numbers marked present, or None if nothing could be processed
+    """
+    initialize_directories()
+    gallery = open_gallery_store()
+    students_data = load_students_data()
+    
+    cohort = gallery.subject_view(subject, students_data)
+    if len(cohort) == 0:
+        print(f"No registered faces for students enrolled in {subject}.")
+        return None
+    matcher = cohort.matcher()
+    
+    video_source = FileVideoSource(source, pace=pace)
+    if not video_source.isOpened():
+        print(f"Could not open {source}")
+        return None
+    
+    if log_file is None:
+        os.makedirs(REPLAY_LOG_DIR, exist_ok=True)
+        name = os.path.splitext(os.path.basename(os.path.normpath(source)))[0] or "replay"
+        log_file = os.path.join(REPLAY_LOG_DIR,
+                                f"{_file_name_part(name)}_{_file_name_part(subject)}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    
+    attendance_store = open_attendance_store()
+    metrics = SessionMetrics(subject)
+    marked = set()
+    
+    def mark_student(index):
+        """Record attendance for a recognized gallery face (runs on the writer thread)."""
+        roll_no, data = cohort.student(index)
+        if attendance_store.mark(data["name"], roll_no, subject):
+            marked.add(roll_no)
+            metrics.mark()
+    
+    log = open(log_file, "w")
+    
+    def log_frame(result):
+        """Write the faces of one frame to the results log (runs on the matcher thread)."""
+        faces = []
+        for box, index, distance in zip(result.face_locations, result.match_indices, result.distances):
+            roll_no, data = cohort.student(index) if index >= 0 else (None, None)
+            faces.append({"box": [int(v) for v in box], "roll_no": roll_no,
+                          "name": data["name"] if data else "Unknown",
+                          "distance": float(distance) if np.isfinite(distance) else None})
+        log.write(json.dumps({"frame": result.frame_id, "video_time": round(result.frame_id / video_source.fps, 3),
+                              "faces": faces}) + "\n")
+    
+    detector = resolve_detector(detector)
+    scheduler = controller = gate = None
+    if detect_interval:
+        scheduler = DetectionScheduler(detect_interval, detect=detector.detect if detector else detect_face_locations)
+    else:
+        controller = AdaptiveController(latency_budget) if latency_budget else None
+        gate = MotionGate() if motion_gate else None
+    cache = EncodingCache() if use_cache and scheduler is None else None
+    
+    print(f"Replaying {source} for {subject} ({len(video_source)} frames at {video_source.fps:.1f} FPS"
+          f"{', paced' if pace else ''})...")
+    start = time.perf_counter()
+    pipeline = AttendancePipeline(video_source, matcher, on_recognized=mark_student, num_workers=num_workers,
+                                  tracker=FaceTracker(), scheduler=scheduler, detector=detector, scale=scale,
+                                  metrics=metrics, drop_frames=False, on_frame=log_frame,
+                                  controller=controller, motion_gate=gate, cache=cache).start()
+    try:
+        while pipeline.is_running():
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        print("\nStopping replay...")
+    pipeline.stop()
+    elapsed = time.perf_counter() - start
+    video_source.release()
+    attendance_store.close()
+    log.close()
+    if cache is not None:
+        cache.close()
+    
+    frames = pipeline.stats["end_to_end"].count
+    video_seconds = frames / video_source.fps
+    if controller is not None:
+        metrics.observe_settings(controller)
+        video_seconds = (frames + controller.skipped) / video_source.fps
+    print(pipeline.format_stats())
+    if cache is not None:
+        print(cache.format_stats())
+    print(f"\nProcessed {frames} frames ({video_seconds:.1f}s of video) in {elapsed:.1f}s"
+          f" ({video_seconds / elapsed if elapsed > 0 else 0:.1f}x real time)")
+    print(f"Students marked present in {subject}: {len(marked)}")
+    print(f"Per-frame results written to {log_file}")
+    print(f"Session summary saved to {metrics.save_summary()}")
+    return marked
 
 def mark_absentees():
     """Mark absent students for a subject on a specific date."""
@@ -163,28 +357,16 @@ def mark_absentees():
         if selected_subject in data.get("subjects", []):
             enrolled_students.append((data["name"], roll_no))
     
-    # Check which students are already marked present
-    import pandas as pd
-    
-    attendance_file = "attendance.xlsx"
-    
-    if not os.path.exists(attendance_file):
-        present_students = []
-    else:
-        try:
-            df = pd.read_excel(attendance_file)
-            present_students = df[(df["Date"] == attendance_date) & 
-                                (df["Subject"] == selected_subject) &
-                                (df["Status"] == "Present")]["Name"].tolist()
-        except Exception as e:
-            print(f"Error reading attendance file: {e}")
-            present_students = []
+    # Check which students are already marked present (indexed lookup)
+    attendance_store = open_attendance_store()
+    present_roll_nos = attendance_store.roll_nos_with_status(selected_subject, attendance_date, "Present")
     
     # Find absent students
-    absent_students = [(name, roll_no) for name, roll_no in enrolled_students if name not in present_students]
+    absent_students = [(name, roll_no) for name, roll_no in enrolled_students if roll_no not in present_roll_nos]
     
     if not absent_students:
         print(f"All students are already marked present for {selected_subject} on {attendance_date}.")
+        attendance_store.close()
         return
     
     # Mark absent students
@@ -195,30 +377,76 @@ def mark_absentees():
     confirm = input("\nMark all these students as absent? (y/n): ")
     if confirm.lower() != 'y':
         print("Operation cancelled.")
+        attendance_store.close()
         return
     
-    # Mark students as absent
-    for name, roll_no in absent_students:
-        update_attendance_excel(name, roll_no, selected_subject, status="Absent", file_path=attendance_file)
+    # Mark students as absent in one batch (students already marked absent are skipped)
+    marked = attendance_store.mark_many([(name, roll_no, selected_subject, "Absent", attendance_date)
+                                         for name, roll_no in absent_students])
+    attendance_store.close()
     
-    print(f"\nSuccessfully marked {len(absent_students)} students as absent for {selected_subject} on {attendance_date}.")
-    print("Attendance has been updated in attendance.xlsx")
+    print(f"\nSuccessfully marked {marked} students as absent for {selected_subject} on {attendance_date}.")
+
+def export_attendance():
+    """Export the attendance log to attendance.xlsx."""
+    with open_attendance_store() as attendance_store:
+        attendance_store.export_excel(ATTENDANCE_EXCEL)
 
-def main():
+def main(argv=None):
     """Main function to run the attendance system."""
+    parser = argparse.ArgumentParser(description="Take attendance with face recognition; "
+                                                 "with --source, replay a recording headlessly")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve Prometheus metrics on this local port while taking attendance")
+    parser.add_argument("--subject", help="Subject to mark attendance for (headless replay)")
+    parser.add_argument("--source", help="Video file, image directory or image sequence pattern to replay")
+    parser.add_argument("--pace", action="store_true", help="Replay at the recording's frame rate")
+    parser.add_argument("--log", help="Per-frame results log (JSON lines)")
+    parser.add_argument("--detect-interval", type=int, help="Run the detector only every Nth frame")
+    parser.add_argument("--detector", help="Detector backend: hog, haar or dnn (default: hog)")
+    parser.add_argument("--scale", type=float, default=0.25, help="Downscale factor before detection")
+    parser.add_argument("--workers", type=int, help="Detection threads (default: CPU count)")
+    parser.add_argument("--latency-budget", type=float,
+                        help="Per-frame latency budget in ms; scale, frame skipping and ROI adapt to hold it")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="Skip face detection on frames where nothing moved")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the encoding cache (headless replay)")
+    args = parser.parse_args(argv)
+    
+    budget = args.latency_budget / 1000 if args.latency_budget else None
+    # Detection settings shared by the live and replay modes
+    detection = {"detector": args.detector, "scale": args.scale, "num_workers": args.workers}
+    if args.metrics_port:
+        # One endpoint for the whole process; each session swaps in its own metrics
+        serve_metrics(args.metrics_port)
+    
+    if args.source or args.subject:
+        if not (args.source and args.subject):
+            parser.error("headless replay needs both --subject and --source")
+        replay_attendance(args.subject, args.source, pace=args.pace, log_file=args.log,
+                          detect_interval=args.detect_interval, latency_budget=budget, motion_gate=args.motion_gate,
+                          use_cache=not args.no_cache, **detection)
+        return
+    
     while True:
         print("\n===== Attendance System =====")
         print("1. Take Attendance")
-        print("2. Mark Absentees")
-        print("3. Exit")
+        print("2. Take Attendance (fast mode: periodic detection)")
+        print("3. Mark Absentees")
+        print("4. Export Attendance to Excel")
+        print("5. Exit")
         
-        choice = input("\nEnter your choice (1-3): ")
+        choice = input("\nEnter your choice (1-5): ")
         
         if choice == '1':
-            take_attendance()
+            take_attendance(latency_budget=budget, motion_gate=args.motion_gate, **detection)
         elif choice == '2':
-            mark_absentees()
+            take_attendance(detect_interval=5, **detection)
         elif choice == '3':
+            mark_absentees()
+        elif choice == '4':
+            export_attendance()
+        elif choice == '5':
             print("Exiting attendance system...")
             break
         else:
@@ -0,0 +1,165 @@
+"""
+Tests for the Flask attendance service, run against a stub RecognitionService.
+
+Run from the project root: python -m pytest
+"""
+from io import BytesIO
+from datetime import datetime
+import cv2
+import numpy as np
+import pytest
+from app import create_app
+
+class StubService:
+    """Stand-in for RecognitionService that records the calls made by the endpoints."""
+
+    def __init__(self):
+        self.subjects = ["Maths", "Physics"]
+        self.students_data = {
+            "1": {"name": "Asha", "subjects": ["Maths"]},
+            "2": {"name": "Ben", "subjects": ["Physics"]},
+        }
+        self.gallery = [np.zeros(128), np.zeros(128)]
+        self.loaded_at = datetime(2026, 1, 5, 9, 0, 0)
+        self.recognize_calls = []
+        self.marks = []
+        self.absentee_calls = []
+
+    def refresh(self):
+        return False
+
+    def recognize(self, frames, subject=None, tolerance=None):
+        self.recognize_calls.append((len(frames), subject, tolerance))
+        # Only students of the requested subject can be recognized
+        roll_nos = [roll_no for roll_no, data in self.students_data.items()
+                    if subject is None or subject in data["subjects"]]
+        return [[{"box": [0, 10, 10, 0], "roll_no": roll_no, "name": self.students_data[roll_no]["name"],
+                  "distance": 0.3} for roll_no in roll_nos] for _ in frames]
+
+    def mark(self, roll_no, subject, status="Present", date=None):
+        data = self.students_data.get(roll_no)
+        if data is None:
+            raise KeyError(f"No student with roll number {roll_no}")
+        if subject not in data["subjects"]:
+            raise ValueError(f"{data['name']} is not enrolled in {subject}")
+        self.marks.append((roll_no, subject, status, date))
+        return True
+
+    def mark_absentees(self, subject, date):
+        self.absentee_calls.append((subject, date))
+        return 0
+
+@pytest.fixture
+def service():
+    return StubService()
+
+@pytest.fixture
+def client(service, tmp_path, monkeypatch):
+    # create_app() creates the data directories in the working directory
+    monkeypatch.chdir(tmp_path)
+    return create_app(service).test_client()
+
+def jpeg_bytes():
+    ok, buffer = cv2.imencode(".jpg", np.zeros((48, 64, 3), dtype=np.uint8))
+    assert ok
+    return buffer.tobytes()
+
+def test_subjects(client):
+    response = client.get("/subjects")
+    assert response.status_code == 200
+    assert response.get_json() == {"subjects": ["Maths", "Physics"]}
+
+def test_health(client):
+    response = client.get("/health")
+    assert response.get_json() == {"students": 2, "encodings": 2, "loaded_at": "2026-01-05T09:00:00"}
+
+def test_recognize_unknown_subject(client, service):
+    response = client.post("/recognize?subject=History", data=jpeg_bytes(), content_type="image/jpeg")
+    assert response.status_code == 404
+    assert service.recognize_calls == []
+
+def test_recognize_undecodable_image(client, service):
+    response = client.post("/recognize", data=b"not a jpeg", content_type="image/jpeg")
+    assert response.status_code == 400
+    assert service.recognize_calls == []
+
+def test_recognize_empty_body(client):
+    response = client.post("/recognize", data=b"", content_type="image/jpeg")
+    assert response.status_code == 400
+
+def test_recognize_subject_filter(client, service):
+    response = client.post("/recognize?subject=Maths&tolerance=0.5", data=jpeg_bytes(), content_type="image/jpeg")
+    assert response.status_code == 200
+    assert service.recognize_calls == [(1, "Maths", 0.5)]
+    faces = response.get_json()["frames"][0]["faces"]
+    assert [face["roll_no"] for face in faces] == ["1"]
+    assert response.get_json()["marked"] == []
+
+def test_recognize_without_subject_matches_everyone(client, service):
+    response = client.post("/recognize?mark=1", data=jpeg_bytes(), content_type="image/jpeg")
+    assert service.recognize_calls == [(1, None, None)]
+    assert [face["roll_no"] for face in response.get_json()["frames"][0]["faces"]] == ["1", "2"]
+    # Marking needs a subject
+    assert response.get_json()["marked"] == []
+    assert service.marks == []
+
+def test_recognize_and_mark(client, service):
+    response = client.post("/recognize?subject=Maths&mark=1",
+                           data={"frames": [(BytesIO(jpeg_bytes()), "a.jpg"), (BytesIO(jpeg_bytes()), "b.jpg")]},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert len(response.get_json()["frames"]) == 2
+    assert response.get_json()["marked"] == ["1"]
+    assert service.marks == [("1", "Maths", "Present", None)]
+
+@pytest.mark.parametrize("payload", [{"subject": "Maths"}, {"roll_no": "1"}, {}])
+def test_mark_missing_fields(client, payload):
+    assert client.post("/mark", json=payload).status_code == 400
+
+def test_mark_invalid_status(client, service):
+    response = client.post("/mark", json={"roll_no": "1", "subject": "Maths", "status": "Late"})
+    assert response.status_code == 400
+    assert service.marks == []
+
+@pytest.mark.parametrize("date", ["2026-13-01", "2026-02-30", "17/10/2026", "yesterday"])
+def test_mark_invalid_date(client, service, date):
+    response = client.post("/mark", json={"roll_no": "1", "subject": "Maths", "date": date})
+    assert response.status_code == 400
+    assert service.marks == []
+
+def test_mark_unknown_roll_no(client):
+    response = client.post("/mark", json={"roll_no": "99", "subject": "Maths"})
+    assert response.status_code == 404
+
+def test_mark_not_enrolled(client):
+    response = client.post("/mark", json={"roll_no": "2", "subject": "Maths"})
+    assert response.status_code == 400
+
+def test_mark(client, service):
+    response = client.post("/mark", json={"roll_no": 1, "subject": "Maths", "status": "Absent",
+                                          "date": "2026-10-16"})
+    assert response.status_code == 200
+    assert response.get_json() == {"roll_no": "1", "subject": "Maths", "status": "Absent", "marked": True}
+    assert service.marks == [("1", "Maths", "Absent", "2026-10-16")]
+
+def test_mark_form(client, service):
+    response = client.post("/mark", data={"roll_no": "1", "subject": "Maths", "date": ""})
+    assert response.status_code == 200
+    assert service.marks == [("1", "Maths", "Present", None)]
+
+def test_mark_absentees_invalid_date(client, service):
+    response = client.post("/mark_absentees", data={"subject": "Maths", "date": "2026-10-32"})
+    assert response.status_code == 400
+    assert service.absentee_calls == []
+
+def test_mark_absentees(client, service):
+    response = client.post("/mark_absentees", data={"subject": "Maths", "date": "2026-10-16"})
+    assert response.status_code == 302
+    assert service.absentee_calls == [("Maths", "2026-10-16")]
+
+@pytest.mark.parametrize("payload, status", [({"date": "2026-10-16"}, 400),
+                                             ({"subject": "History", "date": "2026-10-16"}, 404)])
+def test_mark_absentees_invalid_subject(client, service, payload, status):
+    response = client.post("/mark_absentees", data=payload)
+    assert response.status_code == status
+    assert service.absentee_calls == []
@@ -0,0 +1,132 @@
+"""
+Tests for RecognitionService over a real gallery store and attendance database.
+
+Frames are recorded to JPEG files and read back, then detected with a
+fixed-box detector and encoded with the real encoder, so the tests do not
+depend on the content of the images.
+
+Run from the project root: python -m pytest
+"""
+import os
+import cv2
+import numpy as np
+import pytest
+from face_detectors import FaceDetector
+from face_detection_utils import initialize_directories, save_students_data
+from attendance_pipeline import detect_and_encode
+from attendance_store import AttendanceStore
+from gallery_store import GalleryStore
+from app import RecognitionService
+
+SCALE = 0.5
+
+class FixedBoxDetector(FaceDetector):
+    """Reports one face in the middle of every frame."""
+
+    name = 'fixed'
+
+    def _detect(self, rgb_frame):
+        height, width = rgb_frame.shape[:2]
+        return [(height // 4, 3 * width // 4, 3 * height // 4, width // 4)]
+
+DETECTOR = FixedBoxDetector()
+
+STUDENTS = {
+    "1": {"name": "Asha", "roll_no": "1", "subjects": ["Maths"]},
+    "2": {"name": "Ben", "roll_no": "2", "subjects": ["Physics"]},
+    "3": {"name": "Chen", "roll_no": "3", "subjects": ["Maths", "Physics"]},
+}
+
+def record_frame(directory, roll_no):
+    """Write a distinct frame for a student to a JPEG file and read it back."""
+    rng = np.random.default_rng(int(roll_no))
+    frame = cv2.resize(rng.integers(0, 256, (24, 32, 3), dtype=np.uint8), (320, 240),
+                       interpolation=cv2.INTER_NEAREST)
+    path = os.path.join(directory, f"{roll_no}.jpg")
+    cv2.imwrite(path, frame)
+    return cv2.imread(path)
+
+def enroll(gallery, frames, roll_nos):
+    """Add the encodings of the students' frames to the gallery."""
+    for roll_no in roll_nos:
+        _, face_encodings = detect_and_encode(frames[roll_no], SCALE, DETECTOR)
+        gallery.append(roll_no, face_encodings[0])
+
+@pytest.fixture
+def frames(tmp_path):
+    os.makedirs(tmp_path / "recorded")
+    return {roll_no: record_frame(str(tmp_path / "recorded"), roll_no) for roll_no in STUDENTS}
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, frames):
+    # students.pkl lives under faces/ in the working directory
+    monkeypatch.chdir(tmp_path)
+    initialize_directories()
+    gallery_path = str(tmp_path / "gallery")
+    enroll(GalleryStore(gallery_path), frames, ["1", "2"])
+    save_students_data({roll_no: STUDENTS[roll_no] for roll_no in ["1", "2"]})
+
+    store = AttendanceStore(str(tmp_path / "attendance.db"))
+    service = RecognitionService(gallery_path, attendance_store=store, scale=SCALE, detector=DETECTOR,
+                                 reload_interval=0)
+    yield service
+    store.close()
+
+def test_warm_load(service):
+    assert service.subjects == ["Maths", "Physics"]
+    assert len(service.gallery) == 2
+    assert set(service.students_data) == {"1", "2"}
+    assert service.loaded_at is not None
+    # Matchers are built once per gallery version
+    assert service.view("Maths") is service.view("Maths")
+
+def test_recognize(service, frames):
+    results = service.recognize([frames["1"], frames["2"]])
+    assert [[face["roll_no"] for face in faces] for faces in results] == [["1"], ["2"]]
+    face = results[0][0]
+    assert face["name"] == "Asha"
+    assert face["distance"] < 0.1
+    assert face["box"] == [60, 240, 180, 80]
+
+def test_recognize_subject(service, frames):
+    faces, = service.recognize([frames["2"]], subject="Maths")
+    # Ben is not enrolled in Maths, so only Asha can be matched
+    assert faces[0]["roll_no"] in ("1", None)
+
+def test_refresh_unchanged(service):
+    loaded_at = service.loaded_at
+    assert service.refresh() is False
+    assert service.loaded_at == loaded_at
+
+def test_refresh_after_enrolment(service, frames, tmp_path):
+    view, _ = service.view("Maths")
+    assert "3" not in view
+
+    # Another process enrols a student
+    enroll(GalleryStore(str(tmp_path / "gallery")), frames, ["3"])
+    save_students_data(STUDENTS)
+
+    assert service.refresh() is True
+    assert len(service.gallery) == 3
+    view, _ = service.view("Maths")
+    assert "3" in view
+    faces, = service.recognize([frames["3"]], subject="Physics")
+    assert faces[0]["roll_no"] == "3"
+    assert service.refresh() is False
+
+def test_mark(service):
+    assert service.mark("1", "Maths", date="2026-10-16") is True
+    assert service.mark("1", "Maths", date="2026-10-16") is False
+    assert service.attendance_store.is_marked("1", "Maths", "2026-10-16")
+
+def test_mark_invalid(service):
+    with pytest.raises(KeyError):
+        service.mark("99", "Maths")
+    with pytest.raises(ValueError):
+        service.mark("2", "Maths")
+
+def test_mark_absentees(service):
+    service.mark("1", "Maths", date="2026-10-16")
+    assert service.mark_absentees("Physics", "2026-10-16") == 1
+    assert service.mark_absentees("Maths", "2026-10-16") == 0
+    assert service.attendance_store.roll_nos_with_status("Physics", "2026-10-16", "Absent") == {"2"}
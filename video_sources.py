@@ -0,0 +1,123 @@
+"""
+Video sources for attendance: webcams, network streams, video files and image folders.
+
+All sources share the cv2.VideoCapture read() -> (ret, frame) / release()
+interface, so they can be used wherever a webcam capture is used.
+"""
+import os
+import glob
+import time
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class FileVideoSource:
+    """
+    Read frames from a video file, a directory of images or a list of image paths.
+
+    Without pacing, frames are returned as fast as they can be decoded; with
+    pacing, read() waits so frames arrive at the clip's frame rate.
+    """
+
+    def __init__(self, path, pace=False, fps=None, loop=False):
+        """
+        Args:
+            path: Video file, directory of images, image sequence pattern
+                  (frames/*.jpg or frames/%05d.jpg), or list of image paths
+            pace: Whether to deliver frames at real-time speed
+            fps: Frame rate used for pacing (defaults to the video's own, or 30)
+            loop: Restart from the first frame when the end is reached
+        """
+        self.path = path
+        self.loop = loop
+        self.frame_index = 0
+        self._capture = None
+        self._images = None
+
+        if isinstance(path, (list, tuple)):
+            self._images = list(path)
+        elif os.path.isdir(path):
+            self._images = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                  if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif any(char in path for char in "*?["):
+            self._images = sorted(glob.glob(path))
+        else:
+            # printf-style image sequences (frames/%05d.jpg) are read by VideoCapture
+            if not os.path.exists(path) and "%" not in path:
+                raise FileNotFoundError(f"Video file not found: {path}")
+            self._capture = cv2.VideoCapture(path)
+
+        native_fps = self._capture.get(cv2.CAP_PROP_FPS) if self._capture is not None else 0
+        self.fps = fps or native_fps or 30.0
+        self._frame_interval = 1.0 / self.fps if pace else 0.0
+        self._next_frame_at = None
+
+    def read(self):
+        """Return (ret, frame) like cv2.VideoCapture.read()."""
+        ret, frame = self._read_next()
+        if not ret and self.loop and self.frame_index > 0:
+            self._rewind()
+            ret, frame = self._read_next()
+        if not ret:
+            return False, None
+
+        if self._frame_interval:
+            now = time.perf_counter()
+            if self._next_frame_at is None:
+                self._next_frame_at = now
+            delay = self._next_frame_at - now
+            if delay > 0:
+                time.sleep(delay)
+            self._next_frame_at += self._frame_interval
+
+        self.frame_index += 1
+        return True, frame
+
+    def _read_next(self):
+        if self._capture is not None:
+            return self._capture.read()
+
+        # Skip unreadable images instead of ending the sequence
+        while self.frame_index < len(self._images):
+            frame = cv2.imread(self._images[self.frame_index])
+            if frame is not None:
+                return True, frame
+            print(f"Could not read image: {self._images[self.frame_index]}")
+            self.frame_index += 1
+        return False, None
+
+    def _rewind(self):
+        self.frame_index = 0
+        if self._capture is not None:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def __len__(self):
+        """Number of frames in the source (an estimate for video files)."""
+        if self._capture is not None:
+            return int(self._capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        return len(self._images)
+
+    def isOpened(self):
+        return self._capture.isOpened() if self._capture is not None else len(self._images) > 0
+
+    def release(self):
+        if self._capture is not None:
+            self._capture.release()
+
+def open_video_source(spec, pace=False):
+    """
+    Open a video source from a config value.
+
+    Args:
+        spec: Device index (int or digit string), stream URL (rtsp://, http://),
+              video file path or image directory
+        pace: Deliver file frames at real-time speed
+
+    Returns:
+        An object with read() and release() methods
+    """
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return cv2.VideoCapture(int(spec))
+    if isinstance(spec, str) and "://" in spec:
+        return cv2.VideoCapture(spec)
+    return FileVideoSource(spec, pace=pace)